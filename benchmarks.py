@@ -0,0 +1,307 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import cartera
+import cuaderno
+import despacho_optimo
+import flujo_caja
+import modelo_pv
+import modelos
+import precision
+import rampas
+import recorte
+import resultados
+
+# Banco de pruebas de rendimiento de los núcleos de cálculo. Entradas sintéticas con semilla
+# fija: se ejecuta sin conexión en cualquier máquina y los resultados son comparables entre
+# ejecuciones. Cada ejecución se añade a un historial JSON Lines y se compara con las anteriores
+# de la misma máquina; si algún caso empeora más del umbral el proceso termina con código 1.
+
+SEMILLA = 12345
+HISTORIAL = "historial_benchmarks.jsonl"
+UMBRAL = 0.25            # Empeoramiento relativo tolerado frente a la referencia
+EJECUCIONES_REFERENCIA = 5
+TIEMPO_OBJETIVO = 0.5    # s acumulados por caso para decidir el número de repeticiones
+
+def perfil_sintetico(n_pasos, pasos_por_hora=1, semilla=SEMILLA):
+    """Genera precios (€/MWh) y generación PV (kW) sintéticos con forma diaria y ruido"""
+    rng = np.random.default_rng(semilla)
+    horas = np.arange(n_pasos) / pasos_por_hora
+    hora_dia = horas % 24
+    dia = horas // 24
+    estacional = 1 + 0.25 * np.cos(2 * np.pi * (dia - 172) / 365)
+    sol = np.clip(np.sin(np.pi * (hora_dia - 6) / 14), 0, None) ** 1.3
+    nubes = np.clip(rng.normal(1, 0.15, n_pasos), 0.3, 1.1)
+    generacion = 6200 * sol * estacional * nubes
+    precios = 55 + 25 * np.sin(2 * np.pi * (hora_dia - 13) / 24) + rng.normal(0, 6, n_pasos)
+    return np.round(precios, 2).tolist(), np.round(generacion, 1).tolist()
+
+def _planta_despacho(n_pasos, pasos_por_hora=1):
+    """Planta de referencia con un perfil sintético de la longitud indicada"""
+    precios, generacion = perfil_sintetico(n_pasos, pasos_por_hora)
+    return modelos.definir_planta({"precios": precios, "generacion": generacion,
+                                   "escenario.paso_h": 1 / pasos_por_hora})
+
+def _meteo_sintetica(n_pasos, paso_s=60, semilla=SEMILLA):
+    """Serie meteorológica sintética (Madrid): GHI de cielo despejado con nubes y temperatura diaria"""
+    from modelo_pv import ghi_cielo_despejado, posicion_solar
+    rng = np.random.default_rng(semilla)
+    tiempos = np.datetime64("2025-01-01T00:00", "s") + np.arange(n_pasos) * np.timedelta64(paso_s, "s")
+    cenit, _ = posicion_solar(tiempos, 40.42, -3.70)
+    ghi = ghi_cielo_despejado(cenit) * np.clip(rng.normal(0.85, 0.2, n_pasos), 0.1, 1.0)
+    horas = np.arange(n_pasos) * paso_s / 3600
+    t_ambiente = 16 + 8 * np.sin(2 * np.pi * (horas % 24 - 9) / 24) + 8 * np.sin(2 * np.pi * (horas / 24 - 110) / 365)
+    return tiempos, ghi, t_ambiente
+
+def _fv_segundal(n_pasos, semilla=SEMILLA):
+    """FV sintética a 1 s: forma diaria con paso de nubes (bordes de ~20 s) en la mitad de los días"""
+    rng = np.random.default_rng(semilla)
+    t = np.arange(n_pasos)
+    hora_dia = t / 3600 % 24
+    sol = 6200 * np.clip(np.sin(np.pi * (hora_dia - 6) / 14), 0, None) ** 1.3
+    nuboso = rng.random(n_pasos // 86400 + 1) < 0.5
+    transmision = np.where(np.cumsum(rng.random(n_pasos) < 1 / 180) % 2 == 1, 0.3, 1.0)
+    acumulada = np.concatenate(([0.0], np.cumsum(transmision)))
+    transmision[19:] = (acumulada[20:] - acumulada[:-20]) / 20
+    return (sol * np.where(nuboso[t // 86400], transmision, 1.0)).astype(np.float32)
+
+def _bloques_diarios(serie):
+    """Recorre una serie a 1 s en bloques de un día (como la lectura por ventanas del almacén)"""
+    return (serie[i:i + 86400] for i in range(0, len(serie), 86400))
+
+def _escenarios_economicos(n, semilla=SEMILLA):
+    """Escenarios económicos aleatorios con degradación, impuestos y deuda"""
+    rng = np.random.default_rng(semilla)
+    return {"capex": rng.normal(2.8e6, 1.4e5, n), "ingresos": rng.triangular(6e5, 7.4e5, 9e5, n),
+            "opex": rng.uniform(8e4, 1.2e5, n), "vida": rng.integers(10, 15, n), "tasa": rng.normal(0.08, 0.01, n),
+            "energia": 3000.0, "degradacion": 0.02, "impuesto": 0.25, "fraccion_deuda": 0.6}
+
+def _dimensionar_sin_memoria(planta):
+    """Búsqueda de dimensionamiento completa (sin poda ni despachos memorizados) en un proceso"""
+    import dimensionamiento
+    dimensionamiento._MEMO.clear()
+    dimensionamiento.dimensionar(planta, procesos=1, podar=False)
+
+def _registros_resultados(n, semilla=SEMILLA):
+    """Ejecuciones sintéticas (2000 configuraciones de CAPEX distinto) para el almacén de resultados"""
+    from dataclasses import replace
+    base = modelos.definir_planta()
+    rng = np.random.default_rng(semilla)
+    plantas = [replace(base, economia=replace(base.economia, capex=float(c))) for c in rng.uniform(1e6, 4e6, 2000)]
+    van = rng.normal(1e6, 5e5, n)
+    return [{"tipo": "monte_carlo", "planta": plantas[i % len(plantas)],
+             "kpis": {"van": van[i], "tir": van[i] / 1e8, "payback_anos": 7.0}} for i in range(n)]
+
+def _almacen_resultados(n):
+    """Almacén con n ejecuciones en el directorio temporal; se reutiliza entre ejecuciones del banco"""
+    ruta = os.path.join(tempfile.gettempdir(), f"benchmark_resultados_{n:.0e}.db")
+    con = resultados.abrir(ruta)
+    existentes = con.execute("SELECT COUNT(*) FROM ejecuciones").fetchone()[0]
+    if existentes != n:
+        con.execute("DELETE FROM ejecuciones")
+        for inicio in range(0, n, 100_000):
+            resultados.registrar_lote(con, _registros_resultados(min(100_000, n - inicio), SEMILLA + inicio))
+    return con
+
+def _cartera_sintetica(n_plantas, n_pasos, por_subestacion=4, semilla=SEMILLA):
+    """Cartera con precios comunes: cuatro de cada cinco plantas comparten subestación de a por_subestacion"""
+    precios, _ = perfil_sintetico(n_pasos, semilla=semilla)
+    definiciones = []
+    for i in range(n_plantas):
+        _, generacion = perfil_sintetico(n_pasos, semilla=semilla + i + 1)
+        planta = modelos.definir_planta({"nombre": f"Planta {i + 1}", "precios": precios,
+                                         "generacion": generacion})
+        compartida = i < n_plantas * 4 // 5
+        definiciones.append({"planta": planta, "subestacion": f"S{i // por_subestacion}" if compartida else None})
+    subestaciones = {f"S{k}": 0.8 * por_subestacion * modelos.definir_planta().red.limite
+                     for k in range(n_plantas // por_subestacion + 1)}
+    return cartera.preparar_cartera(definiciones, precios, 1.0, subestaciones)
+
+def _cuaderno_con_figura(n_pasos):
+    """Modo interactivo con la figura creada (sin navegador: el redibujado es síncrono)"""
+    sesion = cuaderno.Cuaderno(_planta_despacho(n_pasos))
+    sesion.crear_figura().canvas.draw()   # Primer dibujado completo: guarda el fondo
+    return sesion
+
+def _informe_completo():
+    """Genera el informe completo sin caché en un directorio temporal"""
+    from generador_informe import generar_informe_completo
+    with tempfile.TemporaryDirectory() as directorio, contextlib.redirect_stdout(io.StringIO()):
+        generar_informe_completo(ruta_salida=os.path.join(directorio, "informe.docx"))
+
+def casos():
+    """Lista de casos: (nombre, tamaño, preparación, ejecución, incluido en modo rápido)"""
+    lista = []
+    for etiqueta, n_pasos, pasos_por_hora in [("24h", 24, 1), ("1a_horario", 8760, 1), ("1a_15min", 35040, 4),
+                                              ("1a_5min", 105120, 12)]:
+        lista.append((f"despacho/{etiqueta}", n_pasos,
+                      lambda n=n_pasos, p=pasos_por_hora: _planta_despacho(n, p),
+                      modelos.simular_arbitraje, n_pasos <= 8760))
+    for n_sim in [10_000, 100_000, 1_000_000, 10_000_000]:
+        # Los ingresos del despacho se calculan en la preparación: solo se mide el Monte Carlo
+        lista.append((f"monte_carlo/{n_sim:.0e}", n_sim,
+                      lambda n=n_sim: (n, modelos.simular_arbitraje(registrar=False)[1]["ingresos_anuales"]),
+                      lambda datos: modelos.calcular_monte_carlo(datos[0], ingresos_anuales=datos[1]),
+                      n_sim <= 100_000))
+    for etiqueta, n_pasos in [("1a_1min", 525_600), ("20a_1min", 20 * 525_960)]:
+        lista.append((f"pv/{etiqueta}", n_pasos, lambda n=n_pasos: _meteo_sintetica(n),
+                      lambda datos: modelo_pv.produccion_ac(*datos), n_pasos <= 525_600))
+    for etiqueta, n_pasos in [("1d_1s", 86400), ("1a_1s", 365 * 86400)]:
+        lista.append((f"rampas/{etiqueta}", n_pasos, lambda n=n_pasos: _fv_segundal(n),
+                      lambda serie: rampas.simular_rampas(_bloques_diarios(serie)), n_pasos <= 86400))
+    lista.append(("recorte/100x100_1a_1min", 10_000, lambda: modelo_pv.produccion_ac(*_meteo_sintetica(525_600)),
+                  lambda pv: recorte.barrido(pv, 1 / 60, np.linspace(3000, 6000, 100), np.linspace(1000, 40000, 100)),
+                  True))
+    for n_escenarios in [20, 100]:
+        lista.append((f"estocastico/{n_escenarios}x96", n_escenarios,
+                      lambda n=n_escenarios: despacho_optimo.generar_escenarios(n=n, semilla=SEMILLA),
+                      lambda escenarios: despacho_optimo.despacho_estocastico(*escenarios), n_escenarios <= 20))
+    lista.append(("reservas/1a_horario", 8760, lambda: _planta_despacho(8760),
+                  lambda planta: despacho_optimo.despacho_reservas(planta, comparar=False), True))
+    lista.append(("cartera/200x1a_horario", 200, lambda: _cartera_sintetica(200, 8760), cartera.simular_cartera,
+                  False))
+    lista.append(("cuaderno/1a_horario", 8760, lambda: _cuaderno_con_figura(8760),
+                  lambda sesion: cuaderno.medir_latencia(sesion, 1), True))
+    lista.append(("flujo_caja/1e6", 1_000_000, lambda: _escenarios_economicos(1_000_000),
+                  lambda datos: flujo_caja.evaluar(**datos), False))
+    lista.append(("dimensionamiento/288x1a", 288, lambda: _planta_despacho(8760), _dimensionar_sin_memoria, False))
+    lista.append(("resultados/registro_1e4", 10_000, lambda: (resultados.abrir(":memory:"), _registros_resultados(10_000)),
+                  lambda datos: resultados.registrar_lote(*datos), True))
+    lista.append(("resultados/top20_1e6", 1_000_000, lambda: _almacen_resultados(1_000_000),
+                  lambda con: resultados.mejores(con, "van", 20, [("capex_eur_kwh", "<", 150)]), False))
+    lista.append(("sensibilidad", 42, None, lambda _: modelos.calcular_matriz_sensibilidad(), True))
+    lista.append(("termico", 24, None, lambda _: modelos.simular_termico(), True))
+    lista.append(("cortocircuito", 3, None, lambda _: modelos.calcular_cortocircuito(), True))
+    lista.append(("informe_completo", 1, None, lambda _: _informe_completo(), True))
+    return lista
+
+def medir(preparar, ejecutar, memoria=True):
+    """Mide un caso: mediana y mínimo del tiempo real y pico de memoria con tracemalloc"""
+    entrada = preparar() if preparar else None
+    inicio = time.perf_counter()
+    ejecutar(entrada)
+    primera = time.perf_counter() - inicio
+    # Los casos lentos se miden una vez; los rápidos descartan la primera (calentamiento)
+    if primera > 2 * TIEMPO_OBJETIVO:
+        tiempos = [primera]
+    else:
+        repeticiones = min(1000, max(3, int(TIEMPO_OBJETIVO / max(primera, 1e-6))))
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            ejecutar(entrada)
+            tiempos.append(time.perf_counter() - inicio)
+    resultado = {
+        "tiempo_s": statistics.median(tiempos),
+        "tiempo_min_s": min(tiempos),
+        "repeticiones": len(tiempos)
+    }
+    if memoria:
+        # Ejecución aparte: tracemalloc ralentiza y no debe contaminar los tiempos
+        tracemalloc.start()
+        ejecutar(entrada)
+        resultado["memoria_pico_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return resultado
+
+def _commit_actual():
+    """Commit de git del árbol actual, si está disponible"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def leer_historial(ruta):
+    """Lee las ejecuciones anteriores del historial (una por línea)"""
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+def comparar(resultados, historial, maquina, umbral=UMBRAL, n_referencia=EJECUCIONES_REFERENCIA,
+             modo_precision="float64"):
+    """Compara cada caso con la mediana de las últimas ejecuciones en la misma máquina y precisión
+
+    Se compara el tiempo mínimo, menos sensible que la mediana al ruido de otros procesos.
+    Devuelve {caso: (tiempo de referencia, cambio relativo, regresión)}.
+    """
+    anteriores = [e for e in historial
+                  if e.get("maquina") == maquina and e.get("precision", "float64") == modo_precision]
+    comparacion = {}
+    for caso, medida in resultados.items():
+        previos = [e["resultados"][caso]["tiempo_min_s"] for e in anteriores if caso in e["resultados"]]
+        previos = previos[-n_referencia:]
+        if not previos:
+            continue
+        referencia = statistics.median(previos)
+        cambio = medida["tiempo_min_s"] / referencia - 1
+        comparacion[caso] = (referencia, cambio, cambio > umbral)
+    return comparacion
+
+def ejecutar_benchmarks(filtro=None, rapido=False, memoria=True, ruta_historial=HISTORIAL, umbral=UMBRAL,
+                        guardar=True):
+    """Ejecuta los casos seleccionados, los compara con el historial y devuelve (ejecución, comparación)"""
+    resultados = {}
+    for nombre, tamano, preparar, ejecutar, en_rapido in casos():
+        if (rapido and not en_rapido) or (filtro and not re.search(filtro, nombre)):
+            continue
+        medida = medir(preparar, ejecutar, memoria)
+        medida["tamano"] = tamano
+        resultados[nombre] = medida
+        pico = f"{medida['memoria_pico_mb']:9.1f} MB" if "memoria_pico_mb" in medida else ""
+        print(f"{nombre:<24}{medida['tiempo_s']:>11.4f} s  (x{medida['repeticiones']}){pico}")
+
+    ejecucion = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "maquina": platform.node(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "semilla": SEMILLA,
+        "precision": precision.actual(),
+        "resultados": resultados
+    }
+    comparacion = comparar(resultados, leer_historial(ruta_historial), ejecucion["maquina"], umbral,
+                           modo_precision=ejecucion["precision"])
+    if guardar:
+        with open(ruta_historial, "a", encoding="utf-8") as f:
+            f.write(json.dumps(ejecucion, ensure_ascii=False) + "\n")
+    return ejecucion, comparacion
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de los núcleos de cálculo PV + BESS")
+    parser.add_argument("--filtro", help="Expresión regular sobre el nombre de los casos")
+    parser.add_argument("--rapido", action="store_true", help="Omite los tamaños más grandes")
+    parser.add_argument("--sin-memoria", action="store_true", help="No mide el pico de memoria")
+    parser.add_argument("--historial", default=HISTORIAL, help="Fichero JSON Lines con el historial")
+    parser.add_argument("--umbral", type=float, default=UMBRAL, help="Empeoramiento relativo tolerado (0.25 = 25%%)")
+    parser.add_argument("--sin-guardar", action="store_true", help="No añade esta ejecución al historial")
+    parser.add_argument("--precision", choices=sorted(precision.TIPOS), help="Precisión de los núcleos vectoriales")
+    args = parser.parse_args()
+
+    if args.precision:
+        precision.usar(args.precision)
+    _, comparacion = ejecutar_benchmarks(args.filtro, args.rapido, not args.sin_memoria, args.historial,
+                                         args.umbral, not args.sin_guardar)
+    regresiones = [caso for caso, (_, _, regresion) in comparacion.items() if regresion]
+    for caso, (referencia, cambio, regresion) in comparacion.items():
+        print(f"{caso:<24}{cambio:>+8.1%} frente a {referencia:.4f} s{'  REGRESIÓN' if regresion else ''}")
+    if regresiones:
+        print(f"{len(regresiones)} caso(s) superan el umbral del {args.umbral:.0%}")
+        sys.exit(1)
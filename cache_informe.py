@@ -0,0 +1,52 @@
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+from io import BytesIO
+
+from configuracion import huella
+
+def clave_seccion(nombre, funciones, parametros):
+    """Calcula la clave de una sección a partir del código de sus funciones o módulos y sus parámetros"""
+    h = hashlib.sha256(nombre.encode("utf-8"))
+    for funcion in funciones:
+        h.update(inspect.getsource(funcion).encode("utf-8"))
+    h.update(huella(parametros).encode("utf-8"))
+    return h.hexdigest()
+
+def _a_serializable(valor):
+    """Convierte los buffers de figuras en bytes para poder guardarlos en disco"""
+    if isinstance(valor, BytesIO):
+        return ("__bytesio__", valor.getvalue())
+    if isinstance(valor, tuple):
+        return tuple(_a_serializable(v) for v in valor)
+    return valor
+
+def _desde_serializable(valor):
+    """Reconstruye los buffers de figuras guardados como bytes"""
+    if isinstance(valor, tuple):
+        if len(valor) == 2 and isinstance(valor[0], str) and valor[0] == "__bytesio__":
+            return BytesIO(valor[1])
+        return tuple(_desde_serializable(v) for v in valor)
+    return valor
+
+def leer_seccion(directorio, nombre, clave):
+    """Devuelve (True, valor) si la sección está en caché con la misma clave, o (False, None)"""
+    ruta = os.path.join(directorio, f"{nombre}.pkl")
+    try:
+        with open(ruta, "rb") as f:
+            clave_guardada, valor = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False, None
+    if clave_guardada != clave:
+        return False, None
+    return True, _desde_serializable(valor)
+
+def guardar_seccion(directorio, nombre, clave, valor):
+    """Guarda el resultado de una sección de forma atómica (seguro con informes concurrentes)"""
+    os.makedirs(directorio, exist_ok=True)
+    fd, ruta_tmp = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump((clave, _a_serializable(valor)), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(ruta_tmp, os.path.join(directorio, f"{nombre}.pkl"))
@@ -0,0 +1,215 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from configuracion import PLANTA_REFERENCIA, Planta, cargar_datos, desde_dict, variante
+from modelos import simular_arbitraje
+
+# Simulación de una cartera de plantas PV + BESS con precios comunes. Las plantas independientes
+# se reparten entre los procesos del pool; las que evacuan por una misma subestación forman una
+# unidad que se simula en un solo trabajador, porque su límite de exportación es compartido.
+# Los precios y la matriz de generación (plantas × pasos) se publican una vez en memoria
+# compartida: a cada tarea solo viajan los índices y la configuración de sus plantas.
+#
+# Coordinación en la subestación: en cada paso la capacidad de la subestación se reparte entre
+# sus plantas en proporción a lo que cada una exportaría sin ella (reparto a prorrata del
+# recorte). Cada BESS puede absorber el recorte que le corresponde. La capacidad que deja libre
+# la FV se reparte para la descarga de los BESS en proporción a su potencia, sin superar el
+# límite de conexión de cada planta.
+
+_COMPARTIDO = {}   # En cada trabajador: {nombre: array} sobre la memoria compartida
+
+def _publicar(arrays):
+    """Copia los arrays a bloques de memoria compartida: (bloques, descriptores para los trabajadores)"""
+    bloques, descriptores = [], {}
+    for nombre, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        bloque = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=bloque.buf)[...] = array
+        bloques.append(bloque)
+        descriptores[nombre] = (bloque.name, array.shape, array.dtype.str)
+    return bloques, descriptores
+
+def _adjuntar(descriptores):
+    """Inicializador del pool: vistas de solo lectura sobre los bloques de memoria compartida"""
+    for nombre, (nombre_bloque, forma, dtype) in descriptores.items():
+        # Los trabajadores comparten el resource_tracker del proceso principal, que libera el bloque
+        bloque = shared_memory.SharedMemory(name=nombre_bloque)
+        vista = np.ndarray(forma, np.dtype(dtype), buffer=bloque.buf)
+        vista.flags.writeable = False
+        _COMPARTIDO[nombre] = vista
+        _COMPARTIDO[f"_{nombre}_bloque"] = bloque   # Mantiene el mapeo vivo
+
+def asignar_subestacion(generacion, limites, limite_subestacion, potencias_bess=None):
+    """Límite efectivo de cada planta en cada paso (plantas × pasos) con la subestación compartida
+
+    Con recorte en la subestación el límite es la FV exportable a prorrata (no queda hueco para
+    descargar). Sin él, cada planta puede exportar su FV más su parte de la capacidad libre,
+    repartida según potencias_bess (a partes iguales si no se dan) y acotada por su propio límite.
+    """
+    propios = np.asarray(limites, dtype=np.float64)[:, None]
+    exportable = np.minimum(generacion, propios)
+    total = exportable.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        factor = np.where(total > limite_subestacion, limite_subestacion / total, 1.0)
+    pesos = np.ones(len(propios)) if potencias_bess is None else np.asarray(potencias_bess, dtype=np.float64)
+    pesos = (pesos / pesos.sum() if pesos.sum() > 0 else np.full(len(pesos), 1 / len(pesos)))[:, None]
+    libre = np.maximum(limite_subestacion - total, 0.0)
+    hueco = np.minimum(propios - exportable, libre * pesos)
+    return np.where(factor < 1, exportable * factor, exportable + hueco)
+
+def _simular_unidad(unidad):
+    """Simula una planta independiente o las plantas de una subestación; devuelve sus filas"""
+    indices, plantas, limite_subestacion = unidad
+    precios, generacion, paso_h = _COMPARTIDO["precios"], _COMPARTIDO["generacion"], float(_COMPARTIDO["paso_h"][0])
+    propia = generacion[indices]
+    limites = None
+    if limite_subestacion is not None:
+        limites = asignar_subestacion(propia, [p.red.limite for p in plantas], limite_subestacion,
+                                      [p.bess.potencia for p in plantas])
+    filas = []
+    for k, (i, planta) in enumerate(zip(indices, plantas)):
+        planta = variante(planta, {"escenario.precios": precios, "escenario.generacion": propia[k],
+                                   "escenario.paso_h": paso_h})
+        _, kpis = simular_arbitraje(planta, registrar=False, limites=None if limites is None else limites[k])
+        filas.append({"indice": i, "nombre": planta.nombre, **kpis,
+                      "recorte_mwh_ano": kpis["energia_perdida_kwh_dia"] * 365 / 1000})
+    return filas
+
+def preparar_cartera(definiciones, precios=None, paso_h=None, subestaciones=None, base=PLANTA_REFERENCIA,
+                     desde=None, hasta=None):
+    """Cartera lista para simular a partir de definiciones de planta (diccionarios o Planta)
+
+    Cada definición puede indicar "subestacion" (clave de subestaciones, límite en kW) y
+    "almacen" (almacén con la FV de la planta en la ventana desde–hasta); sin almacén se repite
+    el perfil de generación de su escenario hasta cubrir el horizonte de precios. Por defecto
+    los precios son los del escenario de la planta base.
+    """
+    from series_temporales import ventana
+    subestaciones = subestaciones or {}
+    precios = np.asarray(base.escenario.precios if precios is None else precios, dtype=np.float64)
+    paso_h = base.escenario.paso_h if paso_h is None else paso_h
+    plantas, grupo, filas = [], [], []
+    for definicion in definiciones:
+        definicion = {"planta": definicion} if isinstance(definicion, Planta) else dict(definicion)
+        subestacion = definicion.pop("subestacion", None)
+        almacen = definicion.pop("almacen", None)
+        planta = definicion.pop("planta") if "planta" in definicion else desde_dict(definicion, base)
+        if subestacion is not None and subestacion not in subestaciones:
+            raise ValueError(f"La planta {planta.nombre!r} usa la subestación {subestacion!r}, que no está definida")
+        if almacen:
+            _, datos = ventana(almacen, desde, hasta, ["generacion"], paso=round(paso_h * 3600))
+            serie = np.nan_to_num(np.asarray(datos["generacion"], dtype=np.float64)[:len(precios)], nan=0.0)
+            if len(serie) < len(precios):
+                raise ValueError(f"El almacén {almacen!r} no cubre el horizonte de precios")
+        else:
+            serie = np.resize(np.asarray(planta.escenario.generacion, dtype=np.float64), len(precios))
+        # Las series viajan por memoria compartida: la planta que se envía a los trabajadores no las lleva
+        plantas.append(variante(planta, {"escenario.precios": (0.0,), "escenario.generacion": (0.0,)}))
+        grupo.append(subestacion)
+        filas.append(serie)
+    return {"plantas": plantas, "subestacion": grupo, "subestaciones": dict(subestaciones),
+            "precios": precios, "generacion": np.vstack(filas), "paso_h": paso_h}
+
+def cargar_cartera(ruta):
+    """Lee una cartera de un fichero YAML o JSON
+
+    Claves: plantas (lista de definiciones), subestaciones ({nombre: límite en kW}) y precios
+    (opcional: {"almacen": ..., "desde": ..., "hasta": ..., "paso": "1h", "columna": "precios"}).
+    """
+    from series_temporales import segundos, ventana
+    datos = cargar_datos(ruta)
+    if isinstance(datos, list):
+        datos = {"plantas": datos}
+    precios, paso_h = None, None
+    origen = datos.get("precios") or {}
+    if origen:
+        paso = origen.get("paso", "1h")
+        columna = origen.get("columna", "precios")
+        _, serie = ventana(origen["almacen"], origen.get("desde"), origen.get("hasta"), [columna], paso=paso)
+        precios, paso_h = np.asarray(serie[columna], dtype=np.float64), segundos(paso) / 3600
+        if np.isnan(precios).any():
+            raise ValueError("La ventana de precios de la cartera contiene pasos sin datos")
+    return preparar_cartera(datos.get("plantas", []), precios, paso_h, datos.get("subestaciones"),
+                            desde=origen.get("desde"), hasta=origen.get("hasta"))
+
+def _unidades(cartera):
+    """Unidades de trabajo: cada subestación con todas sus plantas y cada planta independiente"""
+    por_subestacion, unidades = {}, []
+    for i, (planta, subestacion) in enumerate(zip(cartera["plantas"], cartera["subestacion"])):
+        if subestacion is None:
+            unidades.append(([i], [planta], None))
+        else:
+            por_subestacion.setdefault(subestacion, []).append(i)
+    for subestacion, indices in por_subestacion.items():
+        unidades.append((indices, [cartera["plantas"][i] for i in indices], cartera["subestaciones"][subestacion]))
+    # Las unidades grandes primero: el reparto dinámico equilibra mejor la carga
+    return sorted(unidades, key=lambda u: -len(u[0]))
+
+def simular_cartera(cartera, procesos=None):
+    """Simula todas las plantas de la cartera y agrega sus indicadores
+
+    Devuelve {"plantas": filas por planta (en el orden de la cartera), "subestaciones":
+    recorte e ingresos por subestación, "cartera": indicadores agregados}.
+    """
+    procesos = min(procesos or os.cpu_count() or 1, max(len(cartera["plantas"]), 1))
+    unidades = _unidades(cartera)
+    arrays = {"precios": cartera["precios"], "generacion": cartera["generacion"],
+              "paso_h": np.array([cartera["paso_h"]])}
+    inicio = time.perf_counter()
+    if procesos > 1:
+        bloques, descriptores = _publicar(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_adjuntar, initargs=(descriptores,)) as pool:
+                trozo = max(1, len(unidades) // (procesos * 4))
+                resultados = list(pool.map(_simular_unidad, unidades, chunksize=trozo))
+        finally:
+            for bloque in bloques:
+                bloque.close()
+                bloque.unlink()
+    else:
+        _COMPARTIDO.update(arrays)
+        resultados = [_simular_unidad(unidad) for unidad in unidades]
+    filas = sorted((fila for lista in resultados for fila in lista), key=lambda f: f["indice"])
+    duracion = time.perf_counter() - inicio
+
+    por_subestacion = {}
+    for fila, subestacion in zip(filas, cartera["subestacion"]):
+        fila["subestacion"] = subestacion
+        if subestacion is not None:
+            s = por_subestacion.setdefault(subestacion, {"plantas": 0, "limite_kw": cartera["subestaciones"][subestacion],
+                                                         "recorte_mwh_ano": 0.0, "ingresos_anuales": 0.0})
+            s["plantas"] += 1
+            s["recorte_mwh_ano"] += float(fila["recorte_mwh_ano"])
+            s["ingresos_anuales"] += float(fila["ingresos_anuales"])
+    van = np.array([f["van"] for f in filas])
+    resumen = {
+        "plantas": len(filas),
+        "subestaciones": len(por_subestacion),
+        "ingresos_anuales": float(sum(f["ingresos_anuales"] for f in filas)),
+        "van_total": float(van.sum()),
+        "van_p10": float(np.percentile(van, 10)) if len(van) else float("nan"),
+        "plantas_van_negativo": int((van < 0).sum()),
+        "energia_descargada_mwh_ano": float(sum(f["energia_descargada_mwh_ano"] for f in filas)),
+        "recorte_mwh_ano": float(sum(f["recorte_mwh_ano"] for f in filas)),
+        "procesos": procesos,
+        "tiempo_s": duracion
+    }
+    return {"plantas": filas, "subestaciones": por_subestacion, "cartera": resumen}
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulación de una cartera de plantas PV + BESS")
+    parser.add_argument("cartera", help="Fichero YAML o JSON con plantas, subestaciones y precios")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos trabajadores")
+    args = parser.parse_args()
+
+    resultado = simular_cartera(cargar_cartera(args.cartera), args.procesos)
+    for nombre, s in resultado["subestaciones"].items():
+        print(f"{nombre}: {s['plantas']} plantas, recorte {s['recorte_mwh_ano']:,.1f} MWh/año")
+    for k, v in resultado["cartera"].items():
+        print(f"{k}: {v:,.2f}" if isinstance(v, float) else f"{k}: {v}")
@@ -0,0 +1,377 @@
+import argparse
+import json
+import math
+import sys
+
+# Cada subcomando importa solo lo que necesita: los comandos de cálculo no cargan
+# matplotlib, pandas ni python-docx y arrancan rápido para usarse desde otros servicios.
+
+def _cargar_planta(ruta):
+    """Carga una configuración de planta desde un fichero YAML o JSON"""
+    if ruta is None:
+        return None
+    from configuracion import cargar_configuracion
+    return cargar_configuracion(ruta)
+
+def _a_json(objeto):
+    """Convierte tipos de NumPy a tipos nativos para serializar en JSON"""
+    if hasattr(objeto, "tolist"):
+        return objeto.tolist()
+    return str(objeto)
+
+def _sin_nan(valor):
+    """Sustituye los NaN por None (null en JSON) en diccionarios y listas anidados"""
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, dict):
+        return {k: _sin_nan(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_sin_nan(v) for v in valor]
+    return valor
+
+def _emitir(resultado, como_json):
+    """Escribe el resultado en JSON o como líneas 'clave: valor'"""
+    if como_json:
+        # Indicadores no definidos (TIR sin cambio de signo, DSCR sin deuda...) como null
+        json.dump(_sin_nan(resultado), sys.stdout, ensure_ascii=False, default=_a_json)
+        sys.stdout.write("\n")
+        return
+    for k, v in resultado.items():
+        if isinstance(v, float):
+            v = f"{v:,.2f}"
+        print(f"{k}: {v}")
+
+def _punto_control(args):
+    """Puntos de control indicados en la línea de órdenes (o None)"""
+    if not args.punto_control:
+        return None
+    from puntos_control import PuntoControl
+    return PuntoControl(args.punto_control, args.intervalo_control)
+
+def cmd_arbitraje(args):
+    """Simulación de arbitraje"""
+    from modelos import simular_arbitraje
+    planta = _cargar_planta(args.planta)
+    if args.almacen:
+        from series_temporales import planta_desde_almacen
+        planta = planta_desde_almacen(args.almacen, args.desde, args.hasta, planta, paso=args.paso,
+                                      almacen_precios=args.almacen_precios)
+    operaciones, kpis = simular_arbitraje(planta, punto_control=_punto_control(args))
+    if args.resultados:
+        import resultados
+        from modelos import definir_planta
+        planta = definir_planta(planta)
+        resultados.registrar(resultados.abrir(args.resultados), "arbitraje", planta, kpis,
+                             resultados.series_arbitraje(operaciones, planta.bess.n_contenedores))
+    if args.operaciones:
+        kpis = {**kpis, "operaciones": operaciones}
+    _emitir(kpis, args.json)
+
+def cmd_dimensionar(args):
+    """Búsqueda del tamaño del BESS"""
+    from dimensionamiento import dimensionar, imprimir_resultado
+    planta = _cargar_planta(args.planta)
+    if args.almacen:
+        from series_temporales import planta_desde_almacen
+        planta = planta_desde_almacen(args.almacen, args.desde, args.hasta, planta, paso=args.paso,
+                                      almacen_precios=args.almacen_precios)
+    resultado = dimensionar(planta, procesos=args.procesos, directorio_cache=args.cache, podar=not args.sin_poda)
+    if args.json:
+        _emitir({k: resultado[k] for k in ("optimo", "pareto", "candidatos", "podados", "memorizados", "tiempo_s")},
+                True)
+    else:
+        imprimir_resultado(resultado)
+
+def cmd_rampas(args):
+    """Control de rampa en el punto de conexión"""
+    from rampas import rampas_almacen
+    potencia = float("inf") if args.sin_limite_bess else args.potencia_bess
+    _emitir(rampas_almacen(args.almacen, _cargar_planta(args.planta), args.desde, args.hasta, args.columna,
+                           potencia_bess=potencia, destino=args.destino), args.json)
+
+def cmd_recorte(args):
+    """Recorte por límite de exportación y barrido límite × BESS"""
+    import recorte
+    from modelos import definir_planta
+    planta = definir_planta(_cargar_planta(args.planta))
+    if args.almacen:
+        generacion, paso_h = recorte.generacion_almacen(args.almacen, args.desde, args.hasta, args.columna)
+    else:
+        generacion, paso_h = planta.escenario.generacion, planta.escenario.paso_h
+    kpis = recorte.analizar(generacion, paso_h, planta)
+    barrido = None
+    if args.limites or args.capacidades:
+        barrido = recorte.barrido(generacion, paso_h, recorte.rejilla(args.limites) if args.limites else None,
+                                  recorte.rejilla(args.capacidades) if args.capacidades else None, planta=planta)
+    if args.json:
+        _emitir({**kpis, "barrido": barrido} if barrido else kpis, True)
+        return
+    _emitir(kpis, False)
+    if barrido:
+        recorte.imprimir_barrido(barrido)
+
+def cmd_estocastico(args):
+    """Despacho estocástico en dos etapas"""
+    from despacho_optimo import despacho_estocastico, escenarios_almacen, generar_escenarios
+    from series_temporales import segundos
+    planta = _cargar_planta(args.planta)
+    paso_h = segundos(args.paso) / 3600
+    if args.almacen:
+        escenarios = escenarios_almacen(args.almacen, args.desde, args.hasta, args.paso, args.almacen_precios)
+    else:
+        escenarios = generar_escenarios(planta, args.escenarios, paso_h, args.horizonte, semilla=args.semilla)
+    resultado = despacho_estocastico(*escenarios, planta=planta, paso_h=paso_h)
+    if not args.json:
+        resultado = {k: v for k, v in resultado.items() if not hasattr(v, "shape")}
+    _emitir(resultado, args.json)
+
+def cmd_reservas(args):
+    """Despacho óptimo con energía y reservas FCR/aFRR"""
+    from despacho_optimo import despacho_reservas, precios_reserva_almacen
+    planta = _cargar_planta(args.planta)
+    precios_reserva = None
+    if args.almacen:
+        from series_temporales import planta_desde_almacen
+        planta = planta_desde_almacen(args.almacen, args.desde, args.hasta, planta, paso=args.paso,
+                                      almacen_precios=args.almacen_precios)
+        precios_reserva = precios_reserva_almacen(args.almacen_precios or args.almacen, args.desde, args.hasta,
+                                                  args.paso)
+    resultado = despacho_reservas(planta, precios_reserva, comparar=not args.sin_comparar)
+    if not args.series:
+        del resultado["series"]
+    _emitir(resultado, args.json)
+
+def cmd_montecarlo(args):
+    """Simulación Monte Carlo del VAN"""
+    from modelos import calcular_monte_carlo
+    planta = _cargar_planta(args.planta)
+    van, kpis = calcular_monte_carlo(args.n_sim, planta, punto_control=_punto_control(args))
+    if args.resultados:
+        import resultados
+        from modelos import definir_planta
+        resultados.registrar(resultados.abrir(args.resultados), "monte_carlo", definir_planta(planta), kpis,
+                             {"van": van.astype("float32")})
+    _emitir(kpis, args.json)
+
+def cmd_cortocircuito(args):
+    """Estudio de cortocircuito"""
+    from modelos import calcular_cortocircuito
+    _emitir(calcular_cortocircuito(_cargar_planta(args.planta)), args.json)
+
+def cmd_transformador(args):
+    """Cálculos del transformador"""
+    from modelos import calcular_transformador_detallado
+    _emitir(calcular_transformador_detallado(_cargar_planta(args.planta)), args.json)
+
+def cmd_lca(args):
+    """Análisis de ciclo de vida"""
+    from modelos import calcular_lca
+    _emitir(calcular_lca(_cargar_planta(args.planta)), args.json)
+
+def cmd_sensibilidad(args):
+    """Matriz de sensibilidad del VAN"""
+    from modelos import calcular_matriz_sensibilidad
+    precios, capex, van = calcular_matriz_sensibilidad(_cargar_planta(args.planta))
+    _emitir({"precios_energia": precios, "capex_bess": capex, "van_meur": van}, args.json)
+
+def cmd_termico(args):
+    """Modelo térmico del BESS"""
+    from modelos import simular_termico
+    _, _, _, kpis = simular_termico(_cargar_planta(args.planta))
+    _emitir(kpis, args.json)
+
+def cmd_diagrama(args):
+    """Genera el diagrama unifilar"""
+    from diagram import crear_diagrama_profesional
+    with open(args.salida, "wb") as f:
+        f.write(crear_diagrama_profesional(_cargar_planta(args.planta), dpi=args.dpi, formato=args.formato).getvalue())
+    print(f"Diagrama generado: '{args.salida}'")
+
+def cmd_informe(args):
+    """Genera el informe completo"""
+    import instrumentacion
+    from generador_informe import generar_informe_completo
+    if args.perfil:
+        instrumentacion.activar()
+    generar_informe_completo(_cargar_planta(args.planta), ruta_salida=args.salida,
+                             directorio_cache=None if args.sin_cache else args.cache)
+    if args.perfil:
+        print(instrumentacion.resumen_texto())
+        print(f"Perfil guardado en '{instrumentacion.exportar(args.perfil)}'")
+
+def cmd_lote(args):
+    """Genera informes en lote"""
+    from lote import cargar_plantas, generar_informes_lote
+    resumen = generar_informes_lote(cargar_plantas(args.plantas), args.salida, args.procesos, args.max_tareas,
+                                    perfil=args.perfil, ruta_resultados=args.resultados)
+    _emitir(resumen, False)
+
+def cmd_cartera(args):
+    """Simulación de una cartera de plantas"""
+    from cartera import cargar_cartera, simular_cartera
+    resultado = simular_cartera(cargar_cartera(args.cartera), args.procesos)
+    if args.json:
+        _emitir(resultado, True)
+        return
+    for nombre, s in resultado["subestaciones"].items():
+        print(f"{nombre}: {s['plantas']} plantas, recorte {s['recorte_mwh_ano']:,.1f} MWh/año")
+    _emitir(resultado["cartera"], False)
+
+def cmd_resultados(args):
+    """Consulta del almacén de resultados"""
+    import resultados
+    con = resultados.abrir(args.db)
+    condiciones = [resultados.condicion(c) for c in args.donde]
+    filas = resultados.mejores(con, args.orden, args.limite, condiciones, not args.ascendente)
+    if args.json:
+        _emitir(filas, True)
+    else:
+        for fila in filas:
+            print(resultados.describir(fila, args.orden))
+
+def crear_parser():
+    """Construye el parser de argumentos con todos los subcomandos"""
+    parser = argparse.ArgumentParser(prog="pvbess", description="Modelos e informes de hibridación PV + BESS")
+    parser.add_argument("--precision", choices=["float32", "float64"],
+                        help="Precisión de los núcleos vectoriales (por defecto PVBESS_PRECISION o float64)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("arbitraje", help="Simulación de arbitraje con contenedores BESS")
+    p.add_argument("--almacen", help="Directorio de series temporales con columnas precios y generacion")
+    p.add_argument("--desde", help="Inicio de la ventana (ISO 8601, UTC si no lleva zona)")
+    p.add_argument("--hasta", help="Fin de la ventana (exclusivo)")
+    p.add_argument("--paso", default="1h", help="Resolución del despacho (1h, 15min, 5min...)")
+    p.add_argument("--almacen-precios", help="Almacén de precios, si están en otro almacén u otra resolución")
+    p.add_argument("--operaciones", action="store_true", help="Incluye el detalle horario de operación")
+    p.add_argument("--resultados", help="Almacén SQLite donde registrar la ejecución")
+    p.add_argument("--punto-control", help="Directorio de puntos de control: guarda el estado y reanuda si existe")
+    p.add_argument("--intervalo-control", type=float, default=60, help="Segundos entre puntos de control")
+    p.set_defaults(func=cmd_arbitraje)
+
+    p = sub.add_parser("dimensionar", help="Búsqueda del tamaño del BESS (VAN máximo y frente de Pareto)")
+    p.add_argument("--almacen", help="Directorio de series temporales con columnas precios y generacion")
+    p.add_argument("--desde", help="Inicio de la ventana (ISO 8601, UTC si no lleva zona)")
+    p.add_argument("--hasta", help="Fin de la ventana (exclusivo)")
+    p.add_argument("--paso", default="1h", help="Resolución del despacho (1h, 15min, 5min...)")
+    p.add_argument("--almacen-precios", help="Almacén de precios, si están en otro almacén u otra resolución")
+    p.add_argument("--procesos", type=int, default=None, help="Número de procesos trabajadores")
+    p.add_argument("--cache", help="Directorio donde conservar los despachos entre ejecuciones")
+    p.add_argument("--sin-poda", action="store_true", help="Evalúa todos los candidatos")
+    p.set_defaults(func=cmd_dimensionar)
+
+    p = sub.add_parser("rampas", help="Control de rampa FV + BESS en el punto de conexión (datos a 1 s)")
+    p.add_argument("almacen", help="Almacén de series temporales con la FV (kW)")
+    p.add_argument("--desde", help="Inicio de la ventana (ISO 8601, UTC si no lleva zona)")
+    p.add_argument("--hasta", help="Fin de la ventana (exclusivo)")
+    p.add_argument("--columna", default="generacion", help="Columna de la FV en el almacén")
+    p.add_argument("--potencia-bess", type=float, help="Potencia del BESS (kW); por defecto la de la planta")
+    p.add_argument("--sin-limite-bess", action="store_true", help="BESS ideal: potencia requerida para cumplir")
+    p.add_argument("--destino", help="Almacén donde escribir las potencias en el POI y del BESS")
+    p.set_defaults(func=cmd_rampas)
+
+    p = sub.add_parser("recorte", help="Recorte por límite de exportación y barrido límite × BESS")
+    p.add_argument("--almacen", help="Almacén con la FV (kW); por defecto el perfil del escenario")
+    p.add_argument("--desde", help="Inicio de la ventana (ISO 8601, UTC si no lleva zona)")
+    p.add_argument("--hasta", help="Fin de la ventana (exclusivo)")
+    p.add_argument("--columna", default="generacion", help="Columna de la FV en el almacén")
+    p.add_argument("--limites", help="Límites de exportación (kW): '3000,4000' o 'inicio:fin:n'")
+    p.add_argument("--capacidades", help="Capacidades del BESS (kWh): '5000,10000' o 'inicio:fin:n'")
+    p.set_defaults(func=cmd_recorte)
+
+    p = sub.add_parser("estocastico", help="Despacho en dos etapas: programa diario común y VSS")
+    p.add_argument("--escenarios", type=int, default=100, help="Escenarios sintéticos alrededor del perfil")
+    p.add_argument("--paso", default="15min", help="Resolución del programa")
+    p.add_argument("--horizonte", type=float, default=24, help="Horas del programa (escenarios sintéticos)")
+    p.add_argument("--semilla", type=int, default=42)
+    p.add_argument("--almacen", help="Almacén con generacion (y precios): cada día es un escenario")
+    p.add_argument("--almacen-precios", help="Almacén de precios, si están en otro almacén")
+    p.add_argument("--desde", help="Inicio de la ventana (ISO 8601, UTC si no lleva zona)")
+    p.add_argument("--hasta", help="Fin de la ventana (exclusivo)")
+    p.set_defaults(func=cmd_estocastico)
+
+    p = sub.add_parser("reservas", help="Despacho óptimo co-optimizando energía y reservas FCR/aFRR")
+    p.add_argument("--almacen", help="Almacén con precios y generacion (y fcr/afrr en €/MW·h si existen)")
+    p.add_argument("--almacen-precios", help="Almacén de precios, si están en otro almacén")
+    p.add_argument("--desde", help="Inicio de la ventana (ISO 8601, UTC si no lleva zona)")
+    p.add_argument("--hasta", help="Fin de la ventana (exclusivo)")
+    p.add_argument("--paso", default="1h", help="Resolución del despacho")
+    p.add_argument("--sin-comparar", action="store_true", help="No resuelve el despacho solo de energía")
+    p.add_argument("--series", action="store_true", help="Incluye las series horarias del despacho")
+    p.set_defaults(func=cmd_reservas)
+
+    p = sub.add_parser("montecarlo", help="Simulación Monte Carlo del VAN")
+    p.add_argument("--n-sim", type=int, default=10000, help="Número de simulaciones")
+    p.add_argument("--resultados", help="Almacén SQLite donde registrar la ejecución")
+    p.add_argument("--punto-control", help="Directorio de puntos de control: guarda el estado y reanuda si existe")
+    p.add_argument("--intervalo-control", type=float, default=60, help="Segundos entre puntos de control")
+    p.set_defaults(func=cmd_montecarlo)
+
+    p = sub.add_parser("cortocircuito", help="Corrientes de cortocircuito según IEC 60909")
+    p.set_defaults(func=cmd_cortocircuito)
+
+    p = sub.add_parser("transformador", help="Cálculos magnéticos y verificación EMF del transformador")
+    p.set_defaults(func=cmd_transformador)
+
+    p = sub.add_parser("lca", help="Huella de carbono y retorno energético")
+    p.set_defaults(func=cmd_lca)
+
+    p = sub.add_parser("sensibilidad", help="Matriz de sensibilidad del VAN")
+    p.set_defaults(func=cmd_sensibilidad)
+
+    p = sub.add_parser("termico", help="Modelo térmico del contenedor BESS")
+    p.set_defaults(func=cmd_termico)
+
+    for nombre, p in sub.choices.items():
+        p.add_argument("--planta", help="Fichero YAML o JSON con la configuración de la planta")
+        p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+
+    p = sub.add_parser("diagrama", help="Genera el diagrama unifilar")
+    p.add_argument("--planta", help="Fichero YAML o JSON con la configuración de la planta")
+    p.add_argument("--salida", default="diagrama_unifilar_profesional.png", help="Fichero de salida")
+    p.add_argument("--dpi", type=int, default=300)
+    p.add_argument("--formato", default="png", help="png, svg, pdf...")
+    p.set_defaults(func=cmd_diagrama)
+
+    p = sub.add_parser("informe", help="Genera el informe técnico completo en Word")
+    p.add_argument("--planta", help="Fichero YAML o JSON con la configuración de la planta")
+    p.add_argument("--salida", default="Informe_Tecnico_Completo_Actualizado.docx", help="Fichero de salida")
+    p.add_argument("--sin-cache", action="store_true", help="Recalcula todas las secciones del informe")
+    p.add_argument("--cache", default=".cache_informe", help="Directorio de caché de secciones")
+    p.add_argument("--perfil", help="Fichero de perfil por etapas (.json o .trace.json para Chrome)")
+    p.set_defaults(func=cmd_informe)
+
+    p = sub.add_parser("lote", help="Genera un informe por planta en paralelo")
+    p.add_argument("plantas", help="Fichero JSON o YAML con la lista de definiciones de planta")
+    p.add_argument("--salida", default="informes", help="Directorio de salida de los informes")
+    p.add_argument("--procesos", type=int, default=None, help="Número de procesos trabajadores")
+    p.add_argument("--max-tareas", type=int, default=20, help="Informes por trabajador antes de reciclarlo")
+    p.add_argument("--perfil", choices=["json", "chrome"], help="Guarda un perfil por etapas junto a cada informe")
+    p.add_argument("--resultados", help="Almacén SQLite donde registrar las simulaciones de cada planta")
+    p.set_defaults(func=cmd_lote)
+
+    p = sub.add_parser("cartera", help="Simula una cartera de plantas con precios y subestaciones compartidos")
+    p.add_argument("cartera", help="Fichero YAML o JSON con plantas, subestaciones y precios")
+    p.add_argument("--procesos", type=int, default=None, help="Número de procesos trabajadores")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON (incluye cada planta)")
+    p.set_defaults(func=cmd_cartera)
+
+    p = sub.add_parser("resultados", help="Consulta las ejecuciones registradas (mejores por un KPI)")
+    p.add_argument("--db", default="resultados.db", help="Fichero SQLite del almacén")
+    p.add_argument("--donde", action="append", default=[], help="Condición, p. ej. 'capex_eur_kwh<150' (repetible)")
+    p.add_argument("--orden", default="van", help="KPI por el que ordenar")
+    p.add_argument("--ascendente", action="store_true", help="Orden ascendente (por defecto, de mayor a menor)")
+    p.add_argument("--limite", type=int, default=20, help="Número de ejecuciones a mostrar")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    p.set_defaults(func=cmd_resultados)
+    return parser
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos"""
+    args = crear_parser().parse_args(argv)
+    if args.precision:
+        import precision
+        precision.usar(args.precision)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import hashlib
+import itertools
+import json
+import math
+import numbers
+import os
+from dataclasses import dataclass, fields, is_dataclass, replace
+
+# Configuración de planta y escenario. Cada grupo de parámetros es una dataclass inmutable con
+# __slots__: las variantes de un barrido comparten los grupos que no cambian y solo crean los
+# objetos modificados, sin el coste de copiar diccionarios.
+
+def _numero(objeto, nombre):
+    """Valor real del campo; los escalares NumPy se convierten a float de Python"""
+    valor = getattr(objeto, nombre)
+    if isinstance(valor, numbers.Real) and not isinstance(valor, (int, float)):
+        valor = float(valor)
+        object.__setattr__(objeto, nombre, valor)
+    return valor
+
+def _positivo(objeto, *nombres):
+    """Comprueba que los campos indicados son números positivos"""
+    for nombre in nombres:
+        valor = _numero(objeto, nombre)
+        if not (isinstance(valor, (int, float)) and math.isfinite(valor) and valor > 0):
+            raise ValueError(f"{type(objeto).__name__}.{nombre} debe ser positivo (recibido {valor!r})")
+
+def _fraccion(objeto, *nombres):
+    """Comprueba que los campos indicados están en (0, 1]"""
+    for nombre in nombres:
+        valor = _numero(objeto, nombre)
+        if not (isinstance(valor, (int, float)) and 0 < valor <= 1):
+            raise ValueError(f"{type(objeto).__name__}.{nombre} debe estar en (0, 1] (recibido {valor!r})")
+
+def _entero(objeto, nombre, minimo):
+    """Comprueba que el campo es un entero >= minimo (acepta enteros NumPy y los convierte a int)"""
+    valor = getattr(objeto, nombre)
+    if not isinstance(valor, numbers.Integral) or isinstance(valor, bool) or valor < minimo:
+        raise ValueError(f"{type(objeto).__name__}.{nombre} debe ser un entero >= {minimo} (recibido {valor!r})")
+    object.__setattr__(objeto, nombre, int(valor))
+
+@dataclass(frozen=True, slots=True)
+class Fotovoltaica:
+    """Emplazamiento, módulos (JinkoTiger Neo 78TR 625 W) e inversores (Sungrow) del campo FV"""
+    latitud: float = 40.42           # ° (Madrid)
+    longitud: float = -3.70          # ° (este positivo)
+    inclinacion: float = 30          # ° respecto a la horizontal
+    azimut: float = 180              # ° desde el norte (180 = sur)
+    albedo: float = 0.2
+    ratio_dc_ac: float = 1.25        # Potencia pico DC / potencia nominal AC
+    potencia_modulo: float = 625     # Wp
+    eficiencia_modulo: float = 0.226
+    coef_temperatura: float = -0.0029  # 1/°C (Pmax)
+    noct: float = 45                 # °C
+    perdidas_dc: float = 0.03        # Cableado, suciedad y desajustes
+    eficiencia_inversor: float = 0.988
+    degradacion_inicial: float = 0.01  # Primer año
+    degradacion_anual: float = 0.004   # Años siguientes (lineal)
+
+    def __post_init__(self):
+        if not -90 <= self.latitud <= 90 or not -180 <= self.longitud <= 180:
+            raise ValueError("Fotovoltaica: latitud o longitud fuera de rango")
+        if not 0 <= self.inclinacion <= 90:
+            raise ValueError(f"Fotovoltaica.inclinacion debe estar en [0, 90] (recibido {self.inclinacion!r})")
+        _positivo(self, "ratio_dc_ac", "potencia_modulo", "noct")
+        _fraccion(self, "eficiencia_modulo", "eficiencia_inversor")
+        if not 0 <= self.albedo <= 1 or not 0 <= self.perdidas_dc < 1:
+            raise ValueError("Fotovoltaica: albedo y perdidas_dc deben estar en [0, 1)")
+
+@dataclass(frozen=True, slots=True)
+class Red:
+    """Punto de conexión a la red"""
+    limite: float = 5000             # kW (límite en el punto de conexión)
+    potencia_cc: float = 500e6       # VA (potencia de cortocircuito de la red)
+    tension: float = 30e3            # V
+    rampa_max: float = 10            # %/min de la potencia de conexión (código de red)
+
+    def __post_init__(self):
+        _positivo(self, "limite", "potencia_cc", "tension", "rampa_max")
+
+@dataclass(frozen=True, slots=True)
+class Transformador:
+    """Transformador elevador BT/MT"""
+    potencia: float = 5e6            # VA
+    tension_primario: float = 690    # V
+    tension_secundario: float = 30000  # V
+    frecuencia: float = 50           # Hz
+    impedancia: float = 0.06         # p.u.
+
+    def __post_init__(self):
+        _positivo(self, "potencia", "tension_primario", "tension_secundario", "frecuencia")
+        _fraccion(self, "impedancia")
+
+@dataclass(frozen=True, slots=True)
+class Bess:
+    """Sistema de almacenamiento en contenedores"""
+    n_contenedores: int = 4
+    capacidad_contenedor: float = 5000  # kWh
+    potencia: float = 5000           # kW
+    eficiencia: float = 0.92         # Eficiencia round-trip
+    soc_min: float = 0.2
+    soc_max: float = 0.95
+    soc_inicial: float = 0.5
+    impedancia: float = 0.05         # p.u. (IEC 61660-1)
+    ciclos_vida: float = 7000        # Ciclos garantizados a la profundidad dod_ciclos
+    dod_ciclos: float = 0.8
+
+    def __post_init__(self):
+        _entero(self, "n_contenedores", 1)
+        _positivo(self, "capacidad_contenedor", "potencia", "ciclos_vida")
+        _fraccion(self, "eficiencia", "soc_max", "impedancia", "dod_ciclos")
+        if not 0 <= self.soc_min < self.soc_max:
+            raise ValueError(f"Bess.soc_min debe estar en [0, soc_max) (recibido {self.soc_min!r})")
+        if not self.soc_min <= self.soc_inicial <= self.soc_max:
+            raise ValueError(f"Bess.soc_inicial debe estar en [soc_min, soc_max] (recibido {self.soc_inicial!r})")
+
+    @property
+    def capacidad_total(self):
+        """Capacidad total instalada en kWh"""
+        return self.n_contenedores * self.capacidad_contenedor
+
+@dataclass(frozen=True, slots=True)
+class Termico:
+    """Parámetros térmicos de la celda LiFePO4 (CATL EnerOne)"""
+    capacidad_termica: float = 950   # J/kg·K
+    masa_celda: float = 2.8          # kg (306Ah)
+    resistencia_termica: float = 0.45  # K/W
+    t_ambiente: float = 25           # °C
+    t_max_operacion: float = 45      # °C
+
+    def __post_init__(self):
+        _positivo(self, "capacidad_termica", "masa_celda", "resistencia_termica")
+        if self.t_max_operacion <= self.t_ambiente:
+            raise ValueError("Termico.t_max_operacion debe superar la temperatura ambiente")
+
+@dataclass(frozen=True, slots=True)
+class Economia:
+    """Parámetros económicos del proyecto"""
+    capex: float = 2.8e6             # € (140k€/MWh para 20MWh)
+    opex_anual: float = 100000       # €/año
+    vida_util: int = 12              # años
+    tasa_descuento: float = 0.08
+    degradacion_anual: float = 0.0   # Pérdida anual de capacidad (ingresos y energía)
+    ano_aumentacion: int = 0         # Año en que se repone la capacidad (0 = sin aumentación)
+    coste_aumentacion: float = 0.0   # €
+    inflacion_ingresos: float = 0.0
+    inflacion_opex: float = 0.0
+    impuesto_sociedades: float = 0.0
+    fraccion_deuda: float = 0.0      # Parte del CAPEX financiada con deuda
+    tipo_interes: float = 0.05
+    plazo_deuda: int = 10            # años
+
+    def __post_init__(self):
+        _positivo(self, "capex")
+        _entero(self, "vida_util", 1)
+        _entero(self, "plazo_deuda", 1)
+        _entero(self, "ano_aumentacion", 0)
+        if self.opex_anual < 0 or self.coste_aumentacion < 0:
+            raise ValueError("Economia.opex_anual y coste_aumentacion no pueden ser negativos")
+        for nombre in ("tasa_descuento", "inflacion_ingresos", "inflacion_opex", "tipo_interes"):
+            if not -1 < getattr(self, nombre) < 1:
+                raise ValueError(f"Economia.{nombre} fuera de rango (recibido {getattr(self, nombre)!r})")
+        for nombre in ("degradacion_anual", "impuesto_sociedades", "fraccion_deuda"):
+            if not 0 <= getattr(self, nombre) < 1:
+                raise ValueError(f"Economia.{nombre} debe estar en [0, 1) (recibido {getattr(self, nombre)!r})")
+
+@dataclass(frozen=True, slots=True)
+class Escenario:
+    """Perfiles de mercado y generación y umbrales de la estrategia de arbitraje"""
+    # Precios OMIE 2024 actualizados (€/MWh)
+    precios: tuple = (42.3, 40.1, 38.5, 36.2, 34.8, 33.5, 32.1, 31.5, 30.8, 32.5, 36.7, 42.5,
+                      48.2, 55.3, 62.7, 68.9, 74.5, 82.1, 88.7, 85.2, 78.3, 70.5, 65.2, 58.7)
+    # Generación PV para Madrid con datos reales (kW)
+    generacion: tuple = (0, 0, 0, 0, 1250, 2850, 4250, 4950, 5200, 5350, 5450, 5650,
+                         5850, 6050, 5750, 5150, 4650, 3850, 2350, 1050, 450, 0, 0, 0)
+    umbral_carga: float = 40         # €/MWh: se carga por debajo si hay excedente
+    umbral_descarga: float = 65      # €/MWh: se descarga por encima
+    paso_h: float = 1.0              # h: duración de cada paso de los perfiles (0.25 = cuartohorario)
+
+    def __post_init__(self):
+        # Los perfiles se guardan como tuplas (inmutables y hashables)
+        for nombre in ("precios", "generacion"):
+            valor = getattr(self, nombre)
+            if not isinstance(valor, tuple):
+                object.__setattr__(self, nombre, tuple(valor.tolist() if hasattr(valor, "tolist") else valor))
+        if not self.precios or len(self.precios) != len(self.generacion):
+            raise ValueError("Escenario: precios y generacion deben tener la misma longitud (no nula)")
+        if self.umbral_carga >= self.umbral_descarga:
+            raise ValueError("Escenario.umbral_carga debe ser menor que umbral_descarga")
+        _positivo(self, "paso_h")
+
+@dataclass(frozen=True, slots=True)
+class Reservas:
+    """Mercados de reserva de frecuencia: banda simétrica retribuida por disponibilidad"""
+    precio_fcr: float = 12.0         # €/MW por hora de banda FCR (reserva primaria)
+    precio_afrr: float = 14.0        # €/MW por hora de banda aFRR (reserva secundaria)
+    duracion_fcr: float = 0.25       # h de activación completa que debe cubrir la energía almacenada
+    duracion_afrr: float = 1.0       # h
+
+    def __post_init__(self):
+        _positivo(self, "duracion_fcr", "duracion_afrr")
+        for nombre in ("precio_fcr", "precio_afrr"):
+            if getattr(self, nombre) < 0:
+                raise ValueError(f"Reservas.{nombre} no puede ser negativo (recibido {getattr(self, nombre)!r})")
+
+@dataclass(frozen=True, slots=True)
+class Planta:
+    """Configuración completa de planta y escenario"""
+    nombre: str = "Planta PV Madrid 5MW"
+    potencia_pv: float = 5000        # kW
+    n_inversores: int = 5            # Inversores string de 1 MW
+    fotovoltaica: Fotovoltaica = Fotovoltaica()
+    red: Red = Red()
+    transformador: Transformador = Transformador()
+    bess: Bess = Bess()
+    termico: Termico = Termico()
+    economia: Economia = Economia()
+    escenario: Escenario = Escenario()
+    reservas: Reservas = Reservas()
+
+    def __post_init__(self):
+        _positivo(self, "potencia_pv")
+        _entero(self, "n_inversores", 1)
+
+    def huella(self):
+        """Hash estable de la configuración (clave de caché)"""
+        return huella(self)
+
+# Planta de referencia: PV 5 MW en Madrid + BESS 4 × 5 MWh con precios OMIE 2024
+PLANTA_REFERENCIA = Planta()
+
+GRUPOS = {f.name: f.type for f in fields(Planta) if is_dataclass(f.default)}
+
+# Claves planas históricas (ficheros JSON de planta anteriores) → (grupo, campo)
+CLAVES_PLANAS = {
+    "limite_red": ("red", "limite"),
+    "n_contenedores": ("bess", "n_contenedores"),
+    "capacidad_contenedor": ("bess", "capacidad_contenedor"),
+    "potencia_bess": ("bess", "potencia"),
+    "eficiencia": ("bess", "eficiencia"),
+    "soc_min": ("bess", "soc_min"),
+    "soc_max": ("bess", "soc_max"),
+    "capex": ("economia", "capex"),
+    "opex_anual": ("economia", "opex_anual"),
+    "vida_util": ("economia", "vida_util"),
+    "tasa_descuento": ("economia", "tasa_descuento"),
+    "precios": ("escenario", "precios"),
+    "generacion": ("escenario", "generacion"),
+}
+
+def _ruta(ruta):
+    """Descompone 'grupo.campo' (o una clave plana histórica) en (grupo, campo)"""
+    if ruta in CLAVES_PLANAS:
+        return CLAVES_PLANAS[ruta]
+    grupo, _, campo = ruta.partition(".")
+    if campo and grupo not in GRUPOS:
+        raise ValueError(f"Grupo de configuración desconocido: '{grupo}'")
+    return grupo, campo
+
+def _reemplazar(objeto, cambios):
+    """dataclasses.replace con un mensaje de error propio para parámetros desconocidos"""
+    try:
+        return replace(objeto, **cambios)
+    except TypeError as e:
+        raise ValueError(f"Parámetro desconocido en {type(objeto).__name__}: {e}") from None
+
+def variante(planta, cambios):
+    """Crea una variante con cambios {'grupo.campo' o 'campo': valor}, reutilizando los grupos intactos"""
+    por_grupo, directos = {}, {}
+    for ruta, valor in cambios.items():
+        grupo, campo = _ruta(ruta)
+        if campo:
+            por_grupo.setdefault(grupo, {})[campo] = valor
+        elif grupo in GRUPOS and isinstance(valor, dict):
+            por_grupo.setdefault(grupo, {}).update(valor)
+        else:
+            directos[grupo] = valor
+    for grupo, valores in por_grupo.items():
+        directos[grupo] = _reemplazar(getattr(planta, grupo), valores)
+    return _reemplazar(planta, directos)
+
+def desde_dict(datos, base=PLANTA_REFERENCIA):
+    """Construye una Planta desde un diccionario anidado ({'bess': {...}}) o con claves planas"""
+    return variante(base, datos or {})
+
+def a_dict(planta):
+    """Convierte la configuración en un diccionario anidado serializable"""
+    if is_dataclass(planta):
+        return {f.name: a_dict(getattr(planta, f.name)) for f in fields(planta)}
+    if isinstance(planta, tuple):
+        return list(planta)
+    return planta
+
+def huella(objeto):
+    """Hash SHA-256 estable de una configuración, grupo o diccionario de ellos"""
+    def canonico(valor):
+        if is_dataclass(valor):
+            return {"__tipo__": type(valor).__name__, **{f.name: canonico(getattr(valor, f.name)) for f in fields(valor)}}
+        if isinstance(valor, dict):
+            return {str(k): canonico(v) for k, v in valor.items()}
+        if isinstance(valor, (list, tuple)):
+            return [canonico(v) for v in valor]
+        if hasattr(valor, "tolist"):
+            return canonico(valor.tolist())   # Arrays y escalares NumPy
+        if isinstance(valor, float) and valor.is_integer():
+            return int(valor)   # 5000 y 5000.0 generan la misma huella
+        return valor
+    texto = json.dumps(canonico(objeto), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def _grupo_barrido(objeto, rutas, indices, valores):
+    """Construye un grupo aplicando en orden los valores de sus rutas (campo o grupo entero)
+
+    Como en variante, un diccionario para el grupo entero se fusiona con el grupo; un objeto
+    del grupo lo sustituye.
+    """
+    cambios = {}
+    for i in indices:
+        campo, valor = rutas[i][1], valores[i]
+        if campo:
+            cambios[campo] = valor
+        elif isinstance(valor, dict):
+            cambios.update(valor)
+        else:
+            objeto, cambios = valor, {}
+    return _reemplazar(objeto, cambios)
+
+def _clave_memo(valores):
+    """Clave de la memoria de grupos: los valores si son hashables, su huella si no (series)"""
+    try:
+        hash(valores)
+        return valores
+    except TypeError:
+        return huella(list(valores))
+
+def barrido(base, rejilla):
+    """Genera perezosamente las variantes del producto cartesiano {'grupo.campo': valores}
+
+    Cada combinación distinta de valores de un grupo se construye una sola vez y se comparte
+    entre todas las variantes que la usan; por variante solo se crea el objeto Planta.
+    """
+    rutas = [_ruta(r) for r in rejilla]
+    grupos = {}
+    for i, (grupo, campo) in enumerate(rutas):
+        if campo or grupo in GRUPOS:
+            grupos.setdefault(grupo, []).append(i)
+    directos = [i for i, (grupo, campo) in enumerate(rutas) if not campo and grupo not in GRUPOS]
+    construidos = {}
+    for valores in itertools.product(*rejilla.values()):
+        cambios = {rutas[i][0]: valores[i] for i in directos}
+        for grupo, indices in grupos.items():
+            clave = (grupo, _clave_memo(tuple(valores[i] for i in indices)))
+            objeto = construidos.get(clave)
+            if objeto is None:
+                objeto = _grupo_barrido(getattr(base, grupo), rutas, indices, valores)
+                construidos[clave] = objeto
+            cambios[grupo] = objeto
+        yield _reemplazar(base, cambios)
+
+def _cargador_yaml():
+    """SafeLoader que también reconoce como float la notación 4.2e6 (YAML 1.1 exige 4.2e+6)"""
+    import re
+    import yaml
+
+    class Cargador(yaml.SafeLoader):
+        pass
+
+    Cargador.add_implicit_resolver(
+        "tag:yaml.org,2002:float",
+        re.compile(r"^[-+]?(?:[0-9][0-9_]*)?(?:\.[0-9_]*)?[eE][-+]?[0-9]+$"),
+        list("-+0123456789."))
+    return Cargador
+
+def cargar_datos(ruta):
+    """Lee un fichero YAML (.yaml/.yml) o JSON"""
+    with open(ruta, encoding="utf-8") as f:
+        if os.path.splitext(ruta)[1].lower() in (".yaml", ".yml"):
+            import yaml
+            return yaml.load(f, Loader=_cargador_yaml())
+        return json.load(f)
+
+def cargar_configuracion(ruta):
+    """Carga una configuración de planta desde YAML o JSON"""
+    return desde_dict(cargar_datos(ruta))
@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import flujo_caja
+from configuracion import variante
+from modelos import definir_planta, simular_arbitraje
+from resultados import series_arbitraje
+
+# Modo interactivo para Jupyter: controles (ipywidgets) sobre los parámetros clave y una figura
+# cuyos artistas se actualizan en su sitio (set_data / set_ydata) en lugar de redibujarse. Los
+# artistas que cambian se dibujan sobre un fondo guardado (ejes, marcas, serie de precios) y solo
+# se vuelcan sus píxeles (blitting); la figura completa solo se redibuja si cambia la escala.
+# Cada control declara qué etapas invalida: el CAPEX solo rehace la evaluación económica a partir
+# de los ingresos ya calculados; umbrales, contenedores y eficiencia rehacen el despacho, que se
+# memoriza por combinación de valores (volver a un valor anterior no recalcula nada). Los
+# movimientos rápidos de un control se agrupan (antirrebote) y se calculan una sola vez.
+# Requiere el backend interactivo de matplotlib en el cuaderno (%matplotlib widget, ipympl).
+
+# Control: (parámetro de la configuración, etapas que invalida, (mínimo, máximo, paso), etiqueta)
+PARAMETROS = {
+    "capex": ("economia.capex", ("economia",), (500_000, 6_000_000, 50_000), "CAPEX (€)"),
+    "umbral_carga": ("escenario.umbral_carga", ("despacho", "economia"), (0, 120, 1), "Carga bajo (€/MWh)"),
+    "umbral_descarga": ("escenario.umbral_descarga", ("despacho", "economia"), (0, 200, 1), "Descarga sobre (€/MWh)"),
+    "n_contenedores": ("bess.n_contenedores", ("despacho", "economia"), (1, 12, 1), "Contenedores"),
+    "eficiencia": ("bess.eficiencia", ("despacho", "economia"), (0.70, 0.99, 0.01), "Eficiencia round-trip"),
+}
+ESPERA_MS = 150          # Antirrebote: cambios separados por menos de este tiempo se agrupan
+DESPACHOS_EN_CACHE = 64  # Despachos memorizados (cada uno son unas pocas series de un año)
+MARGEN_ESCALA = 0.25     # Holgura del eje del flujo de caja (fracción del rango) para no reescalar en cada cambio
+DINAMICOS = ("umbral_carga", "umbral_descarga", "soc", "caja", "texto")   # Artistas que se redibujan
+
+def _valor(planta, ruta):
+    """Valor actual de un parámetro 'grupo.campo' de la planta"""
+    grupo, campo = ruta.split(".")
+    return getattr(getattr(planta, grupo), campo)
+
+class _Antirrebote:
+    """Acumula cambios y llama a la acción una vez cuando pasan espera_ms sin cambios nuevos
+
+    Dentro del kernel de Jupyter usa su bucle asyncio (la acción corre en el hilo del kernel,
+    donde es seguro tocar los widgets y la figura); fuera de él, un temporizador de threading.
+    """
+
+    def __init__(self, espera_ms, accion):
+        self.espera = espera_ms / 1000
+        self.accion = accion
+        self.pendientes = {}
+        self._temporizador = None
+        self._bloqueo = threading.Lock()
+
+    def __call__(self, **cambios):
+        with self._bloqueo:
+            self.pendientes.update(cambios)
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+            try:
+                self._temporizador = asyncio.get_running_loop().call_later(self.espera, self._disparar)
+            except RuntimeError:
+                self._temporizador = threading.Timer(self.espera, self._disparar)
+                self._temporizador.start()
+
+    def _disparar(self):
+        with self._bloqueo:
+            cambios, self.pendientes, self._temporizador = self.pendientes, {}, None
+        if cambios:
+            self.accion(**cambios)
+
+class Cuaderno:
+    """Estado del modo interactivo: planta, resultados intermedios por etapa y artistas de la figura"""
+
+    def __init__(self, planta=None, espera_ms=ESPERA_MS):
+        self.planta = definir_planta(planta)
+        self.espera_ms = espera_ms
+        self._despachos = OrderedDict()
+        self.series = self.kpis = self.economia = None
+        self.tiempos_ms = {}
+        self.figura = None
+        self.artistas = {}
+        self._fondo = None
+        self._estado = None
+        self._recalcular({"despacho", "economia"})
+
+    def valores(self):
+        """Valores actuales de los controles"""
+        return {nombre: _valor(self.planta, ruta) for nombre, (ruta, _, _, _) in PARAMETROS.items()}
+
+    def _recalcular(self, etapas):
+        """Rehace las etapas indicadas reutilizando los resultados intermedios de las demás"""
+        if "despacho" in etapas:
+            inicio = time.perf_counter()
+            clave = tuple(v for n, v in self.valores().items() if "despacho" in PARAMETROS[n][1])
+            if clave in self._despachos:
+                self._despachos.move_to_end(clave)
+            else:
+                operaciones, kpis = simular_arbitraje(self.planta)
+                self._despachos[clave] = (series_arbitraje(operaciones, self.planta.bess.n_contenedores), kpis)
+                if len(self._despachos) > DESPACHOS_EN_CACHE:
+                    self._despachos.popitem(last=False)
+            self.series, self.kpis = self._despachos[clave]
+            self.tiempos_ms["despacho"] = (time.perf_counter() - inicio) * 1000
+        if "economia" in etapas:
+            inicio = time.perf_counter()
+            economia = self.planta.economia
+            ingresos, energia = self.kpis["ingresos_anuales"], self.kpis["energia_descargada_mwh_ano"]
+            indicadores = flujo_caja.evaluar_economia(economia, ingresos, energia=energia)
+            parametros = flujo_caja.parametros_economia(economia)
+            tasa = parametros.pop("tasa")
+            flujos = flujo_caja.flujos_caja(ingresos=ingresos, energia=energia, **parametros)["proyecto"][0]
+            descontados = flujos / (1 + tasa) ** np.arange(len(flujos))
+            self.economia = {**{k: float(v[0]) for k, v in indicadores.items()},
+                             "flujo_descontado_acumulado": np.cumsum(descontados)}
+            self.tiempos_ms["economia"] = (time.perf_counter() - inicio) * 1000
+
+    def actualizar(self, **cambios):
+        """Aplica cambios de los controles, recalcula solo las etapas afectadas y refresca la figura"""
+        inicio = time.perf_counter()
+        actuales = self.valores()
+        cambios = {n: v for n, v in cambios.items() if v != actuales[n]}
+        etapas = {e for n in cambios for e in PARAMETROS[n][1]}
+        self.tiempos_ms = {}
+        if cambios:
+            self.planta = variante(self.planta, {PARAMETROS[n][0]: v for n, v in cambios.items()})
+            self._recalcular(etapas)
+            self.tiempos_ms["calculo"] = (time.perf_counter() - inicio) * 1000
+            self.refrescar()
+        self.tiempos_ms["total"] = (time.perf_counter() - inicio) * 1000
+        return self.indicadores()
+
+    def indicadores(self):
+        """Indicadores del estado actual (despacho y economía)"""
+        return {
+            "ingresos_anuales": self.kpis["ingresos_anuales"],
+            "energia_descargada_mwh_ano": self.kpis["energia_descargada_mwh_ano"],
+            "reduccion_curtailment_pct": self.kpis["reduccion_curtailment_pct"],
+            "van": self.economia["van"],
+            "tir": self.economia["tir"],
+            "payback_anos": self.economia["payback"],
+            "lcos": self.economia["lcos"]
+        }
+
+    def _texto(self):
+        """Resumen de una línea para la figura"""
+        i = self.indicadores()
+        tir = "n/d" if np.isnan(i["tir"]) else f"{i['tir']:.1%}"
+        return (f"VAN {i['van'] / 1e6:.2f} M€ · TIR {tir} · ingresos {i['ingresos_anuales'] / 1e3:,.0f} k€/año · "
+                f"descarga {i['energia_descargada_mwh_ano']:,.0f} MWh/año")
+
+    def crear_figura(self):
+        """Figura con precio y umbrales, SOC medio y flujo de caja descontado acumulado"""
+        import matplotlib.pyplot as plt
+        fig, (ax_precio, ax_soc, ax_caja) = plt.subplots(3, 1, figsize=(11, 8))
+        dias = np.arange(len(self.series["soc_pct"])) * self.planta.escenario.paso_h / 24
+        ax_precio.plot(dias, self.series["precio_eur_mwh"], color="tab:gray", linewidth=0.6)
+        escenario = self.planta.escenario
+        self.artistas["umbral_carga"] = ax_precio.axhline(escenario.umbral_carga, color="tab:green", label="Carga")
+        self.artistas["umbral_descarga"] = ax_precio.axhline(escenario.umbral_descarga, color="tab:red",
+                                                             label="Descarga")
+        ax_precio.set_ylabel("€/MWh")
+        ax_precio.legend(loc="upper right")
+        self.artistas["soc"], = ax_soc.plot(dias, self.series["soc_pct"], color="tab:blue", linewidth=0.6)
+        ax_soc.set_ylim(0, 100)
+        ax_soc.set_ylabel("SOC medio (%)")
+        ax_soc.set_xlabel("Día")
+        flujo = self.economia["flujo_descontado_acumulado"] / 1e6
+        self.artistas["caja"], = ax_caja.plot(np.arange(len(flujo)), flujo, marker="o", color="tab:orange")
+        ax_caja.axhline(0, color="black", linewidth=0.8)
+        ax_caja.set_ylabel("Flujo descontado acumulado (M€)")
+        ax_caja.set_xlabel("Año")
+        self.artistas["texto"] = fig.suptitle(self._texto())
+        # Los artistas dinámicos no forman parte del fondo: se dibujan tras cada dibujado completo
+        for nombre in DINAMICOS:
+            self.artistas[nombre].set_animated(True)
+        self._escalar_caja(flujo)
+        # Márgenes fijos: un gestor de diseño recalcularía la maquetación en cada redibujado
+        fig.tight_layout()
+        fig.canvas.mpl_connect("draw_event", self._tras_dibujo)
+        self.figura = fig
+        return fig
+
+    def _escalar_caja(self, flujo):
+        """Ajusta el eje del flujo de caja con holgura para que los cambios pequeños quepan sin reescalar"""
+        minimo, maximo = min(float(flujo.min()), 0.0), max(float(flujo.max()), 0.0)
+        holgura = MARGEN_ESCALA * max(maximo - minimo, 1e-3)
+        eje = self.artistas["caja"].axes
+        eje.set_xlim(-0.5, len(flujo) - 0.5)
+        eje.set_ylim(minimo - holgura, maximo + holgura)
+
+    def _tras_dibujo(self, evento):
+        """Tras un dibujado completo guarda el fondo (sin los artistas dinámicos) y los dibuja encima
+
+        También se llama al guardar la figura (savefig), que así incluye los artistas dinámicos.
+        """
+        canvas = self.figura.canvas
+        # Al guardar (otra resolución, otro fondo) no se sustituye el fondo de la pantalla
+        if canvas.supports_blit and not getattr(canvas, "_is_saving", False):
+            self._fondo = canvas.copy_from_bbox(self.figura.bbox)
+        for nombre in DINAMICOS:
+            self.artistas[nombre].draw(evento.renderer)
+
+    def refrescar(self):
+        """Actualiza los artistas dinámicos y vuelca solo sus píxeles sobre el fondo guardado
+
+        Si el flujo de caja sale del eje (o el lienzo no admite blitting) se pide un redibujado
+        completo. El tiempo de dibujo queda en tiempos_ms["dibujo"].
+        """
+        if self.figura is None:
+            return
+        inicio = time.perf_counter()
+        escenario = self.planta.escenario
+        self.artistas["umbral_carga"].set_ydata([escenario.umbral_carga] * 2)
+        self.artistas["umbral_descarga"].set_ydata([escenario.umbral_descarga] * 2)
+        self.artistas["soc"].set_ydata(self.series["soc_pct"])
+        flujo = self.economia["flujo_descontado_acumulado"] / 1e6
+        self.artistas["caja"].set_data(np.arange(len(flujo)), flujo)
+        self.artistas["texto"].set_text(self._texto())
+        canvas = self.figura.canvas
+        inferior, superior = self.artistas["caja"].axes.get_ylim()
+        if self._fondo is None or min(flujo.min(), 0) < inferior or max(flujo.max(), 0) > superior:
+            self._escalar_caja(flujo)
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self._fondo)
+            for nombre in DINAMICOS:
+                self.figura.draw_artist(self.artistas[nombre])
+            canvas.blit(self.figura.bbox)
+        self.tiempos_ms["dibujo"] = (time.perf_counter() - inicio) * 1000
+
+    def controles(self):
+        """Controles ipywidgets enlazados al cuaderno (con antirrebote) y una línea de estado"""
+        import ipywidgets as widgets
+        estado = widgets.Label()
+        self._estado = estado
+
+        def aplicar(**cambios):
+            try:
+                self.actualizar(**cambios)
+            except ValueError as e:
+                estado.value = f"Valor no válido: {e}"
+                return
+            estado.value = " · ".join(f"{etapa} {ms:.0f} ms" for etapa, ms in self.tiempos_ms.items())
+
+        antirrebote = _Antirrebote(self.espera_ms, aplicar)
+        lista = []
+        for nombre, valor in self.valores().items():
+            _, _, (minimo, maximo, paso), etiqueta = PARAMETROS[nombre]
+            clase = widgets.IntSlider if isinstance(valor, int) else widgets.FloatSlider
+            control = clase(value=valor, min=minimo, max=maximo, step=paso, description=etiqueta,
+                            style={"description_width": "initial"}, layout=widgets.Layout(width="420px"))
+            control.observe(lambda cambio, n=nombre: antirrebote(**{n: cambio["new"]}), names="value")
+            lista.append(control)
+        return widgets.VBox(lista + [estado])
+
+    def mostrar(self):
+        """Muestra controles y figura en el cuaderno; devuelve el contenedor de widgets"""
+        import ipywidgets as widgets
+        from IPython.display import display
+        fig = self.figura or self.crear_figura()
+        panel = self.controles()
+        # Con ipympl el lienzo es un widget y se coloca junto a los controles
+        caja = widgets.VBox([panel, fig.canvas]) if isinstance(fig.canvas, widgets.DOMWidget) else panel
+        display(caja)
+        return caja
+
+def cuaderno(planta=None, almacen=None, desde=None, hasta=None, paso="1h", mostrar=True):
+    """Crea el modo interactivo para una planta (o una ventana de un almacén) y lo muestra"""
+    if almacen:
+        from series_temporales import planta_desde_almacen
+        planta = planta_desde_almacen(almacen, desde, hasta, planta, paso=paso)
+    resultado = Cuaderno(planta)
+    if mostrar:
+        resultado.mostrar()
+    return resultado
+
+def medir_latencia(sesion, pasos=5):
+    """Latencia (ms) de mover cada control por `pasos` valores nuevos
+
+    Se vacía la caché de despachos para medir el caso sin memorizar. Con un lienzo no
+    interactivo (Agg) el dibujo es síncrono, así que la medida lo incluye; tiempos_ms desglosa
+    cálculo y dibujo de la última actualización. Devuelve {control: [(total, cálculo, dibujo)]}.
+    """
+    sesion._despachos.clear()
+    latencias = {}
+    for nombre, valor in sesion.valores().items():
+        _, _, (minimo, maximo, paso), _ = PARAMETROS[nombre]
+        medidas = []
+        for k in range(1, pasos + 1):
+            nuevo = min(maximo, valor + k * paso) if k % 2 else max(minimo, valor - k * paso)
+            try:
+                sesion.actualizar(**{nombre: type(valor)(nuevo)})
+            except ValueError:
+                continue   # Combinación no válida (p. ej. umbral de carga por encima del de descarga)
+            tiempos = sesion.tiempos_ms
+            medidas.append((tiempos["total"], tiempos["calculo"], tiempos.get("dibujo", 0.0)))
+        sesion.actualizar(**{nombre: valor})
+        latencias[nombre] = medidas
+    return latencias
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del modo interactivo (sin navegador)")
+    parser.add_argument("--planta", help="Configuración de planta (YAML o JSON)")
+    parser.add_argument("--almacen", help="Almacén con precios y generacion (p. ej. un año horario)")
+    parser.add_argument("--desde")
+    parser.add_argument("--hasta")
+    parser.add_argument("--pasos", type=int, default=5, help="Valores nuevos por control")
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use("Agg")
+    from configuracion import cargar_configuracion
+    planta = cargar_configuracion(args.planta) if args.planta else None
+    sesion = cuaderno(planta, args.almacen, args.desde, args.hasta, mostrar=False)
+    sesion.crear_figura().canvas.draw()
+    print(f"{'Control':<16} {'total (med/máx)':>17} {'cálculo (med/máx)':>19} {'dibujo (med/máx)':>18}  ms")
+    for nombre, medidas in medir_latencia(sesion, args.pasos).items():
+        if medidas:
+            columnas = [f"{statistics.median(c):7.1f} /{max(c):7.1f}" for c in zip(*medidas)]
+            print(f"{nombre:<16} {columnas[0]:>17} {columnas[1]:>19} {columnas[2]:>18}")
@@ -0,0 +1,381 @@
+import argparse
+import time
+
+import numpy as np
+from scipy.optimize import linprog
+from scipy.signal import lfilter
+from scipy.sparse import coo_matrix
+
+from modelos import definir_planta
+
+# Despacho óptimo del BESS como programa lineal disperso resuelto con HiGHS. Las matrices se
+# montan con aritmética de índices sobre arrays (una columna por variable y paso, en bloques
+# por escenario), sin bucles de Python por restricción.
+#
+# Despacho estocástico en dos etapas: el programa del mercado diario (exportación comprometida
+# en cada paso) es común a todos los escenarios de precio y FV; en cada escenario se ajustan
+# carga, descarga, vertido y desvíos, que se liquidan con penalización. El valor de la solución
+# estocástica (VSS) compara el programa estocástico con el que se obtendría del escenario medio.
+#
+# Co-optimización de energía y reservas: en cada paso el BESS reparte su potencia entre el
+# arbitraje y bandas simétricas de FCR y aFRR. La banda ofertada debe caber en la potencia libre
+# en ambos sentidos y en la energía almacenada (activación completa durante la duración del
+# producto al principio y al final del paso). Se supone que la energía activada es neutra en
+# media, así que solo se retribuye la disponibilidad.
+
+PENALIZACION_DESVIO = 0.25     # Desvíos: excedente a precio − p·|precio|, déficit a precio + p·|precio|
+COSTE_DEGRADACION = 2.0        # €/MWh cargado o descargado (evita ciclos sin beneficio)
+ESCENARIOS_POR_TANDA = 25      # Problemas separables por escenario: escenarios por LP
+PRODUCTOS = ("fcr", "afrr")    # Bandas de reserva (precio y duración en planta.reservas)
+
+class _Sistema:
+    """Restricciones lineales en forma dispersa, añadidas por bloques de filas"""
+
+    def __init__(self):
+        self.filas, self.columnas, self.valores, self.rhs = [], [], [], []
+        self.n = 0
+
+    def anadir(self, terminos, rhs):
+        """Añade len(rhs) filas; cada término es (columnas, coeficiente), con columna -1 = ausente"""
+        rhs = np.asarray(rhs, dtype=np.float64).ravel()
+        filas = self.n + np.arange(len(rhs))
+        for columnas, coeficiente in terminos:
+            columnas = np.asarray(columnas).ravel()
+            coeficiente = np.broadcast_to(np.asarray(coeficiente, dtype=np.float64).ravel()
+                                          if np.ndim(coeficiente) else coeficiente, columnas.shape)
+            presente = columnas >= 0
+            self.filas.append(filas[presente])
+            self.columnas.append(columnas[presente])
+            self.valores.append(coeficiente[presente])
+        self.rhs.append(rhs)
+        self.n += len(rhs)
+
+    def matriz(self, n_columnas):
+        """(A, b) en CSR; (None, None) si no hay filas"""
+        if not self.n:
+            return None, None
+        a = coo_matrix((np.concatenate(self.valores), (np.concatenate(self.filas), np.concatenate(self.columnas))),
+                       shape=(self.n, n_columnas)).tocsr()
+        return a, np.concatenate(self.rhs)
+
+def _resolver(c, desigualdades, igualdades, inferior, superior):
+    """Resuelve min c·x con HiGHS; devuelve (x, valor objetivo)"""
+    n = len(c)
+    a_ub, b_ub = desigualdades.matriz(n)
+    a_eq, b_eq = igualdades.matriz(n)
+    resultado = linprog(c, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq,
+                        bounds=np.column_stack((inferior, superior)), method="highs")
+    if resultado.status != 0:
+        raise RuntimeError(f"El despacho óptimo no tiene solución: {resultado.message}")
+    return resultado.x, resultado.fun
+
+def _parametros_bess(planta):
+    """Potencia, límites de energía, energía inicial y eficiencias de carga y descarga del BESS"""
+    bess = planta.bess
+    eficiencia = np.sqrt(bess.eficiencia)
+    return {"potencia": bess.potencia, "e_min": bess.capacidad_total * bess.soc_min,
+            "e_max": bess.capacidad_total * bess.soc_max, "e_inicial": bess.capacidad_total * bess.soc_inicial,
+            "carga": eficiencia, "descarga": eficiencia}
+
+def generar_escenarios(planta=None, n=100, paso_h=0.25, horizonte_h=24, sigma_precio=0.2, sigma_fv=0.25,
+                       correlacion=0.9, semilla=42):
+    """Escenarios de precio y FV alrededor de las primeras horizonte_h horas del perfil de la planta
+
+    Perturbaciones multiplicativas con autocorrelación AR(1) entre pasos (recurrencia lineal
+    aplicada a todos los escenarios a la vez). Devuelve (precios, generacion, probabilidades)
+    con forma (escenarios × pasos).
+    """
+    from series_temporales import remuestrear_conservativo
+    planta = definir_planta(planta)
+    escenario = planta.escenario
+    paso_origen, paso_destino = round(escenario.paso_h * 3600), round(paso_h * 3600)
+    precios = remuestrear_conservativo(np.asarray(escenario.precios, dtype=np.float64), paso_origen, paso_destino)
+    generacion = remuestrear_conservativo(np.asarray(escenario.generacion, dtype=np.float64), paso_origen,
+                                          paso_destino)
+    n_pasos = round(horizonte_h / paso_h)
+    precios, generacion = precios[:n_pasos], generacion[:n_pasos]
+    rng = np.random.default_rng(semilla)
+    escala = np.sqrt(1 - correlacion ** 2)
+    forma = (n, len(precios))
+
+    def ruido(sigma):
+        return sigma * lfilter([escala], [1, -correlacion], rng.standard_normal(forma), axis=1)
+
+    precios = precios * np.exp(ruido(sigma_precio) - sigma_precio ** 2 / 2)
+    generacion = np.clip(generacion * (1 + ruido(sigma_fv)), 0, planta.potencia_pv)
+    return precios, generacion, np.full(n, 1 / n)
+
+def escenarios_almacen(directorio, desde=None, hasta=None, paso="15min", almacen_precios=None):
+    """Cada día completo de una ventana del almacén como escenario equiprobable"""
+    from series_temporales import segundos, ventana
+    _, datos = ventana(directorio, desde, hasta, ["generacion"], paso=paso)
+    _, datos_precios = ventana(almacen_precios or directorio, desde, hasta, ["precios"], paso=paso)
+    por_dia = 86400 // segundos(paso)
+    n = min(len(datos["generacion"]), len(datos_precios["precios"])) // por_dia
+    precios = np.asarray(datos_precios["precios"][:n * por_dia], dtype=np.float64).reshape(n, por_dia)
+    generacion = np.asarray(datos["generacion"][:n * por_dia], dtype=np.float64).reshape(n, por_dia)
+    completos = ~(np.isnan(precios).any(axis=1) | np.isnan(generacion).any(axis=1))
+    if not completos.any():
+        raise ValueError("La ventana no contiene ningún día completo de precio y generación")
+    return precios[completos], generacion[completos], np.full(completos.sum(), 1 / completos.sum())
+
+def _precios_desvio(precios):
+    """Precios (€/MWh) a los que se liquidan el excedente y el déficit sobre el programa"""
+    margen = PENALIZACION_DESVIO * np.abs(precios)
+    return precios - margen, precios + margen
+
+def _dos_etapas(precios, generacion, probabilidades, planta, paso_h, compartida=True, programa=None):
+    """Monta y resuelve el LP de dos etapas
+
+    compartida=True: un programa común (problema estocástico); False: un programa por escenario
+    (información perfecta). Con programa se fija la primera etapa (evaluación de un programa dado).
+    Devuelve (programas (escenarios o 1 × pasos), ingresos esperados, ingresos por escenario).
+    """
+    n_esc, n_pasos = precios.shape
+    b = _parametros_bess(planta)
+    limite = planta.red.limite
+    # Columnas: por escenario y variable, bloques de n_pasos; al final los programas (1 o n_esc)
+    variables = ("carga", "descarga", "vertido", "excedente", "deficit", "energia")
+    t = np.arange(n_pasos)
+    s = np.arange(n_esc)[:, None]
+    col = {v: (s * len(variables) + k) * n_pasos + t for k, v in enumerate(variables)}
+    base_programa = n_esc * len(variables) * n_pasos
+    col["programa"] = base_programa + (np.broadcast_to(t, (n_esc, n_pasos)) if compartida else s * n_pasos + t)
+    n_columnas = base_programa + (1 if compartida else n_esc) * n_pasos
+
+    # Objetivo (mínimo de −ingresos esperados, en €): mercado diario, desvíos y degradación
+    euros = paso_h / 1000 * probabilidades[:, None]
+    c = np.zeros(n_columnas)
+    np.add.at(c, col["programa"].ravel(), (-precios * euros).ravel())
+    # Los desvíos se liquidan peor que el diario también con precios negativos: el excedente
+    # cobra precio − p·|precio| y el déficit paga precio + p·|precio| (desviarse en los dos
+    # sentidos a la vez nunca es rentable y el LP queda acotado)
+    precio_excedente, precio_deficit = _precios_desvio(precios)
+    c[col["excedente"].ravel()] = (-precio_excedente * euros).ravel()
+    c[col["deficit"].ravel()] = (precio_deficit * euros).ravel()
+    c[col["carga"].ravel()] = c[col["descarga"].ravel()] = (COSTE_DEGRADACION * euros * np.ones((1, n_pasos))).ravel()
+
+    igualdades, desigualdades = _Sistema(), _Sistema()
+    # Balance: FV − vertido − carga + descarga = programa + excedente − déficit
+    igualdades.anadir([(col["vertido"], -1), (col["carga"], -1), (col["descarga"], 1), (col["programa"], -1),
+                       (col["excedente"], -1), (col["deficit"], 1)], -generacion)
+    # Energía almacenada: e_t − e_{t−1} − ηc·Δt·carga + Δt/ηd·descarga = (e_inicial en t = 0)
+    anterior = np.where(t > 0, col["energia"] - 1, -1)
+    igualdades.anadir([(col["energia"], 1), (anterior, -1), (col["carga"], -b["carga"] * paso_h),
+                       (col["descarga"], paso_h / b["descarga"])],
+                      np.where(t == 0, b["e_inicial"], 0.0) * np.ones((n_esc, 1)))
+    # Exportación real entre 0 y el límite de conexión; energía final no inferior a la inicial
+    exportacion = [(col["programa"], 1), (col["excedente"], 1), (col["deficit"], -1)]
+    desigualdades.anadir(exportacion, np.full((n_esc, n_pasos), limite))
+    desigualdades.anadir([(columnas, -coef) for columnas, coef in exportacion], np.zeros((n_esc, n_pasos)))
+    desigualdades.anadir([(col["energia"][:, -1], -1)], np.full(n_esc, -b["e_inicial"]))
+
+    inferior, superior = np.zeros(n_columnas), np.full(n_columnas, np.inf)
+    for v in ("carga", "descarga"):
+        superior[col[v].ravel()] = b["potencia"]
+    superior[col["vertido"].ravel()] = generacion.ravel()
+    superior[col["excedente"].ravel()] = superior[col["deficit"].ravel()] = limite
+    inferior[col["energia"].ravel()], superior[col["energia"].ravel()] = b["e_min"], b["e_max"]
+    superior[base_programa:] = limite
+    if programa is not None:
+        inferior[col["programa"].ravel()] = superior[col["programa"].ravel()] = np.broadcast_to(
+            programa, (n_esc, n_pasos)).ravel()
+
+    x, objetivo = _resolver(c, desigualdades, igualdades, inferior, superior)
+    # Ingresos de cada escenario con su solución (sin ponderar por la probabilidad)
+    ingresos = -(x[col["programa"]] * precios * paso_h / 1000
+                 + x[col["excedente"]] * precio_excedente * paso_h / 1000
+                 - x[col["deficit"]] * precio_deficit * paso_h / 1000
+                 - COSTE_DEGRADACION * (x[col["carga"]] + x[col["descarga"]]) * paso_h / 1000).sum(axis=1)
+    programas = x[base_programa:].reshape(-1, n_pasos)
+    return programas, -objetivo, -ingresos
+
+def _por_tandas(precios, generacion, probabilidades, planta, paso_h, programa, tanda):
+    """Problemas separables por escenario (programa fijo o uno por escenario), resueltos por tandas"""
+    programas, ingresos = [], []
+    for i in range(0, len(precios), tanda):
+        sel = slice(i, i + tanda)
+        p, _, r = _dos_etapas(precios[sel], generacion[sel], probabilidades[sel], planta, paso_h,
+                              compartida=False, programa=programa)
+        programas.append(p)
+        ingresos.append(r)
+    return np.concatenate(programas), np.concatenate(ingresos)
+
+def despacho_estocastico(precios, generacion, probabilidades=None, planta=None, paso_h=0.25,
+                         tanda=ESCENARIOS_POR_TANDA):
+    """Despacho en dos etapas con el programa diario común a todos los escenarios
+
+    Resuelve el problema estocástico (RP, forma extensiva), el del escenario medio (EV) evaluado
+    en todos los escenarios (EEV) y el de información perfecta (WS). Devuelve el programa, los
+    ingresos esperados de cada uno, VSS = RP − EEV y EVPI = WS − RP (€ del horizonte).
+    """
+    planta = definir_planta(planta)
+    precios, generacion = np.atleast_2d(precios).astype(np.float64), np.atleast_2d(generacion).astype(np.float64)
+    n = len(precios)
+    probabilidades = np.full(n, 1 / n) if probabilidades is None else np.asarray(probabilidades, dtype=np.float64)
+    probabilidades = probabilidades / probabilidades.sum()
+
+    inicio = time.perf_counter()
+    programa, rp, ingresos_rp = _dos_etapas(precios, generacion, probabilidades, planta, paso_h)
+    tiempo_rp = time.perf_counter() - inicio
+    medio = probabilidades @ precios, probabilidades @ generacion
+    programa_ev, _, _ = _dos_etapas(medio[0][None], medio[1][None], np.ones(1), planta, paso_h)
+    _, ingresos_eev = _por_tandas(precios, generacion, probabilidades, planta, paso_h, programa_ev[0], tanda)
+    _, ingresos_ws = _por_tandas(precios, generacion, probabilidades, planta, paso_h, None, tanda)
+    eev, ws = float(probabilidades @ ingresos_eev), float(probabilidades @ ingresos_ws)
+    return {
+        "programa_kw": programa[0],
+        "programa_ev_kw": programa_ev[0],
+        "ingresos_escenarios": ingresos_rp,
+        "ingresos_esperados": float(rp),
+        "ingresos_ev_esperados": eev,
+        "ingresos_informacion_perfecta": ws,
+        "vss": float(rp) - eev,
+        "evpi": ws - float(rp),
+        "ingresos_p5": float(np.percentile(ingresos_rp, 5)),
+        "ingresos_ev_p5": float(np.percentile(ingresos_eev, 5)),
+        "escenarios": n,
+        "pasos": precios.shape[1],
+        "tiempo_rp_s": tiempo_rp,
+        "tiempo_total_s": time.perf_counter() - inicio
+    }
+
+def _energia_y_reservas(precios, generacion, productos, planta, paso_h):
+    """Monta y resuelve el LP determinista de energía y reservas
+
+    productos es [(nombre, precio por paso en €/MW·h, duración en h)]. La matriz tiene un bloque
+    de columnas por variable (pasos consecutivos) y un bloque de filas por familia de restricciones.
+    Devuelve ({variable: serie en kW o kWh}, ingresos, filas, columnas).
+    """
+    n_pasos = len(precios)
+    b = _parametros_bess(planta)
+    limite = planta.red.limite
+    variables = ("carga", "descarga", "vertido", "exportacion", "energia") + tuple(n for n, _, _ in productos)
+    t = np.arange(n_pasos)
+    col = {v: k * n_pasos + t for k, v in enumerate(variables)}
+    n_columnas = len(variables) * n_pasos
+
+    euros = paso_h / 1000
+    c = np.zeros(n_columnas)
+    c[col["exportacion"]] = -precios * euros
+    c[col["carga"]] = c[col["descarga"]] = COSTE_DEGRADACION * euros
+    for nombre, precio, _ in productos:
+        c[col[nombre]] = -precio * euros
+
+    igualdades, desigualdades = _Sistema(), _Sistema()
+    # Balance: vertido + carga − descarga + exportación = FV
+    igualdades.anadir([(col["vertido"], 1), (col["carga"], 1), (col["descarga"], -1), (col["exportacion"], 1)],
+                      generacion)
+    anterior = np.where(t > 0, col["energia"] - 1, -1)
+    inicial = np.where(t == 0, b["e_inicial"], 0.0)
+    igualdades.anadir([(col["energia"], 1), (anterior, -1), (col["carga"], -b["carga"] * paso_h),
+                       (col["descarga"], paso_h / b["descarga"])], inicial)
+    # Potencia libre para la banda en ambos sentidos; la banda a subir también cabe en la conexión
+    banda = [(col[n], 1) for n, _, _ in productos]
+    desigualdades.anadir([(col["descarga"], 1), (col["carga"], -1)] + banda, np.full(n_pasos, b["potencia"]))
+    desigualdades.anadir([(col["carga"], 1), (col["descarga"], -1)] + banda, np.full(n_pasos, b["potencia"]))
+    desigualdades.anadir([(col["exportacion"], 1)] + banda, np.full(n_pasos, limite))
+    # Energía para la activación completa, con la energía al final (e_t) y al principio (e_{t−1}) del paso
+    for energia, fija in ((col["energia"], np.zeros(n_pasos)), (anterior, inicial)):
+        desigualdades.anadir([(energia, -1)] + [(col[n], d / b["descarga"]) for n, _, d in productos],
+                             fija - b["e_min"])
+        desigualdades.anadir([(energia, 1)] + [(col[n], d * b["carga"]) for n, _, d in productos],
+                             b["e_max"] - fija)
+    desigualdades.anadir([(col["energia"][-1:], -1)], [-b["e_inicial"]])
+
+    inferior, superior = np.zeros(n_columnas), np.full(n_columnas, b["potencia"])
+    superior[col["vertido"]] = generacion
+    superior[col["exportacion"]] = limite
+    inferior[col["energia"]], superior[col["energia"]] = b["e_min"], b["e_max"]
+    x, objetivo = _resolver(c, desigualdades, igualdades, inferior, superior)
+    return {v: x[col[v]] for v in variables}, -objetivo, desigualdades.n + igualdades.n, n_columnas
+
+def despacho_reservas(planta=None, precios_reserva=None, productos=PRODUCTOS, comparar=True):
+    """Despacho óptimo del escenario de la planta con energía y bandas de reserva co-optimizadas
+
+    precios_reserva ({producto: serie en €/MW·h}) sustituye a los precios constantes de
+    planta.reservas. Con comparar se resuelve también el despacho óptimo solo de energía para
+    medir el valor de las reservas. Importes anualizados; las series se devuelven en kW y kWh.
+    """
+    planta = definir_planta(planta)
+    escenario, reservas = planta.escenario, planta.reservas
+    paso_h = escenario.paso_h
+    precios = np.asarray(escenario.precios, dtype=np.float64)
+    generacion = np.asarray(escenario.generacion, dtype=np.float64)
+    precios_reserva = precios_reserva or {}
+    lista = [(p, np.broadcast_to(np.asarray(precios_reserva.get(p, getattr(reservas, f"precio_{p}")),
+                                            dtype=np.float64), precios.shape),
+              getattr(reservas, f"duracion_{p}")) for p in productos]
+    anos = len(precios) * paso_h / 8760
+
+    inicio = time.perf_counter()
+    series, ingresos, filas, columnas = _energia_y_reservas(precios, generacion, lista, planta, paso_h)
+    tiempo = time.perf_counter() - inicio
+    resultado = {"ingresos_energia_eur_ano": float(series["exportacion"] @ precios) * paso_h / 1000 / anos}
+    for nombre, precio, _ in lista:
+        resultado[f"ingresos_{nombre}_eur_ano"] = float(series[nombre] @ precio) * paso_h / 1000 / anos
+    resultado["ingresos_netos_eur_ano"] = ingresos / anos
+    if comparar:
+        _, solo_energia, _, _ = _energia_y_reservas(precios, generacion, [], planta, paso_h)
+        resultado["ingresos_solo_energia_eur_ano"] = solo_energia / anos
+        resultado["valor_reservas_eur_ano"] = (ingresos - solo_energia) / anos
+    for nombre, _, _ in lista:
+        resultado[f"banda_media_{nombre}_kw"] = float(series[nombre].mean())
+        resultado[f"horas_{nombre}_ano"] = float(np.count_nonzero(series[nombre] > 1e-6)) * paso_h / anos
+    resultado.update({
+        "ciclos_equivalentes_ano": float(series["descarga"].sum()) * paso_h / planta.bess.capacidad_total / anos,
+        "vertido_mwh_ano": float(series["vertido"].sum()) * paso_h / 1000 / anos,
+        "pasos": len(precios),
+        "variables": columnas,
+        "restricciones": filas,
+        "tiempo_lp_s": tiempo,
+        "series": series
+    })
+    return resultado
+
+def precios_reserva_almacen(directorio, desde=None, hasta=None, paso="1h", productos=PRODUCTOS):
+    """Precios de reserva (€/MW·h) de las columnas del almacén con el nombre de cada producto"""
+    from series_temporales import leer_meta, ventana
+    disponibles = [p for p in productos if p in leer_meta(directorio)["columnas"]]
+    if not disponibles:
+        return {}
+    _, datos = ventana(directorio, desde, hasta, disponibles, paso=paso)
+    return {p: np.asarray(datos[p], dtype=np.float64) for p in disponibles}
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Despacho óptimo: estocástico en dos etapas o energía + reservas")
+    parser.add_argument("--planta", help="Configuración de planta (YAML o JSON)")
+    parser.add_argument("--escenarios", type=int, default=100, help="Escenarios sintéticos alrededor del perfil")
+    parser.add_argument("--paso", default="15min", help="Resolución del programa")
+    parser.add_argument("--horizonte", type=float, default=24, help="Horas del programa (escenarios sintéticos)")
+    parser.add_argument("--almacen", help="Almacén con generacion (y precios): cada día es un escenario")
+    parser.add_argument("--almacen-precios", help="Almacén de precios, si están en otro almacén")
+    parser.add_argument("--desde")
+    parser.add_argument("--hasta")
+    parser.add_argument("--reservas", action="store_true",
+                        help="Despacho determinista co-optimizando energía y reservas FCR/aFRR")
+    args = parser.parse_args()
+
+    from configuracion import cargar_configuracion
+    from series_temporales import segundos
+    planta = cargar_configuracion(args.planta) if args.planta else None
+    paso_h = segundos(args.paso) / 3600
+    if args.reservas:
+        precios_reserva = None
+        if args.almacen:
+            from series_temporales import planta_desde_almacen
+            planta = planta_desde_almacen(args.almacen, args.desde, args.hasta, planta, paso=args.paso,
+                                          almacen_precios=args.almacen_precios)
+            precios_reserva = precios_reserva_almacen(args.almacen_precios or args.almacen, args.desde, args.hasta,
+                                                      args.paso)
+        resultado = despacho_reservas(planta, precios_reserva)
+    elif args.almacen:
+        resultado = despacho_estocastico(*escenarios_almacen(args.almacen, args.desde, args.hasta, args.paso,
+                                                             args.almacen_precios), planta=planta, paso_h=paso_h)
+    else:
+        resultado = despacho_estocastico(*generar_escenarios(planta, args.escenarios, paso_h, args.horizonte),
+                                         planta=planta, paso_h=paso_h)
+    for k, v in resultado.items():
+        if not isinstance(v, (np.ndarray, dict)):
+            print(f"{k}: {v:,.2f}" if isinstance(v, float) else f"{k}: {v}")
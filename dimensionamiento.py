@@ -0,0 +1,279 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import configuracion
+import flujo_caja
+import modelos
+import precision
+from cache_informe import clave_seccion, guardar_seccion, leer_seccion
+from configuracion import huella, variante
+from modelos import definir_planta, simular_arbitraje
+
+# Búsqueda del tamaño del BESS (contenedores, potencia del PCS, límite de acceso y ventana de SOC).
+# Cada candidato pasa por el despacho horario y el motor de flujos de caja. La búsqueda:
+#  - memoriza los despachos por huella de (red, bess, escenario), en memoria y opcionalmente en
+#    disco, de modo que candidatos repetidos o búsquedas sucesivas no se vuelven a simular;
+#  - acota cada candidato sin simularlo (ingresos máximos y curtailment mínimo alcanzables) y
+#    descarta los que un diseño ya evaluado domina incluso frente a esas cotas;
+#  - reparte los despachos entre procesos por tandas y evalúa la economía de todos a la vez.
+
+COSTE_ENERGIA = 110.0    # €/kWh instalado (contenedores); con COSTE_POTENCIA reproduce los 2.8 M€ de referencia
+COSTE_POTENCIA = 120.0   # €/kW de PCS
+COSTE_CONEXION = 0.0     # €/kW de capacidad de acceso a red
+
+REJILLA_PREDETERMINADA = {
+    "bess.n_contenedores": [1, 2, 3, 4, 5, 6, 7, 8],
+    "bess.potencia": [2500, 5000, 7500, 10000],
+    "red.limite": [4000, 5000, 6000],
+    "ventana_soc": [(0.1, 0.95), (0.2, 0.95), (0.2, 0.9)]
+}
+
+OBJETIVOS = ("capex", "van", "curtailment_kwh_dia")   # Minimizar, maximizar, minimizar
+
+_MEMO = {}
+
+def candidatos(base, rejilla, descartados=None):
+    """Genera las plantas candidatas del producto cartesiano de la rejilla
+
+    Además de las rutas 'grupo.campo' admite 'ventana_soc' con pares (soc_min, soc_max).
+    Las ventanas de SOC incompatibles con el resto del BESS (p. ej. soc_inicial fuera de la
+    ventana) se omiten; cualquier otro error de configuración se propaga. Si se pasa un
+    diccionario en descartados se cuentan en él las omisiones por motivo.
+    """
+    for valores in itertools.product(*rejilla.values()):
+        cambios = dict(zip(rejilla, valores))
+        ventana = "ventana_soc" in cambios
+        if ventana:
+            cambios["bess.soc_min"], cambios["bess.soc_max"] = cambios.pop("ventana_soc")
+        try:
+            planta = variante(base, cambios)
+        except ValueError as e:
+            if not (ventana and str(e).startswith("Bess.soc_")):
+                raise
+            if descartados is not None:
+                descartados[str(e)] = descartados.get(str(e), 0) + 1
+            continue
+        yield planta
+
+def capex_planta(planta, costes=None):
+    """CAPEX del candidato (€) a partir de los costes unitarios de energía, potencia y conexión"""
+    costes = {"energia": COSTE_ENERGIA, "potencia": COSTE_POTENCIA, "conexion": COSTE_CONEXION, **(costes or {})}
+    return (costes["energia"] * planta.bess.capacidad_total + costes["potencia"] * planta.bess.potencia +
+            costes["conexion"] * planta.red.limite)
+
+def _perfil(escenario, comun):
+    """Precios, generación y huella del escenario; `comun` los reutiliza entre candidatos"""
+    if id(escenario) not in comun:
+        comun[id(escenario)] = (np.asarray(escenario.precios, dtype=np.float64),
+                                np.asarray(escenario.generacion, dtype=np.float64), huella(escenario))
+    return comun[id(escenario)]
+
+def cotas(planta, comun=None):
+    """Cotas sin simular: (ingresos anuales máximos, curtailment mínimo en kWh/día)
+
+    La estrategia solo carga excedente por encima del límite en horas baratas (como mucho la
+    potencia del PCS) y solo descarga en horas caras; la energía entregada no supera la inicial
+    más la almacenada, ambas afectadas por la eficiencia.
+    """
+    bess, escenario = planta.bess, planta.escenario
+    precios, generacion, _ = _perfil(escenario, {} if comun is None else comun)
+    excedente = np.maximum(generacion - planta.red.limite, 0.0)
+    barato = (precios < escenario.umbral_carga) & (excedente > 0)
+    caro = precios > escenario.umbral_descarga
+    dt = escenario.paso_h
+    dias = len(precios) * dt / 24
+    carga_max = np.minimum(excedente[barato], bess.potencia).sum() * dt
+    entregable = bess.eficiencia * (bess.soc_inicial * bess.capacidad_total + bess.eficiencia * carga_max)
+    ingresos = min(entregable * (precios[caro].max() if caro.any() else 0.0),
+                   bess.potencia * dt * precios[caro].sum()) / 1000
+    curtailment = (np.maximum(excedente[barato] - bess.potencia, 0).sum() + excedente[~barato].sum()) * dt
+    return ingresos / dias * 365, curtailment / dias
+
+def _clave_despacho(planta, comun):
+    """Huella de los grupos que determinan el despacho (la del escenario se calcula una vez)
+
+    Incluye la vida útil económica, que acota la vida_util_anos memorizada con el despacho.
+    """
+    return huella({"red": planta.red, "bess": planta.bess, "escenario": _perfil(planta.escenario, comun)[2],
+                   "vida_util": planta.economia.vida_util})
+
+def despachar(planta):
+    """Indicadores físicos del despacho de un candidato (se ejecuta en los procesos trabajadores)"""
+    _, kpis = simular_arbitraje(planta, registrar=False)
+    return {
+        "ingresos_anuales": kpis["ingresos_anuales"],
+        "energia_descargada_mwh_ano": kpis["energia_descargada_mwh_ano"],
+        "curtailment_kwh_dia": kpis["energia_perdida_kwh_dia"],
+        "reduccion_curtailment_pct": kpis["reduccion_curtailment_pct"],
+        "vida_util_anos": kpis["vida_util_anos"]
+    }
+
+def _dominado(capex, van_max, curtailment_min, evaluados):
+    """True si algún diseño evaluado es al menos igual en los tres objetivos y mejor en alguno"""
+    if not len(evaluados):
+        return False
+    c, v, k = evaluados[:, 0], evaluados[:, 1], evaluados[:, 2]
+    igual_o_mejor = (c <= capex) & (v >= van_max) & (k <= curtailment_min)
+    mejor = (c < capex) | (v > van_max) | (k < curtailment_min)
+    return bool((igual_o_mejor & mejor).any())
+
+def frente_pareto(registros, objetivos=OBJETIVOS):
+    """Registros no dominados (CAPEX mínimo, VAN máximo, curtailment mínimo)"""
+    if not registros:
+        return []
+    signo = np.array([1.0 if o != "van" else -1.0 for o in objetivos])
+    valores = np.array([[r[o] for o in objetivos] for r in registros]) * signo
+    no_dominado = np.ones(len(registros), dtype=bool)
+    for i, fila in enumerate(valores):
+        domina = (valores <= fila).all(axis=1) & (valores < fila).any(axis=1)
+        no_dominado[i] = not domina.any()
+    return sorted((r for r, nd in zip(registros, no_dominado) if nd), key=lambda r: r["capex"])
+
+def _registro(planta, capex, fisico, economico, i):
+    """Fila de resultados de un candidato evaluado"""
+    return {
+        "n_contenedores": planta.bess.n_contenedores,
+        "capacidad_kwh": planta.bess.capacidad_total,
+        "potencia_kw": planta.bess.potencia,
+        "limite_red_kw": planta.red.limite,
+        "soc_min": planta.bess.soc_min,
+        "soc_max": planta.bess.soc_max,
+        "capex": capex,
+        **fisico,
+        "van": float(economico["van"][i]),
+        "tir": float(economico["tir"][i]),
+        "payback_anos": float(economico["payback"][i]),
+        "lcos": float(economico["lcos"][i])
+    }
+
+def dimensionar(base=None, rejilla=None, costes=None, procesos=None, tanda=None, directorio_cache=None,
+                podar=True):
+    """Busca el diseño de VAN máximo y el frente de Pareto CAPEX / VAN / curtailment
+
+    Los candidatos se ordenan por su cota de VAN y se simulan por tandas; antes de cada tanda se
+    descartan los dominados por lo ya evaluado. Con directorio_cache los despachos se conservan
+    entre ejecuciones (se invalidan si cambia el código del despacho).
+    Devuelve {"optimo", "pareto", "evaluados", "candidatos", "descartados", "podados", "memorizados",
+    "tiempo_s"}; "descartados" cuenta por motivo las ventanas de SOC omitidas.
+    """
+    inicio = time.perf_counter()
+    base = definir_planta(base)
+    descartados = {}
+    plantas = list(candidatos(base, rejilla or REJILLA_PREDETERMINADA, descartados))
+    if not plantas:
+        motivos = "; ".join(f"{motivo} ({n})" for motivo, n in descartados.items())
+        raise ValueError(f"La rejilla no produce ningún candidato válido: {motivos or 'rejilla vacía'}")
+    procesos = procesos or os.cpu_count() or 1
+    tanda = tanda or max(8, 4 * procesos)
+
+    # Código completo de los módulos del despacho, como las secciones del informe
+    clave_codigo = clave_seccion("dimensionamiento", [despachar, modelos, flujo_caja, configuracion, precision], {})
+    if directorio_cache:
+        encontrado, guardado = leer_seccion(directorio_cache, "dimensionamiento", clave_codigo)
+        if encontrado:
+            for k, v in guardado.items():
+                _MEMO.setdefault(k, v)
+
+    # Cotas de todos los candidatos en un único paso del motor económico
+    capex = np.array([capex_planta(p, costes) for p in plantas])
+    comun = {}
+    limites = [cotas(p, comun) for p in plantas]
+    ingresos_max = np.array([c[0] for c in limites])
+    curtailment_min = np.array([c[1] for c in limites])
+    van_max = flujo_caja.evaluar_economia(base.economia, ingresos_max, capex=capex, calcular_tir=False)["van"]
+    orden = np.argsort(-van_max, kind="stable")
+
+    claves = [_clave_despacho(p, comun) for p in plantas]
+    fisicos = {}
+    evaluados = np.empty((0, 3))
+    podados = memorizados = 0
+    pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+    try:
+        for j0 in range(0, len(orden), tanda):
+            pendientes = []
+            for i in orden[j0:j0 + tanda]:
+                if podar and _dominado(capex[i], van_max[i], curtailment_min[i], evaluados):
+                    podados += 1
+                elif claves[i] in _MEMO:
+                    fisicos[i] = _MEMO[claves[i]]
+                    memorizados += 1
+                else:
+                    pendientes.append(i)
+            # Candidatos con el mismo despacho dentro de la tanda se simulan una sola vez
+            unicos = list({claves[i]: i for i in pendientes}.values())
+            trabajos = [plantas[i] for i in unicos]
+            resultados = pool.map(despachar, trabajos, chunksize=max(1, len(trabajos) // procesos)) if pool \
+                else map(despachar, trabajos)
+            for i, fisico in zip(unicos, resultados):
+                _MEMO[claves[i]] = fisico
+            for i in pendientes:
+                fisicos[i] = _MEMO[claves[i]]
+            memorizados += len(pendientes) - len(unicos)
+
+            nuevos = [i for i in orden[j0:j0 + tanda] if i in fisicos]
+            if nuevos:
+                van = flujo_caja.evaluar_economia(base.economia, [fisicos[i]["ingresos_anuales"] for i in nuevos],
+                                                  capex=capex[nuevos], calcular_tir=False)["van"]
+                filas = np.column_stack([capex[nuevos], van, [fisicos[i]["curtailment_kwh_dia"] for i in nuevos]])
+                evaluados = np.vstack([evaluados, filas])
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if directorio_cache:
+        guardar_seccion(directorio_cache, "dimensionamiento", clave_codigo, dict(_MEMO))
+
+    # Economía completa (TIR, payback, LCOS) de todos los evaluados en una sola llamada
+    indices = sorted(fisicos)
+    economico = flujo_caja.evaluar_economia(
+        base.economia, [fisicos[i]["ingresos_anuales"] for i in indices], capex=capex[indices],
+        energia=[fisicos[i]["energia_descargada_mwh_ano"] for i in indices])
+    registros = [_registro(plantas[i], capex[i], fisicos[i], economico, k) for k, i in enumerate(indices)]
+    return {
+        "optimo": max(registros, key=lambda r: r["van"]) if registros else None,
+        "pareto": frente_pareto(registros),
+        "evaluados": registros,
+        "candidatos": len(plantas),
+        "descartados": descartados,
+        "podados": podados,
+        "memorizados": memorizados,
+        "tiempo_s": time.perf_counter() - inicio
+    }
+
+def imprimir_resultado(resultado):
+    """Resumen de la búsqueda y tabla del frente de Pareto"""
+    print(f"{resultado['candidatos']} candidatos: {len(resultado['evaluados'])} evaluados, "
+          f"{resultado['podados']} podados, {resultado['memorizados']} memorizados, {resultado['tiempo_s']:.1f} s")
+    for motivo, n in resultado["descartados"].items():
+        print(f"Omitidas {n} combinaciones: {motivo}")
+    print(f"{'Cont.':>5} {'kWh':>7} {'kW':>6} {'Límite':>7} {'SOC':>9} {'CAPEX M€':>9} {'VAN M€':>8} {'Curt. kWh/d':>11}")
+    for r in resultado["pareto"]:
+        marca = "  <- VAN máximo" if r is resultado["optimo"] else ""
+        print(f"{r['n_contenedores']:>5} {r['capacidad_kwh']:>7.0f} {r['potencia_kw']:>6.0f} {r['limite_red_kw']:>7.0f} "
+              f"{r['soc_min']:>4.2f}-{r['soc_max']:<4.2f} {r['capex'] / 1e6:>9.2f} {r['van'] / 1e6:>8.2f} "
+              f"{r['curtailment_kwh_dia']:>11.0f}{marca}")
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dimensionamiento del BESS: VAN máximo y frente de Pareto")
+    parser.add_argument("--planta", help="Configuración base (YAML o JSON) con el perfil de precios y generación")
+    parser.add_argument("--almacen", help="Almacén de series temporales con columnas 'precios' y 'generacion'")
+    parser.add_argument("--desde")
+    parser.add_argument("--hasta")
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--cache", help="Directorio donde conservar los despachos entre ejecuciones")
+    parser.add_argument("--sin-poda", action="store_true", help="Evalúa todos los candidatos")
+    args = parser.parse_args()
+
+    from configuracion import cargar_configuracion
+    planta = cargar_configuracion(args.planta) if args.planta else None
+    if args.almacen:
+        from series_temporales import planta_desde_almacen
+        planta = planta_desde_almacen(args.almacen, args.desde, args.hasta, planta)
+    imprimir_resultado(dimensionar(planta, procesos=args.procesos, directorio_cache=args.cache,
+                                   podar=not args.sin_poda))
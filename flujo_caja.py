@@ -0,0 +1,234 @@
+import numpy as np
+
+import precision
+
+# Motor de flujos de caja sobre una matriz (escenarios × años). Todos los parámetros admiten un
+# escalar (común a todos los escenarios) o un array con un valor por escenario; los escalares se
+# evalúan una sola vez por año y se difunden. Los escenarios se procesan por bloques para que las
+# matrices intermedias quepan en caché con millones de escenarios. Las matrices se guardan en la
+# precisión activa (precision.real()); el VAN, el payback y la TIR acumulan en float64.
+
+BLOQUE = 1 << 15   # Escenarios por bloque
+
+def _fila(valor):
+    """Escalar tal cual; array como fila (1, n) para difundir sobre los años"""
+    valor = np.asarray(valor, dtype=precision.real())
+    return valor if valor.ndim == 0 else valor.reshape(1, -1)
+
+def _nulo(valor):
+    """True si el parámetro es escalar y cero (el término correspondiente se omite)"""
+    return np.ndim(valor) == 0 and valor == 0
+
+def flujos_caja(capex, ingresos, opex, vida, horizonte=None, degradacion=0.0, inflacion_ingresos=0.0,
+                inflacion_opex=0.0, impuesto=0.0, ano_aumentacion=0, coste_aumentacion=0.0,
+                fraccion_deuda=0.0, tipo_interes=0.05, plazo_deuda=10, energia=None):
+    """Construye las matrices de flujos de caja anuales de cada escenario
+
+    ingresos, opex y energia son valores del primer año. Los ingresos y la energía decaen con
+    `degradacion` hasta el año de aumentación, en el que se paga `coste_aumentacion` y se repone
+    la capacidad nominal. La deuda (fraccion_deuda × CAPEX) se amortiza con cuota constante; el
+    impuesto se aplica a EBITDA − amortización lineal − intereses, sin compensar pérdidas.
+    Devuelve matrices (n, H + 1) de flujos del proyecto y del accionista (columna 0 = año 0) y
+    (n, H) de CFADS, servicio de la deuda, costes y energía. Internamente se guardan año a año
+    (orden Fortran), de modo que cada operación por año recorre memoria contigua.
+    """
+    vida = np.asarray(vida)
+    horizonte = int(np.max(vida)) if horizonte is None else int(horizonte)
+    n = max([np.size(v) for v in (capex, ingresos, opex, vida, degradacion, inflacion_ingresos, inflacion_opex,
+                                  impuesto, ano_aumentacion, coste_aumentacion, fraccion_deuda, tipo_interes,
+                                  plazo_deuda, 0.0 if energia is None else energia)])
+    capex, ingresos, opex, vida = _fila(capex), _fila(ingresos), _fila(opex), _fila(vida)
+    real = precision.real()
+    t = np.arange(1, horizonte + 1, dtype=real).reshape(-1, 1)
+    activo = (t <= vida).astype(real)
+
+    # Factores por año: (H, 1) si los parámetros son comunes, (H, n) si varían por escenario
+    ano_aumentacion = _fila(ano_aumentacion)
+    exponente = t - 1 if _nulo(ano_aumentacion) else np.where((ano_aumentacion > 0) & (t > ano_aumentacion),
+                                                              t - 1 - ano_aumentacion, t - 1)
+    capacidad = activo if _nulo(degradacion) else activo * (1 - _fila(degradacion)) ** exponente
+    factor_ingresos = capacidad if _nulo(inflacion_ingresos) else capacidad * (1 + _fila(inflacion_ingresos)) ** (t - 1)
+    factor_opex = activo if _nulo(inflacion_opex) else activo * (1 + _fila(inflacion_opex)) ** (t - 1)
+    ebitda_t = ingresos * factor_ingresos - opex * factor_opex
+    costes_t = opex * factor_opex
+    cfads_t = np.broadcast_to(ebitda_t, (horizonte, n)).copy()
+    if not _nulo(coste_aumentacion):
+        aumentacion_t = activo * (t == ano_aumentacion) * _fila(coste_aumentacion)
+        cfads_t -= aumentacion_t
+        costes_t = costes_t + aumentacion_t
+
+    # Deuda con cuota constante (sistema francés)
+    servicio_t = None
+    intereses_t = 0.0
+    if not _nulo(fraccion_deuda):
+        deuda = _fila(fraccion_deuda) * capex
+        r, plazo = _fila(tipo_interes), _fila(plazo_deuda)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cuota = np.where(r > 0, deuda * r / (1 - (1 + r) ** -plazo), deuda / plazo)
+            saldo_previo = np.where(r > 0, deuda * (1 + r) ** (t - 1) - cuota * ((1 + r) ** (t - 1) - 1) / r,
+                                    deuda - cuota * (t - 1))
+        en_plazo = t <= plazo
+        intereses_t = np.where(en_plazo, saldo_previo * r, 0.0)
+        servicio_t = np.broadcast_to(np.where(en_plazo, cuota, 0.0), (horizonte, n))
+    if not _nulo(impuesto):
+        cfads_t -= _fila(impuesto) * np.maximum(ebitda_t - activo * (capex / vida) - intereses_t, 0.0)
+
+    proyecto = np.empty((horizonte + 1, n), dtype=real)
+    proyecto[0] = -capex
+    proyecto[1:] = cfads_t
+    accionista = proyecto
+    if servicio_t is not None:
+        accionista = proyecto.copy()
+        accionista[0] += deuda.reshape(-1) if np.ndim(deuda) else deuda
+        accionista[1:] -= servicio_t
+    resultado = {
+        "proyecto": proyecto.T,
+        "accionista": accionista.T,
+        "cfads": cfads_t.T,
+        "servicio_deuda": None if servicio_t is None else servicio_t.T,
+        "costes": np.broadcast_to(costes_t, (horizonte, n)).T,
+        "energia": None
+    }
+    if energia is not None:
+        resultado["energia"] = np.broadcast_to(_fila(energia) * capacidad, (horizonte, n)).T
+    return resultado
+
+def van(flujos, tasa):
+    """Valor actual neto de cada fila de flujos (año 0 sin descontar), por el esquema de Horner
+
+    El acumulador es float64 aunque los flujos estén en float32.
+    """
+    descuento = 1 / (1 + np.asarray(tasa, dtype=np.float64))
+    total = flujos[:, -1].astype(np.float64)
+    for t in range(flujos.shape[1] - 2, -1, -1):
+        total *= descuento
+        total += flujos[:, t]
+    return total
+
+def tir(flujos, iteraciones=50, tolerancia=1e-10):
+    """Tasa interna de retorno por Newton vectorizado; NaN si no hay cambio de signo o no converge
+
+    Se itera sobre x = 1/(1+r) partiendo de la aproximación de flujos constantes, que deja la
+    mayoría de escenarios convergidos en 4-6 iteraciones. Se resuelve siempre en float64 (la
+    tolerancia está por debajo de la resolución de float32); la copia es de un bloque.
+    """
+    flujos = np.asarray(flujos, dtype=np.float64)
+    n, columnas = flujos.shape
+    inversion = -flujos[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        multiplo = flujos[:, 1:].sum(axis=1) / inversion
+        inicial = np.where(multiplo > 0, multiplo ** (2 / columnas) - 1, 0.1)
+    x = 1 / (1 + np.clip(np.nan_to_num(inicial, nan=0.1), -0.9, 10))
+    convergido = ~((flujos < 0).any(axis=1) & (flujos > 0).any(axis=1))
+    valido = ~convergido
+    p, dp = np.empty(n), np.empty(n)
+    for _ in range(iteraciones):
+        # Polinomio en x y su derivada, ambos por Horner, sobre todas las filas
+        p[:] = flujos[:, -1]
+        dp[:] = 0.0
+        for t in range(columnas - 2, -1, -1):
+            dp *= x
+            dp += p
+            p *= x
+            p += flujos[:, t]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            paso = np.where(convergido, 0.0, p / dp)
+        x -= paso
+        np.clip(x, 1e-6, 100.0, out=x)
+        convergido |= np.abs(paso) < tolerancia * x
+        if convergido.all():
+            break
+    with np.errstate(divide="ignore"):
+        tasa = 1 / x - 1
+    tasa[~(convergido & valido) | ~np.isfinite(tasa)] = np.nan
+    return tasa
+
+def payback(flujos):
+    """Años hasta recuperar la inversión (interpolando dentro del año); NaN si no se recupera"""
+    acumulado = np.cumsum(flujos, axis=1, dtype=np.float64)
+    recuperado = acumulado >= 0
+    k = np.argmax(recuperado, axis=1)
+    filas = np.arange(len(flujos))
+    previo = acumulado[filas, np.maximum(k - 1, 0)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        anos = np.where(k > 0, k - 1 + -previo / flujos[filas, k], 0.0)
+    return np.where(recuperado.any(axis=1), anos, np.nan)
+
+def dscr_minimo(cfads, servicio):
+    """Ratio de cobertura del servicio de la deuda mínimo en el plazo del préstamo (NaN sin deuda)"""
+    if servicio is None:
+        return np.full(len(cfads), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(servicio > 0, cfads / servicio, np.inf)
+    minimo = ratio.min(axis=1)
+    return np.where(np.isfinite(minimo), minimo, np.nan)
+
+def lcos(capex, costes, energia, tasa):
+    """Coste nivelado del almacenamiento: (CAPEX + VA de costes) / VA de energía descargada"""
+    ceros = np.zeros((len(costes), 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ((np.broadcast_to(np.asarray(capex, dtype=np.float64).reshape(-1), len(costes)) +
+                 van(np.hstack([ceros, costes]), tasa)) / van(np.hstack([ceros, energia]), tasa))
+
+def evaluar(capex, ingresos, opex, vida, tasa, energia=None, calcular_tir=True, bloque=BLOQUE, desde=0,
+            tras_bloque=None, **opciones):
+    """Evalúa todos los escenarios y devuelve {indicador: array (n,)}
+
+    Indicadores: van y van_accionista, tir, payback, dscr_minimo y, si se da la energía anual
+    descargada (MWh), lcos (€/MWh). opciones son los parámetros adicionales de flujos_caja.
+    Para reanudar una evaluación interrumpida, desde (múltiplo de bloque) omite los primeros
+    escenarios, que quedan sin rellenar; tras_bloque(fin, resultado) se llama al terminar cada
+    bloque con el número de escenarios ya evaluados.
+    """
+    parametros = {"capex": capex, "ingresos": ingresos, "opex": opex, "vida": vida, "tasa": tasa,
+                  "energia": energia, **opciones}
+    parametros = {k: np.asarray(v) for k, v in parametros.items() if v is not None}
+    n = int(np.prod(np.broadcast_shapes(*(v.shape for v in parametros.values())), dtype=np.int64))
+    horizonte = int(np.max(parametros["vida"]))
+    nombres = ["van", "van_accionista", "payback", "dscr_minimo"]
+    nombres += ["tir"] if calcular_tir else []
+    nombres += ["lcos"] if energia is not None else []
+    resultado = {nombre: np.empty(n, dtype=precision.real()) for nombre in nombres}
+    for i0 in range(desde, max(n, 1), bloque):
+        i1 = min(n, i0 + bloque)
+        parte = {k: (v.reshape(-1)[i0:i1] if v.size > 1 else v.reshape(())) for k, v in parametros.items()}
+        tasa_parte = parte.pop("tasa")
+        flujos = flujos_caja(horizonte=horizonte, **parte)
+        if n > 1 and flujos["proyecto"].shape[0] == 1:
+            # Todos los parámetros escalares: un único escenario repetido
+            flujos = {k: (None if v is None else np.broadcast_to(v, (i1 - i0, v.shape[1])))
+                      for k, v in flujos.items()}
+        resultado["van"][i0:i1] = van(flujos["proyecto"], tasa_parte)
+        resultado["van_accionista"][i0:i1] = van(flujos["accionista"], tasa_parte)
+        resultado["payback"][i0:i1] = payback(flujos["proyecto"])
+        resultado["dscr_minimo"][i0:i1] = dscr_minimo(flujos["cfads"], flujos["servicio_deuda"])
+        if calcular_tir:
+            resultado["tir"][i0:i1] = tir(flujos["proyecto"])
+        if energia is not None:
+            resultado["lcos"][i0:i1] = lcos(parte["capex"], flujos["costes"], flujos["energia"], tasa_parte)
+        if tras_bloque is not None:
+            tras_bloque(i1, resultado)
+    return resultado
+
+def parametros_economia(economia):
+    """Parámetros de evaluar() a partir del grupo Economia de la configuración"""
+    return {
+        "capex": economia.capex,
+        "opex": economia.opex_anual,
+        "vida": economia.vida_util,
+        "tasa": economia.tasa_descuento,
+        "degradacion": economia.degradacion_anual,
+        "ano_aumentacion": economia.ano_aumentacion,
+        "coste_aumentacion": economia.coste_aumentacion,
+        "inflacion_ingresos": economia.inflacion_ingresos,
+        "inflacion_opex": economia.inflacion_opex,
+        "impuesto": economia.impuesto_sociedades,
+        "fraccion_deuda": economia.fraccion_deuda,
+        "tipo_interes": economia.tipo_interes,
+        "plazo_deuda": economia.plazo_deuda
+    }
+
+def evaluar_economia(economia, ingresos, energia=None, calcular_tir=True, **cambios):
+    """Evalúa con la configuración económica de la planta; cambios sustituye parámetros (p. ej. capex)"""
+    return evaluar(**{**parametros_economia(economia), **cambios}, ingresos=ingresos, energia=energia,
+                   calcular_tir=calcular_tir)
@@ -1,1167 +1,725 @@
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import matplotlib.path as mpath
-import matplotlib.dates as mdates
-from matplotlib import gridspec
-import pandas as pd
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.section import WD_ORIENT
-import matplotlib.image as mpimg
-from io import BytesIO
-import textwrap
-import math
-import numpy_financial as npf
-from datetime import datetime
-import scipy.stats as stats
-
-# Constantes técnicas actualizadas según requerimientos
-BESS_CONTAINER_SPECS = {
-    "Proveedor": ["ENVISION", "SUNGROW", "CATL"],
-    "Modelo": ["EN-5MWh", "PowerTitan", "EnerOne"],
-    "Capacidad": ["5 MWh"] * 3,
-    "Tamaño Contenedor": ["20 pies"] * 3,
-    "Tecnología": ["LiFePO4"] * 3,
-    "Voltaje DC": ["1500V"] * 3,
-    "Densidad Energía": ["280 Wh/L", "305 Wh/L", "295 Wh/L"],
-    "Ciclos": ["7000@80%DoD"] * 3,
-    "Garantía": ["10 años"] * 3
-}
-
-# Especificaciones AMIKIT mejoradas con sistema de medida avanzado y GIS
-AMIKIT_SPECS = {
-    "Componente": [
-        "Sistema AMIKIT", 
-        "Transformador Hibrido", 
-        "PCS Integrado", 
-        "Protecciones Digitales",
-        "Sistema de Medida",
-        "Celdas MT GIS",
-        "Transformadores de Instrumentación"
-    ],
-    "Modelo": [
-        "AMK-30MV", 
-        "ABB AMDT 5MVA", 
-        "SMA SC 2500", 
-        "SIPROTEC 5 Multifunción",
-        "ZERA ZMQ 304 + LANMU Meter",
-        "Schneider GM Seco RM6",
-        "ABB TOS 30kV"
-    ],
-    "Especificación": [
-        "Integración MT/BT con gestión activa de flujos y comunicaciones IEC 61850",
-        "30kV/690V, Dyn11, Z=6%, pérdidas < 5kW, refrigeración ONAN",
-        "2.5 MW bidireccional, eficiencia 98.7%, THD < 3%, función grid-forming",
-        "87T/50/51/67/27/59 con IEC 61850, tiempo actuación < 35ms, registrador de eventos",
-        "Clase 0.2S (IEC 62053-22), MID 2014/32/EU, medición bidireccional",
-        "30kV, 630A, Icw=25kA/1s, SF6-free, diseño compacto",
-        "30kV, relación 30000/100V, clase 0.2, 30VA, precisión ±0.2%"
-    ],
-    "Normativa": [
-        "IEC 61850-7-420, IEEE 1547-2018, UNE-EN 50549-1",
-        "IEC 60076-16, EN 50588-1, IEC 60076-7",
-        "IEC 62109-1/2, VDE-AR-N 4110, IEEE 1547a",
-        "IEC 60255, EN 50550, IEC 61660-1",
-        "IEC 62052-11, IEC 62053-22, MID 2014/32/EU, REE PE 13.3",
-        "IEC 62271-200, IEC 60420, IEC 62271-1",
-        "IEC 61869-1/3, IEC 60044-2, OIML R46"
-    ]
-}
-
-# Parámetros para cálculo de campos magnéticos según ICNIRP 2010
-EMF_PARAMS = {
-    "Frecuencia": "50 Hz",
-    "Límite exposición laboral": "100 μT",
-    "Límite exposición pública": "200 μT",
-    "Normativa de referencia": "ICNIRP 2010, Real Decreto 299/2016",
-    "Método de cálculo": "Modelo de dipolos magnéticos según IEC 62110",
-    "Factor de seguridad": "1.5"
-}
-
-def crear_diagrama_profesional():
-    """Crea un diagrama unifilar profesional con alto rigor técnico"""
-    fig, ax = plt.subplots(figsize=(18, 16))
-    ax.set_facecolor('white')
-    ax.set_xlim(0, 18)
-    ax.set_ylim(0, 16)
-    ax.axis('off')
-    
-    # Estilo profesional
-    line_style = dict(color='#005288', linewidth=2.5, zorder=1)
-    box_style = dict(boxstyle='round,pad=0.5', facecolor='#f0f7ff', edgecolor='#005288', alpha=0.95, linewidth=1.5)
-    mt_style = dict(color='#d62728', linewidth=3, linestyle='-')
-    
-    # ======== TÍTULO ========
-    ax.text(9, 15.5, 'DIAGRAMA UNIFILAR - PLANTA HÍBRIDA PV + BESS 5MW', 
-            ha='center', va='center', fontsize=18, fontweight='bold', color='#003366')
-    ax.text(9, 15, 'Sistema fotovoltaico 5MW + BESS 5MW/20MWh con integración AMIKIT en media tensión', 
-            ha='center', va='center', fontsize=14, color='#005288')
-    ax.text(9, 14.6, 'Cumplimiento IEC 61850, IEC 62110 (EMF < 100μT), UNE-EN 50549 y MID para medición', 
-            ha='center', va='center', fontsize=12, color='#d62728')
-    
-    # ======== SISTEMA FOTOVOLTAICO ========
-    # PV Array
-    ax.text(3, 13.5, 'CAMPO FOTOVOLTAICO 5MW', ha='center', va='center', fontsize=12, fontweight='bold', bbox=box_style)
-    for i in range(6):
-        x = 2 + i * 0.7
-        y = 12.5
-        # Símbolo de panel solar profesional
-        ax.add_patch(patches.Rectangle((x, y), 0.6, 0.3, fill=True, facecolor='#c9e3ed', edgecolor='#333333'))
-        ax.plot([x+0.1, x+0.5], [y+0.15, y+0.15], 'k-', linewidth=1)
-        ax.plot([x+0.3, x+0.3], [y+0.05, y+0.25], 'k-', linewidth=1)
-    
-    # String Inverters (5 x 1MW)
-    ax.text(3, 12, 'INVERSORES STRING', ha='center', va='center', fontsize=11, fontweight='bold')
-    ax.text(3, 11.8, '5 × 1 MW - Conexión AC 690V', ha='center', va='center', fontsize=10)
-    for i in range(5):
-        x = 2.2 + i * 0.8
-        # Símbolo de inversor profesional
-        ax.add_patch(patches.Rectangle((x, 11.3), 0.6, 0.6, fill=True, facecolor='#d1e7f0', edgecolor='#005288'))
-        # Símbolo de onda
-        t = np.linspace(0, 2*np.pi, 20)
-        ax.plot(x + 0.1 + 0.4*t/(2*np.pi), 11.6 + 0.1*np.sin(5*t), 'k-', linewidth=1)
-    
-    # ======== SISTEMA BESS EN CONTENEDORES ========
-    ax.text(14, 13.5, 'SISTEMA BESS EN CONTENEDORES', ha='center', va='center', fontsize=12, fontweight='bold', bbox=box_style)
-    ax.text(14, 13.2, '4 × 5 MWh (20\') - LiFePO4 - ENVISION EN-5MWh', ha='center', va='center', fontsize=11)
-    
-    # Contenedores BESS
-    for i in range(4):
-        x = 12 + i * 1.5
-        y = 12
-        # Símbolo de contenedor
-        ax.add_patch(patches.Rectangle((x, y), 1.2, 0.8, fill=True, facecolor='#e1f0fa', edgecolor='#005288', linewidth=1.5))
-        # Puertas
-        ax.add_patch(patches.Rectangle((x+0.9, y+0.1), 0.2, 0.6, fill=True, facecolor='#a9d0e8', edgecolor='#005288'))
-        # Ventilación
-        for j in range(3):
-            ax.add_patch(patches.Rectangle((x+0.2+j*0.3, y+0.7), 0.2, 0.05, fill=True, facecolor='#333333'))
-        # Etiqueta
-        ax.text(x+0.6, y+0.4, "BESS 5MWh", ha='center', va='center', fontsize=9)
-    
-    # Sistema de Gestión BESS
-    ax.text(16.5, 12.5, 'SISTEMA GESTIÓN BESS', ha='center', va='center', fontsize=10, fontweight='bold')
-    ax.add_patch(patches.Circle((16.5, 12), 0.4, fill=True, facecolor='#f0f7ff', edgecolor='#005288'))
-    ax.text(16.5, 12, "EMS\nBMS", ha='center', va='center', fontsize=9)
-    
-    # ======== BARRA AC Y PROTECCIONES ========
-    # Barra AC principal
-    ax.text(9, 11, 'BARRA AC 690V', ha='center', va='center', fontsize=12, fontweight='bold', bbox=box_style)
-    ax.add_patch(patches.Rectangle((6, 10.8), 6, 0.15, fill=True, facecolor='#005288'))
-    
-    # Interruptor General (ACB)
-    ax.text(9, 10.2, 'ACB PRINCIPAL', ha='center', va='center', fontsize=11)
-    ax.text(9, 10, '6300A - Icu=65kA - IEC 60947-2', ha='center', va='center', fontsize=10)
-    ax.add_patch(patches.Rectangle((8.8, 9.7), 0.4, 0.4, fill=True, facecolor='white', edgecolor='#005288'))
-    # Símbolo de interruptor
-    ax.plot([8.8, 9.0], [9.9, 9.7], 'k-', linewidth=1.5)
-    ax.plot([9.2, 9.0], [9.9, 9.7], 'k-', linewidth=1.5)
-    
-    # Transformadores de corriente (TC)
-    ax.text(7, 9.5, 'TC Medición', ha='center', va='center', fontsize=9)
-    ax.add_patch(patches.Circle((7, 9.0), 0.2, fill=True, facecolor='white', edgecolor='#333333'))
-    ax.text(7, 9.0, "CT", ha='center', va='center', fontsize=8)
-    
-    ax.text(11, 9.5, 'TC Protección', ha='center', va='center', fontsize=9)
-    ax.add_patch(patches.Circle((11, 9.0), 0.2, fill=True, facecolor='white', edgecolor='#333333'))
-    ax.text(11, 9.0, "CT", ha='center', va='center', fontsize=8)
-    
-    # ======== SISTEMA AMIKIT EN MEDIA TENSIÓN ========
-    ax.text(9, 8.5, 'SISTEMA AMIKIT - INTEGRACIÓN MEDIA TENSIÓN', ha='center', va='center', fontsize=12, fontweight='bold', bbox=box_style)
-    ax.text(9, 8.2, 'AMK-30MV - Interfaz MT/BT - IEC 61850 - Clase 0.2S MID', ha='center', va='center', fontsize=11, color='#d62728')
-    
-    # Caja AMIKIT
-    ax.add_patch(patches.Rectangle((7.5, 7.5), 3, 1.2, fill=True, facecolor='#e1f0fa', edgecolor='#d62728', linewidth=2))
-    
-    # Componentes internos AMIKIT (detallados)
-    # Celdas GIS
-    ax.add_patch(patches.Rectangle((7.7, 7.7), 0.8, 0.5, fill=True, facecolor='#a9d0e8', edgecolor='#333333'))
-    ax.text(8.1, 7.95, "Celdas GIS", fontsize=8, ha='center')
-    
-    # Transformador
-    ax.add_patch(patches.Rectangle((8.5, 7.7), 0.8, 0.5, fill=True, facecolor='#a9d0e8', edgecolor='#333333'))
-    ax.text(8.9, 7.95, "Trafo", fontsize=8, ha='center')
-    
-    # PCS
-    ax.add_patch(patches.Rectangle((7.7, 8.2), 0.8, 0.5, fill=True, facecolor='#a9d0e8', edgecolor='#333333'))
-    ax.text(8.1, 8.45, "PCS", fontsize=8, ha='center')
-    
-    # Protecciones
-    ax.add_patch(patches.Rectangle((8.5, 8.2), 0.8, 0.5, fill=True, facecolor='#a9d0e8', edgecolor='#333333'))
-    ax.text(8.9, 8.45, "Protecciones", fontsize=8, ha='center')
-    
-    # Medidor
-    ax.add_patch(patches.Rectangle((8.1, 7.9), 0.8, 0.2, fill=True, facecolor='#ffeb3b', edgecolor='#333333'))
-    ax.text(8.5, 8.0, "Medidor 0.2S MID", fontsize=7, ha='center')
-    
-    # Transformador de tensión (TT)
-    ax.text(10.5, 8.5, 'TT Medición', ha='center', va='center', fontsize=9)
-    ax.add_patch(patches.Rectangle((10.5, 8.0), 0.2, 0.3, fill=True, facecolor='white', edgecolor='#333333'))
-    ax.text(10.5, 8.15, "VT", ha='center', va='center', fontsize=8)
-    
-    # ======== TRANSFORMADOR HÍBRIDO ========
-    ax.text(9, 6.8, 'TRANSFORMADOR HÍBRIDO', ha='center', va='center', fontsize=12, fontweight='bold')
-    ax.text(9, 6.5, '5 MVA - 30kV/690V - Dyn11 - Z=6% - EN 50588 - Pérdidas < 5kW', ha='center', va='center', fontsize=11)
-    
-    # Símbolo de transformador profesional
-    ax.add_patch(patches.Circle((9, 6), 0.6, fill=False, edgecolor='#005288', linewidth=2))
-    ax.add_patch(patches.Circle((9, 6), 0.4, fill=False, edgecolor='#005288', linewidth=2))
-    # Devanados
-    for i in range(3):
-        angle = i * (2*np.pi/3)
-        ax.plot([9 + 0.5*np.cos(angle), 9 + 0.3*np.cos(angle)], 
-                [6 + 0.5*np.sin(angle), 6 + 0.3*np.sin(angle)], 'k-', linewidth=1.5)
-    
-    # ======== PUNTO DE CONEXIÓN Y MEDIDA ========
-    ax.text(9, 5, 'PUNTO DE CONEXIÓN A RED 30kV', ha='center', va='center', fontsize=12, fontweight='bold', bbox=box_style)
-    ax.text(9, 4.7, 'Límite 5MW - Medida Clase 0.2S - IEC 62053 - MID 2014/32/EU', ha='center', va='center', fontsize=11)
-    
-    # Símbolo de red eléctrica profesional
-    ax.add_patch(patches.Circle((9, 4.2), 0.5, fill=True, facecolor='#fff0f0', edgecolor='#d60000'))
-    # Símbolo de onda trifásica
-    for i in range(3):
-        angle = i * (2*np.pi/3)
-        x1 = 9 + 0.3 * np.cos(angle)
-        y1 = 4.2 + 0.3 * np.sin(angle)
-        x2 = 9 + 0.7 * np.cos(angle)
-        y2 = 4.2 + 0.7 * np.sin(angle)
-        ax.plot([x1, x2], [y1, y2], 'k-', linewidth=1.5)
-    
-    # Símbolo de medidor MID
-    ax.add_patch(patches.Rectangle((8.5, 3.8), 1, 0.3, fill=True, facecolor='#fffacd', edgecolor='#d6a000'))
-    ax.text(9, 4.0, "MEDIDOR ZERA ZMQ 304\nClase 0.2S - MID", ha='center', va='center', fontsize=9)
-    
-    # Pararrayos
-    ax.text(10.5, 5.0, 'PARARRAYOS', ha='center', va='center', fontsize=9)
-    ax.add_patch(patches.Rectangle((10.4, 4.8), 0.2, 0.4, fill=True, facecolor='white', edgecolor='#333333'))
-    # Símbolo de rayo
-    verts = [(10.5, 5.2), (10.45, 5.1), (10.5, 5.15), (10.55, 5.05), (10.5, 5.1)]
-    codes = [1, 2, 2, 2, 2]
-    path = mpath.Path(verts, codes)
-    patch = patches.PathPatch(path, facecolor='none', edgecolor='orange', linewidth=2)
-    ax.add_patch(patch)
-    
-    # ======== SISTEMA DE CONTROL ========
-    ax.text(16.5, 10, 'SCADA/EMS CENTRALIZADO', ha='center', va='center', fontsize=12, fontweight='bold', bbox=box_style)
-    ax.add_patch(patches.Rectangle((15, 9.3), 3, 1.2, fill=True, facecolor='#f0f7ff', edgecolor='#005288'))
-    ax.text(16.5, 9.8, 'Siemens Spectrum Power', ha='center', va='center', fontsize=11)
-    ax.text(16.5, 9.5, 'IEC 61850 - Modbus TCP - DNP3 - OPC UA', ha='center', va='center', fontsize=10)
-    ax.text(16.5, 9.2, 'Ciberseguridad IEC 62443', ha='center', va='center', fontsize=10, color='#d62728')
-    
-    # ======== CONEXIONES ========
-    # PV a Barra AC
-    ax.plot([3, 6], [12.5, 10.8], **line_style)
-    ax.plot([3, 6], [11.5, 10.8], **line_style)
-    
-    # BESS a Barra AC
-    ax.plot([14, 6], [12.5, 10.8], **line_style)
-    
-    # Barra AC a AMIKIT
-    ax.plot([9, 9], [10.8, 8.7], **line_style)
-    
-    # AMIKIT a Transformador
-    ax.plot([9, 9], [7.5, 6.6], **line_style)
-    
-    # Transformador a Red
-    ax.plot([9, 9], [5.4, 4.7], **line_style)
-    
-    # Conexiones de control
-    control_style = dict(color='#d60000', linewidth=1.5, linestyle='--', alpha=0.7)
-    ax.plot([9, 16.5], [10.8, 9.8], **control_style)  # Barra AC a SCADA
-    ax.plot([9, 16.5], [8.7, 9.8], **control_style)    # AMIKIT a SCADA
-    ax.plot([9, 16.5], [6, 9.8], **control_style)      # Transformador a SCADA
-    ax.plot([9, 16.5], [4.2, 9.8], **control_style)    # Red a SCADA
-    
-    # ======== LEYENDA Y DETALLES ========
-    legend_text = (
-        "LEYENDA TÉCNICA:\n"
-        "• BESS: Sistema almacenamiento en contenedores 20'\n"
-        "• AMIKIT: Integración MT/BT con gestión activa\n"
-        "• MID: Sistema de medida certificado para facturación\n"
-        "• PCS: Convertidor de potencia bidireccional\n"
-        "• ACB: Interruptor automático principal\n"
-        "• CT: Transformador de corriente\n"
-        "• VT: Transformador de tensión\n"
-        "• SCADA/EMS: Supervisión y control centralizado\n"
-        "• GIS: Celdas encapsuladas en SF6"
-    )
-    ax.text(1, 1.5, legend_text, ha='left', va='top', fontsize=10,
-            bbox=dict(boxstyle='round,pad=0.5', facecolor='#f5f5f5', edgecolor='#333333'))
-    
-    ax.text(17, 1.5, f"Rev: 4.0\nFecha: {pd.Timestamp.today().strftime('%d/%m/%Y')}\nCumple IEC 61850/50549/62110", 
-            ha='right', va='top', fontsize=9, 
-            bbox=dict(boxstyle='round,pad=0.5', facecolor='#f0f0f0', edgecolor='#333333'))
-    
-    plt.tight_layout()
-    plt.savefig('diagrama_unifilar_profesional.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    return 'diagrama_unifilar_profesional.png'
-
-def calcular_transformador_detallado():
-    """Realiza cálculos magnéticos detallados con verificación EMF para todo el sistema"""
-    # Parámetros de diseño actualizados
-    S_nom = 5e6  # VA (5 MVA)
-    V1 = 690     # V (primario)
-    V2 = 30000   # V (secundario)
-    f = 50       # Hz
-    B_max = 1.7  # T (inducción máxima)
-    J = 3.2      # A/mm² (densidad corriente)
-    k = 0.45     # Constante de diseño
-    dist_operacion = 1.5  # m (distancia operativa)
-    
-    # Cálculos eléctricos
-    relacion = V2 / V1
-    I1 = S_nom / (np.sqrt(3) * V1)
-    I2 = S_nom / (np.sqrt(3) * V2)
-    
-    # Cálculos magnéticos (IEC 60076)
-    A_fe = k * math.sqrt(S_nom)  # cm² (sección núcleo)
-    d_nucleo = math.sqrt(4 * A_fe / math.pi) * 100  # mm (diámetro equivalente)
-    phi_max = V1 / (4.44 * f * 100)  # Wb (flujo máximo)
-    
-    # Pérdidas (fórmulas IEC 60076-1)
-    Kh = 1.5   # Coeficiente de histéresis (material M4)
-    Ke = 0.02  # Coeficiente de corrientes parásitas
-    Pfe = (Kh * f * (B_max**1.6) + Ke * (f * B_max)**2) * (A_fe / 10000) * 1000  # kW
-    
-    # Pérdidas en el cobre (IEC 60076-1)
-    Rcc = 0.06 * (V1**2) / S_nom  # Resistencia de cortocircuito
-    Pcu = 3 * I1**2 * Rcc / 1000  # kW
-    
-    # Eficiencia
-    eficiencia = S_nom / (S_nom + Pfe*1000 + Pcu*1000) * 100
-    
-    # Cálculo campo magnético (IEC/EN 62110) para transformador
-    u0 = 4 * np.pi * 1e-7  # Permeabilidad del vacío
-    # Campo a 1 m (fórmula conservadora)
-    B_field_trafo = (u0 * I1 * math.sqrt(2)) / (2 * np.pi * dist_operacion) * 1e6  # μT
-    
-    # Factor de blindaje (típico para transformadores encapsulados)
-    factor_blindaje_trafo = 8  # Reducción típica 8:1
-    B_field_operacion_trafo = B_field_trafo / factor_blindaje_trafo
-    
-    # Cálculo campo magnético para BESS (IEC 62110)
-    I_bess = 5000 / (np.sqrt(3) * 690)  # Corriente nominal BESS (A)
-    B_field_bess = (u0 * I_bess * math.sqrt(2)) / (2 * np.pi * dist_operacion) * 1e6  # μT
-    factor_blindaje_bess = 5  # Reducción típica para contenedores
-    B_field_operacion_bess = B_field_bess / factor_blindaje_bess
-    
-    # Cálculo campo magnético para sistema AMIKIT
-    I_amikit = 5000 / (np.sqrt(3) * 690)  # Misma corriente que BESS
-    B_field_amikit = (u0 * I_amikit * math.sqrt(2)) / (2 * np.pi * dist_operacion) * 1e6  # μT
-    factor_blindaje_amikit = 6  # Blindaje en celdas MT
-    B_field_operacion_amikit = B_field_amikit / factor_blindaje_amikit
-    
-    # Campo magnético total (suma vectorial)
-    B_field_total = math.sqrt(
-        B_field_operacion_trafo**2 + 
-        B_field_operacion_bess**2 + 
-        B_field_operacion_amikit**2
-    )
-    
-    # Verificación norma (ICNIRP 2010)
-    limite_emf = 100  # μT para exposición laboral (50 Hz)
-    cumple_emf = B_field_total < limite_emf
-    
-    # Resultados con explicaciones técnicas
-    resultados = {
-        "Parámetros de Diseño": {
-            "Potencia nominal": f"{S_nom/1e6:.1f} MVA",
-            "Tensión primario": f"{V1} V",
-            "Tensión secundario": f"{V2} V",
-            "Frecuencia": f"{f} Hz",
-            "Inducción máxima": f"{B_max} T (acero M4)",
-            "Densidad de corriente": f"{J} A/mm²",
-            "Conexión": "Dyn11 (IEC 60076)"
-        },
-        "Cálculos Magnéticos": [
-            f"Relación de transformación: m = V2/V1 = {V2}/{V1} = {relacion:.2f}",
-            f"Corriente primaria: I1 = S / (√3 × V1) = {S_nom}/(1.732×{V1}) = {I1:.1f} A",
-            f"Corriente secundaria: I2 = S / (√3 × V2) = {S_nom}/(1.732×{V2}) = {I2:.1f} A",
-            f"Sección del núcleo: A_fe = k × √S = {k} × √{S_nom/1e6} = {A_fe:.1f} cm² (IEC 60076-1)",
-            f"Diámetro equivalente núcleo: d = √(4×A_fe/π) = √(4×{A_fe:.1f}/3.1416) = {d_nucleo:.1f} mm",
-            f"Flujo magnético máximo: Φ_max = V1/(4.44×f×N) = {V1}/(4.44×{f}×100) = {phi_max:.5f} Wb",
-            f"Pérdidas en núcleo (Pfe): Pfe = K_h·f·B_max¹·⁶ + K_e·(f·B_max)² = {Kh}×{f}×{B_max}¹·⁶ + {Ke}×({f}×{B_max})² = {Pfe:.1f} kW (IEC 60076-1)",
-            f"Pérdidas en cobre (Pcu): Pcu = 3·I1²·Rcc = 3×({I1:.1f})²×{Rcc:.5f} = {Pcu:.1f} kW",
-            f"Eficiencia: η = S/(S + Pfe + Pcu) × 100 = {S_nom}/({S_nom} + {Pfe*1000} + {Pcu*1000}) × 100 = {eficiencia:.2f}%"
-        ],
-        "Análisis Campo Magnético (EMF) según IEC 62110": [
-            f"Campo magnético transformador (1.5m): {B_field_trafo:.2f} μT → Blindaje (1/{factor_blindaje_trafo}) → {B_field_operacion_trafo:.2f} μT",
-            f"Campo magnético BESS (1.5m): {B_field_bess:.2f} μT → Blindaje (1/{factor_blindaje_bess}) → {B_field_operacion_bess:.2f} μT",
-            f"Campo magnético AMIKIT (1.5m): {B_field_amikit:.2f} μT → Blindaje (1/{factor_blindaje_amikit}) → {B_field_operacion_amikit:.2f} μT",
-            f"Campo magnético total (RMS): √(ΣB²) = {B_field_total:.2f} μT",
-            f"Límite ICNIRP 2010 para exposición laboral: {limite_emf} μT",
-            f"Cumplimiento normativa EMF: {'Sí' if cumple_emf else 'No'} - {B_field_total:.2f} μT < {limite_emf} μT",
-            "Recomendación: Mantener distancia mínima de 1.5m en áreas operativas y verificar con mediciones in situ"
-        ],
-        "Recomendaciones": [
-            "Material núcleo: Acero al silicio M4 (0.23 mm) para reducir pérdidas y campos magnéticos",
-            f"Sección cobre primario: A_cu1 = I1/J = {I1:.1f}/{J} = {I1/J:.1f} mm² → Seleccionar 2×150 mm² por fase",
-            f"Sección cobre secundario: A_cu2 = I2/J = {I2:.1f}/{J} = {I2/J:.1f} mm² → Seleccionar 1×35 mm² por fase",
-            "Refrigeración: ONAN (Oil Natural Air Natural) con radiadores y ventilación forzada",
-            "Protecciones: Relé Buchholz, termómetros PT100, monitor continuo de gases disueltos",
-            f"Impedancia cortocircuito: 6% (IEC 60076-5) para limitar corrientes de fallo",
-            "Pruebas: Relación/fase, resistencia devanados, respuesta frecuencia (FRA), ensayos de impulso"
-        ]
-    }
-    return resultados
-
-def simular_arbitraje_detallado():
-    """Simula estrategia de arbitraje con contenedores BESS específicos"""
-    horas = list(range(24))
-    # Precios OMIE 2024 actualizados
-    precios = [42.3, 40.1, 38.5, 36.2, 34.8, 33.5, 32.1, 31.5, 30.8, 32.5, 36.7, 42.5, 
-               48.2, 55.3, 62.7, 68.9, 74.5, 82.1, 88.7, 85.2, 78.3, 70.5, 65.2, 58.7]
-    
-    # Generación PV para Madrid con datos reales
-    generacion = [0, 0, 0, 0, 1250, 2850, 4250, 4950, 5200, 5350, 5450, 5650,
-                  5850, 6050, 5750, 5150, 4650, 3850, 2350, 1050, 450, 0, 0, 0]
-    
-    # Parámetros BESS en contenedores
-    n_contenedores = 4
-    capacidad_contenedor = 5000  # kWh
-    capacidad_total = n_contenedores * capacidad_contenedor  # 20 MWh
-    potencia_max = 5000  # kW (5 MW)
-    eficiencia = 0.92    # Eficiencia round-trip
-    soc_min = 0.2        # SOC mínimo operativo
-    soc_max = 0.95       # SOC máximo operativo
-    
-    # Estado inicial por contenedor
-    bess_soc = [capacidad_contenedor * 0.5] * n_contenedores  # 50% inicial
-    ingresos_diarios = 0
-    energia_perdida = 0
-    ciclos_diarios = [0] * n_contenedores
-    operaciones = []
-    
-    for hora in range(24):
-        # Excedente de generación (sobre límite de 5 MW)
-        excedente = max(0, generacion[hora] - 5000)
-        accion = [""] * n_contenedores
-        energia_cargada = [0] * n_contenedores
-        energia_descargada = [0] * n_contenedores
-        
-        # Estrategia: Carga durante bajo precio (mediodía)
-        if precios[hora] < 40 and excedente > 0:
-            for i in range(n_contenedores):
-                if bess_soc[i] < capacidad_contenedor * soc_max:
-                    # Capacidad disponible para carga
-                    capacidad_disponible = capacidad_contenedor * soc_max - bess_soc[i]
-                    # Máximo que se puede cargar
-                    carga_posible = min(potencia_max/n_contenedores, capacidad_disponible / eficiencia)
-                    # Limitar por excedente disponible
-                    carga_real = min(carga_posible, excedente/n_contenedores)
-                    
-                    # Actualizar estado de carga
-                    energia_almacenada = carga_real * eficiencia
-                    bess_soc[i] += energia_almacenada
-                    energia_cargada[i] = carga_real
-                    excedente -= carga_real
-                    accion[i] = f"Carga: {carga_real:.0f} kW"
-                    ciclos_diarios[i] += carga_real / capacidad_total
-        
-        # Estrategia: Descarga durante alto precio (tarde-noche)
-        elif precios[hora] > 65:
-            for i in range(n_contenedores):
-                if bess_soc[i] > capacidad_contenedor * soc_min:
-                    # Máximo que se puede descargar
-                    descarga = min(potencia_max/n_contenedores, bess_soc[i] * eficiencia)
-                    # Calcular energía entregada
-                    energia_entregada = descarga
-                    # Actualizar estado de carga
-                    bess_soc[i] -= descarga / eficiencia
-                    # Calcular ingresos
-                    ingreso_hora = energia_entregada * precios[hora] / 1000  # €
-                    ingresos_diarios += ingreso_hora
-                    energia_descargada[i] = descarga
-                    accion[i] = f"Descarga: {descarga:.0f} kW"
-                    ciclos_diarios[i] += descarga / capacidad_total
-        
-        # Calcular energía perdida por curtailment
-        if excedente > 0:
-            energia_perdida += excedente
-        
-        # Registrar operación
-        for i in range(n_contenedores):
-            operaciones.append({
-                "Hora": hora,
-                "Contenedor": i+1,
-                "Precio (€/MWh)": precios[hora],
-                "Generación PV (kW)": generacion[hora],
-                "Acción BESS": accion[i],
-                "Energía Cargada (kWh)": energia_cargada[i],
-                "Energía Descargada (kWh)": energia_descargada[i],
-                "SOC BESS (%)": (bess_soc[i] / capacidad_contenedor) * 100
-            })
-    
-    df_operaciones = pd.DataFrame(operaciones)
-    
-    # Cálculo de indicadores clave
-    total_potential_curtailment = sum([max(0, g-5000) for g in generacion])
-    
-    if total_potential_curtailment > 0:
-        reduccion_curtailment = 100 * (1 - energia_perdida / total_potential_curtailment)
-    else:
-        reduccion_curtailment = 100
-    
-    ingresos_anuales = ingresos_diarios * 365
-    capex = 2.8e6  # € (140k€/MWh para 20MWh según requerimiento)
-    opex_anual = 100000  # €/año
-    vida_util = 12  # años
-    flujos = [-capex] + [(ingresos_anuales - opex_anual)] * vida_util
-    van = npf.npv(0.08, flujos)
-    
-    # Cálculo vida útil basada en ciclos
-    ciclos_promedio = sum(ciclos_diarios) / n_contenedores * 365
-    vida_util_ciclos = 7000 / (ciclos_promedio * 0.8)  # 7000 ciclos @ 80% DoD
-    
-    resumen = {
-        "Ingresos diarios": f"{ingresos_diarios:.2f} €",
-        "Ingresos anuales": f"{ingresos_anuales:.2f} €",
-        "Energía perdida (curtailment)": f"{energia_perdida:.0f} kWh/día",
-        "Reducción de curtailment": f"{reduccion_curtailment:.1f}%",
-        "VAN (8% descuento)": f"{van/1e6:.2f} M€",
-        "Ciclos diarios equivalentes": f"{(sum(ciclos_diarios)/n_contenedores)*100:.2f}% DoD",
-        "Vida útil estimada": f"{min(vida_util, vida_util_ciclos):.1f} años"
-    }
-    
-    return df_operaciones, resumen
-
-def analisis_sensibilidad():
-    """Genera matriz de sensibilidad para parámetros clave"""
-    fig, ax = plt.subplots(figsize=(12, 8))
-    
-    # Parámetros variables (actualizados a 140k€/MWh)
-    precios_energia = np.linspace(50, 120, 7)  # €/MWh
-    capex_bess = np.linspace(100, 180, 6)      # €/kWh (rango alrededor de 140)
-    
-    # Matriz de resultados
-    van_matrix = np.zeros((len(precios_energia), len(capex_bess)))
-    
-    # Función para cálculo de VAN
-    def calcular_van(precio_medio, capex):
-        ingresos_anuales = 740000 * (precio_medio / 70)  # 70€ es el precio base
-        opex_anual = 100000
-        capex_total = capex * 20000  # 20 MWh
-        flujos = [-capex_total] + [(ingresos_anuales - opex_anual)] * 12
-        return npf.npv(0.08, flujos) / 1e6  # En millones de €
-    
-    for i, precio in enumerate(precios_energia):
-        for j, costo in enumerate(capex_bess):
-            van_matrix[i, j] = calcular_van(precio, costo)
-    
-    # Heatmap profesional
-    im = ax.imshow(van_matrix, cmap="RdYlGn")
-    cbar = ax.figure.colorbar(im, ax=ax)
-    cbar.set_label('VAN (M€)', rotation=270, labelpad=20)
-    
-    # Etiquetas
-    ax.set_xticks(np.arange(len(capex_bess)))
-    ax.set_yticks(np.arange(len(precios_energia)))
-    ax.set_xticklabels([f"{c:.0f}€/kWh" for c in capex_bess])
-    ax.set_yticklabels([f"{p:.0f}€/MWh" for p in precios_energia])
-    ax.set_xlabel("CAPEX BESS (€/kWh)")
-    ax.set_ylabel("Precio Medio Energía (€/MWh)")
-    ax.set_title("Análisis de Sensibilidad: VAN vs CAPEX y Precios Energía")
-    
-    # Texto en celdas
-    for i in range(len(precios_energia)):
-        for j in range(len(capex_bess)):
-            text = ax.text(j, i, f"{van_matrix[i, j]:.1f}",
-                           ha="center", va="center", color="black", fontsize=9)
-    
-    plt.tight_layout()
-    plt.savefig('sensibilidad_van.png', dpi=300)
-    plt.close()
-    return 'sensibilidad_van.png'
-
-def estudio_cortocircuito():
-    """Realiza cálculo detallado de corrientes de cortocircuito según IEC 60909"""
-    # Parámetros del sistema actualizados
-    S_red = 500e6  # VA (500 MVA)
-    V_red = 30e3   # V
-    Z_transf = 0.06 # p.u.
-    V_transf = 690  # V
-    S_transf = 5e6  # VA
-    
-    # Cálculos según IEC 60909
-    I_cc_red = S_red * 1e6 / (np.sqrt(3) * V_red)  # Corriente simétrica red
-    I_cc_transf = (S_transf / (np.sqrt(3) * V_transf)) / Z_transf  # Corriente lado BT
-    I_cc_max = I_cc_transf * 2.5  # Considerando componente DC
-    
-    # Factor de impedancia para BESS (IEC 61660-1)
-    Z_bess = 0.05  # p.u.
-    I_cc_bess = (5e6 / (np.sqrt(3) * 690)) / Z_bess
-    
-    # Tabla de resultados
-    resultados = {
-        "Punto de fallo": ["Red 30kV", "Barra 690V", "Salida BESS"],
-        "Icc simétrica (kA)": [f"{I_cc_red/1000:.2f}", f"{I_cc_transf/1000:.2f}", f"{I_cc_bess/1000:.2f}"],
-        "Icc asimétrica (kA)": [f"{I_cc_red*2.5/1000:.2f}", f"{I_cc_transf*2.5/1000:.2f}", f"{I_cc_bess*1.8/1000:.2f}"],
-        "Protección asignada": ["Rele 67 (Siemens 7SA8)", "ACB 65kA (ABB Emax)", "Fusible gI 50kA (Eaton Bussmann)"],
-        "Normativa": ["IEC 60909", "IEC 60909", "IEC 61660-1"]
-    }
-    return pd.DataFrame(resultados)
-
-def modelo_termico_bess():
-    """Simula comportamiento térmico de contenedores BESS"""
-    # Parámetros LiFePO4 (CATL EnerOne)
-    capacidad_termica = 950   # J/kg·K
-    masa_celda = 2.8          # kg (306Ah)
-    R_termica = 0.45          # K/W
-    T_amb = 25                # °C
-    T_max_oper = 45           # °C
-    
-    # Simulación de carga
-    tiempo = np.arange(0, 24, 0.1)
-    temperatura = np.zeros(len(tiempo))
-    potencia = np.zeros(len(tiempo))
-    temperatura[0] = T_amb
-    
-    for i, t in enumerate(tiempo):
-        # Perfil de operación
-        if 10 <= t % 24 <= 14:   # Período de carga solar
-            potencia[i] = 5000 * (1 - 0.2*np.sin(2*np.pi*(t-10)/4))
-        elif 18 <= t % 24 <= 22:  # Período de descarga
-            potencia[i] = -5000 * (0.8 + 0.2*np.sin(2*np.pi*(t-18)/4))
-        else:
-            potencia[i] = 0
-        
-        # Ecuación diferencial térmica (modelo de primer orden)
-        if i > 0:
-            dT = (abs(potencia[i]) * 1000 * R_termica - (temperatura[i-1] - T_amb)) / (capacidad_termica * masa_celda)
-            temperatura[i] = temperatura[i-1] + dT * 0.1
-    
-    # Gráfico profesional
-    fig, ax1 = plt.subplots(figsize=(12, 6))
-    
-    color = 'tab:red'
-    ax1.set_xlabel('Tiempo (h)', fontsize=12)
-    ax1.set_ylabel('Temperatura (°C)', color=color, fontsize=12)
-    ax1.plot(tiempo, temperatura, color=color, linewidth=2)
-    ax1.tick_params(axis='y', labelcolor=color)
-    ax1.axhline(y=T_max_oper, color='r', linestyle='--', linewidth=2, label='Límite operativo')
-    ax1.axhline(y=60, color='darkred', linestyle='-.', linewidth=2, label='Límite seguridad')
-    ax1.set_ylim(20, 65)
-    ax1.legend(loc='upper left')
-    ax1.grid(True, linestyle='--', alpha=0.7)
-    
-    ax2 = ax1.twinx()
-    color = 'tab:blue'
-    ax2.set_ylabel('Potencia (kW)', color=color, fontsize=12)
-    ax2.plot(tiempo, potencia, color=color, linewidth=2)
-    ax2.tick_params(axis='y', labelcolor=color)
-    ax2.set_ylim(-6000, 6000)
-    
-    plt.title('Comportamiento Térmico del BESS (Contenedor ENVISION EN-5MWh)', fontsize=14)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig('modelo_termico_bess.png', dpi=300)
-    plt.close()
-    return 'modelo_termico_bess.png'
-
-def analisis_lca():
-    """Calcula huella de carbono y retorno energético para contenedores BESS"""
-    # Datos de referencia (fuente: Ecoinvent 3.8)
-    huella_pv = 38     # gCO2/kWh
-    huella_bess = 75   # gCO2/kWh (LiFePO4)
-    energia_incorporada = 5200  # MWh equivalente
-    
-    # Cálculos actualizados
-    energia_anual = 7800  # MWh/año (PV + BESS)
-    huella_operacion = (energia_anual * huella_pv) / 1000  # tCO2/año
-    huella_construccion = (energia_incorporada * huella_bess) / 1000  # tCO2
-    
-    # Retorno energético
-    eroi = (energia_anual * 12) / energia_incorporada  # Energía producida/vida útil
-    
-    # Tiempo de recuperación carbono
-    reduccion_co2 = energia_anual * 0.35 * 1000  # tCO2/año (considerando mix eléctrico español)
-    tiempo_recuperacion = huella_construccion / reduccion_co2
-    
-    return {
-        "Huella Carbono Construcción (tCO2)": f"{huella_construccion:.1f}",
-        "Huella Carbono Operación (tCO2/año)": f"{huella_operacion:.1f}",
-        "Reducción Emisiones Anual (tCO2)": f"{reduccion_co2:.0f}",
-        "Energía Incorporada (MWh)": f"{energia_incorporada}",
-        "Retorno Energético (EROI)": f"{eroi:.1f}",
-        "Periodo Recuperación Energía (meses)": f"{(energia_incorporada/energia_anual)*12:.1f}",
-        "Periodo Recuperación Carbono (años)": f"{tiempo_recuperacion:.1f}"
-    }
-
-def cronograma_implementacion():
-    """Genera diagrama de Gantt para el proyecto actualizado"""
-    # Crear fechas
-    fechas = {
-        "Estudio Detalle": (datetime(2024, 7, 1), datetime(2024, 9, 30)),
-        "Ingeniería Básica": (datetime(2024, 8, 1), datetime(2024, 11, 30)),
-        "Procura Equipos": (datetime(2024, 10, 1), datetime(2025, 4, 30)),
-        "Preparación Terreno": (datetime(2025, 2, 1), datetime(2025, 5, 31)),
-        "Instalación BESS": (datetime(2025, 4, 1), datetime(2025, 8, 31)),
-        "Integración AMIKIT": (datetime(2025, 6, 1), datetime(2025, 9, 30)),
-        "Conexión y Pruebas": (datetime(2025, 8, 1), datetime(2025, 11, 30)),
-        "Puesta en Marcha": (datetime(2025, 10, 1), datetime(2026, 1, 31))
-    }
-    
-    # Crear gráfico de Gantt profesional
-    fig, ax = plt.subplots(figsize=(14, 6))
-    colors = plt.cm.tab10(np.linspace(0, 1, len(fechas)))
-    
-    for i, (tarea, (inicio, fin)) in enumerate(fechas.items()):
-        duracion = (fin - inicio).days
-        ax.barh(tarea, duracion, left=inicio, height=0.6, color=colors[i], edgecolor='black')
-    
-    ax.set_xlabel("Timeline", fontsize=12)
-    ax.set_title("Cronograma de Implementación del Proyecto", fontsize=14)
-    ax.xaxis.set_major_locator(mdates.MonthLocator())
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
-    plt.gcf().autofmt_xdate()
-    plt.grid(axis='x', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    plt.savefig('cronograma_proyecto.png', dpi=300)
-    plt.close()
-    return 'cronograma_proyecto.png'
-
-def simulacion_monte_carlo(n_sim=10000):
-    """Realiza simulación Monte Carlo para VAN del proyecto actualizado"""
-    np.random.seed(42)
-    
-    # Distribuciones de probabilidad actualizadas (CAPEX = 2.8M€ según 140k€/MWh)
-    ingresos = np.random.triangular(600000, 740000, 900000, n_sim)
-    capex = np.random.normal(2800000, 140000, n_sim)  # 2.8M€ ± 140k
-    opex = np.random.uniform(80000, 120000, n_sim)
-    vida_util = np.random.randint(10, 15, n_sim)
-    tasa_descuento = np.random.normal(0.08, 0.01, n_sim)
-    
-    # Cálculo VAN
-    van_results = []
-    for i in range(n_sim):
-        flujos = [-capex[i]] + [ingresos[i] - opex[i]] * vida_util[i]
-        van = npf.npv(tasa_descuento[i], flujos)
-        van_results.append(van)
-    
-    # Análisis estadístico
-    van_mean = np.mean(van_results)
-    van_std = np.std(van_results)
-    prob_positivo = sum(v > 0 for v in van_results) / n_sim * 100
-    
-    # Histograma profesional
-    plt.figure(figsize=(10, 6))
-    n, bins, patches = plt.hist(van_results, bins=50, color='#1f77b4', edgecolor='#003366', alpha=0.7)
-    
-    # Colorear áreas positivas/negativas
-    for i in range(len(bins)-1):
-        if bins[i] < 0:
-            patches[i].set_facecolor('#ff7f0e')
-    
-    plt.axvline(van_mean, color='r', linestyle='dashed', linewidth=2, label=f'Media: €{van_mean/1e6:.2f}M')
-    plt.title('Distribución del Valor Actual Neto (VAN) - Simulación Monte Carlo', fontsize=14)
-    plt.xlabel('VAN (€)', fontsize=12)
-    plt.ylabel('Frecuencia', fontsize=12)
-    plt.legend()
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    plt.savefig('monte_carlo_van.png', dpi=300)
-    plt.close()
-    
-    return {
-        "VAN Promedio (€)": f"{van_mean:,.0f}",
-        "Desviación Estándar (€)": f"{van_std:,.0f}",
-        "Probabilidad VAN > 0 (%)": f"{prob_positivo:.1f}%",
-        "Intervalo 95% Confianza (€)": f"[{np.percentile(van_results, 2.5):,.0f}, {np.percentile(van_results, 97.5):,.0f}]",
-        "Simulaciones": f"{n_sim}"
-    }
-
-def generar_tabla_especificaciones():
-    """Crea tabla profesional de especificaciones técnicas actualizada"""
-    especificaciones = [
-        ("Módulos FV", "JinkoTiger Neo 78TR", "625W", "22.6%", "25 años", "IEC 61215/61730"),
-        ("Inversores", "Sungrow SG3500HV", "3.5MW", "98.8%", "IP66", "IEC 62109-2"),
-        ("Baterías", "CATL EnerC 306Ah", "3.2V, 306Ah", "6000@80%DoD", "CTP 3.0", "IEC 62619"),
-        ("Contenedores BESS", "ENVISION EN-5MWh", "5MWh/20'", "280Wh/L", "Aire forzado", "IEC 62933"),
-        ("Sistema AMIKIT", "AMK-30MV", "30kV/690V", "IEC 61850", "Clase 0.2S MID", "IEC 61850-7-420"),
-        ("SCADA", "Siemens Spectrum Power", "N/A", "IEC 62443-3-3", "Redundante", "IEC 62443")
-    ]
-    
-    return pd.DataFrame(especificaciones, 
-                        columns=["Componente", "Modelo", "Parámetro Clave", "Eficiencia/Vida", "Característica", "Normativa"])
-
-def lista_certificaciones():
-    """Lista de certificaciones requeridas y obtenidas actualizada"""
-    normas = [
-        ("IEC 62933-5-2", "Seguridad sistemas almacenamiento", "Requisito", "Certificado"),
-        ("IEC 61850-7-420", "Comunicaciones sistemas DER", "Requisito", "Certificado"),
-        ("UNE-EN 50549-1", "Conexión a red", "Requisito", "Certificado"),
-        ("IEC 62477-1", "Seguridad convertidores", "Requisito", "Certificado"),
-        ("IEC 62109-1", "Seguridad inversores", "Requisito", "Certificado"),
-        ("CEI 0-21", "Conexión a red BT", "Requisito España", "Certificado"),
-        ("MID 2014/32/EU", "Medición para facturación", "Requisito", "En proceso"),
-        ("ISO 50001", "Gestión energética", "Recomendada", "Planificado")
-    ]
-    
-    return pd.DataFrame(normas, columns=["Norma", "Ámbito", "Prioridad", "Estado"])
-
-def generar_informe_completo():
-    """Genera un informe profesional en Word con todos los componentes actualizados"""
-    doc = Document()
-    
-    # Configuración inicial
-    section = doc.sections[0]
-    section.orientation = WD_ORIENT.LANDSCAPE
-    section.page_width = Inches(11)
-    section.page_height = Inches(8.5)
-    
-    # ========= PORTADA =========
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run("INFORME TÉCNICO: HIBRIDACIÓN PV + BESS CON INTEGRACIÓN AMIKIT")
-    run.font.size = Pt(24)
-    run.font.color.rgb = RGBColor(0, 51, 102)
-    run.bold = True
-    
-    doc.add_paragraph().add_run().add_break()
-    
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run("Planta Fotovoltaica 5MW + BESS 5MW/20MWh en contenedores de 20'")
-    run.font.size = Pt(18)
-    run.font.color.rgb = RGBColor(0, 102, 204)
-    
-    doc.add_paragraph().add_run().add_break()
-    
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run("Solución técnica con integración AMIKIT en media tensión, medición de precisión y cumplimiento EMF")
-    run.font.size = Pt(14)
-    
-    doc.add_paragraph().add_run().add_break()
-    doc.add_paragraph().add_run().add_break()
-    
-    # ========= RESUMEN EJECUTIVO =========
-    doc.add_heading('Resumen Ejecutivo', level=1)
-    resumen = (
-        "Este informe presenta un análisis técnico-económico completo para la hibridación de una planta fotovoltaica "
-        "existente de 5 MW mediante la incorporación de un sistema de almacenamiento BESS de 5MW/20MWh en contenedores "
-        "de 20' (ENVISION EN-5MWh). La solución propuesta integra tecnología AMIKIT para la conexión en media tensión, "
-        "con un sistema de medición de precisión clase 0.2S certificado MID y cumplimiento de normativa de campos "
-        "electromagnéticos (<100 μT según ICNIRP 2010). El diseño garantiza máxima rentabilidad mediante arbitraje "
-        "energético, reducción del curtailment en un 82%, y un VAN positivo de €3.2 millones con CAPEX optimizado."
-    )
-    doc.add_paragraph(resumen)
-    
-    doc.add_heading('Beneficios Clave', level=2)
-    beneficios = [
-        "Integración profesional en media tensión con sistema AMIKIT (células GIS, protecciones digitales)",
-        "Sistema de medida avanzado clase 0.2S con certificación MID para facturación precisa",
-        "Reducción del 82% en curtailment (de 1.2 GWh/año a 0.22 GWh/año)",
-        "Incremento de ingresos: €740,000 anuales por arbitraje energético",
-        "Cumplimiento estricto de normativa EMF (ICNIRP 2010) con campo magnético < 90μT",
-        "CAPEX optimizado a 140k€/MWh (total 2.8M€) para entrega en 2026",
-        "VAN positivo de €3.2 millones con ROI de 4.8 años"
-    ]
-    
-    for beneficio in beneficios:
-        p = doc.add_paragraph(style='List Bullet')
-        p.add_run(beneficio)
-    
-    # ========= DIAGRAMA UNIFILAR =========
-    doc.add_heading('Diagrama Unifilar Profesional', level=1)
-    diagrama_path = crear_diagrama_profesional()
-    doc.add_picture(diagrama_path, width=Inches(10))
-    last_paragraph = doc.paragraphs[-1] 
-    last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    doc.add_paragraph("Figura 1: Diagrama unifilar detallado con integración AMIKIT en media tensión").italic = True
-    doc.add_paragraph("Nota: Sistema cumple IEC 61850, IEC 62110, UNE-EN 50549 y MID para medición").italic = True
-    
-    # ========= ESPECIFICACIONES TÉCNICAS =========
-    doc.add_heading('Especificaciones Técnicas Detalladas', level=1)
-    especificaciones = generar_tabla_especificaciones()
-    
-    table = doc.add_table(rows=1, cols=len(especificaciones.columns))
-    table.style = 'Light Shading'
-    hdr_cells = table.rows[0].cells
-    for i, col in enumerate(especificaciones.columns):
-        hdr_cells[i].text = col
-        hdr_cells[i].paragraphs[0].runs[0].bold = True
-    
-    for _, row in especificaciones.iterrows():
-        row_cells = table.add_row().cells
-        for i, value in enumerate(row):
-            row_cells[i].text = str(value)
-    
-    # ======== DETALLE SISTEMA AMIKIT Y MEDICIÓN ========
-    doc.add_heading('Sistema AMIKIT para Integración en Media Tensión', level=2)
-    doc.add_paragraph("El sistema AMIKIT es una solución integrada para la conexión de plantas de generación y almacenamiento a redes de media tensión, basada en estándares internacionales y diseñada para cumplir con los requisitos de los códigos de red más exigentes.")
-    
-    doc.add_heading('Arquitectura del Sistema', level=3)
-    arquitectura = [
-        "Celdas GIS Schneider GM Seco RM6: Diseño SF6-free, capacidad 630A continuos, 25kA/1s de cortocircuito",
-        "Transformador Híbrido ABB AMDT 5MVA: Optimizado para operación con generación renovable, baja impedancia (6%) y alta eficiencia (>98%)",
-        "Convertidor de Potencia SMA SC 2500: Tecnología bidireccional con función grid-forming para soporte de red y capacidad black start",
-        "Sistema de Protecciones SIPROTEC 5: Relés multifunción con comunicación IEC 61850, registrador de eventos y calidad de energía",
-        "Medidor de Energía ZERA ZMQ 304: Clase 0.2S, certificación MID, medición bidireccional activa-reactiva"
-    ]
-    for item in arquitectura:
-        doc.add_paragraph(item, style='List Bullet')
-    
-    doc.add_heading('Punto de Medida para Facturación y Control', level=3)
-    medicion = [
-        "Equipo: Medidor trifásico ZERA ZMQ 304, clase 0.2S según IEC 62053-22",
-        "Certificación: MID 2014/32/EU para facturación, cumplimiento REE PE 13.3",
-        "Precisión: ±0.2% en rango 5-120% de In, ±0.5% para energía reactiva",
-        "Funciones: Medición activa, reactiva, aparente, energía en cuatro cuadrantes, armónicos hasta 40º orden",
-        "Comunicaciones: Modbus TCP, IEC 61850-8-1 (MMS), interfaz óptica para verificación in situ",
-        "Transformadores: ABB TOS 30kV (tensión) y ABB TCS (corriente) clase 0.2",
-        "Integración: Con SCADA central mediante protocolo IEC 61850 para monitorización en tiempo real"
-    ]
-    for item in medicion:
-        doc.add_paragraph(item, style='List Bullet')
-    
-    doc.add_paragraph("La configuración de medida incluye transformadores de precisión ubicados estratégicamente para garantizar la exactitud requerida por el operador de red, con calibración trazable a patrones nacionales.")
-    
-    # ========= FUNDAMENTOS TÉCNICOS =========
-    doc.add_heading('Fundamentos Técnicos del Diseño', level=1)
-    
-    # Explicación integración AMIKIT
-    doc.add_heading('Integración en Media Tensión con AMIKIT', level=2)
-    contenido = (
-        "El sistema AMIKIT proporciona una solución completa para la conexión en media tensión, con los siguientes componentes clave:\n\n"
-        "1. **Celdas GIS (Schneider GM Seco RM6):**\n"
-        "   - Diseño encapsulado SF6-free para 30kV con tecnología de vacío\n"
-        "   - Capaz de 630A continuos y 25kA/1s de corriente de cortocircuito\n"
-        "   - Interruptor-seccionador con mando motorizado y enclavamiento mecánico\n"
-        "   - Diseño compacto para reducción de huella y facilidad de mantenimiento\n\n"
-        "2. **Transformador Híbrido (ABB AMDT 5MVA):**\n"
-        "   - Relación 30kV/690V, grupo de conexión Dyn11 para minimizar armónicos\n"
-        "   - Impedancia del 6% para limitación de corrientes de cortocircuito\n"
-        "   - Diseño optimizado para operación con inversores (THD < 3% en vacío)\n"
-        "   - Refrigeración ONAN con capacidad de sobrecarga del 150% durante 30 minutos\n\n"
-        "3. **PCS Integrado (SMA SC 2500):**\n"
-        "   - Convertidor bidireccional de 2.5 MW con eficiencia del 98.7%\n"
-        "   - Funciones grid-forming para soporte de red (frecuencia, tensión, inercia sintética)\n"
-        "   - Respuesta en frecuencia (FRT) según requisitos REE C60\n"
-        "   - Operación en isla con capacidad black start\n\n"
-        "4. **Sistema de Protecciones (SIPROTEC 5):**\n"
-        "   - Protecciones diferenciales (87T), sobrecorriente (50/51)\n"
-        "   - Protecciones direccionales (67), sub/sovretensión (27/59)\n"
-        "   - Protección de frecuencia (81), disparo por vector de impedancia (21)\n"
-        "   - Comunicación IEC 61850 para coordinación centralizada con SCADA\n\n"
-        "5. **Punto de Medida (ZERA ZMQ 304):**\n"
-        "   - Clase de precisión 0.2S según IEC 62053-22\n"
-        "   - Cumplimiento MID 2014/32/EU para facturación\n"
-        "   - Medición de energía en cuatro cuadrantes, potencia activa/reactiva\n"
-        "   - Análisis de calidad de energía (THD, flicker, desequilibrios)"
-    )
-    doc.add_paragraph(contenido)
-    
-    # ========= CÁLCULOS MAGNÉTICOS Y EMF =========
-    doc.add_heading('Cálculos Magnéticos y Verificación EMF', level=1)
-    calc_traf = calcular_transformador_detallado()
-    
-    for seccion, contenido in calc_traf.items():
-        doc.add_heading(seccion, level=2)
-        
-        if isinstance(contenido, dict):
-            # Tabla para parámetros
-            table = doc.add_table(rows=1, cols=2)
-            table.style = 'Light Shading'
-            hdr_cells = table.rows[0].cells
-            hdr_cells[0].text = 'Parámetro'
-            hdr_cells[1].text = 'Valor'
-            hdr_cells[0].paragraphs[0].runs[0].bold = True
-            hdr_cells[1].paragraphs[0].runs[0].bold = True
-            
-            for k, v in contenido.items():
-                row_cells = table.add_row().cells
-                row_cells[0].text = k
-                row_cells[1].text = v
-        else:
-            for item in contenido:
-                p = doc.add_paragraph(style='List Bullet')
-                p.add_run(item)
-    
-    # ========= ESTUDIO DE CORTOCIRCUITO =========
-    doc.add_heading('Estudio de Cortocircuito (IEC 60909)', level=1)
-    estudio_cc = estudio_cortocircuito()
-    
-    doc.add_paragraph("Cálculos realizados según norma IEC 60909 para determinar corrientes de fallo:")
-    
-    table = doc.add_table(rows=1, cols=len(estudio_cc.columns))
-    table.style = 'Light Shading'
-    hdr_cells = table.rows[0].cells
-    for i, col in enumerate(estudio_cc.columns):
-        hdr_cells[i].text = col
-        hdr_cells[i].paragraphs[0].runs[0].bold = True
-    
-    for _, row in estudio_cc.iterrows():
-        row_cells = table.add_row().cells
-        for i, value in enumerate(row):
-            row_cells[i].text = str(value)
-    
-    # ========= SIMULACIÓN DE OPERACIÓN =========
-    doc.add_heading('Simulación de Operación con Contenedores BESS', level=1)
-    df_ops, resumen = simular_arbitraje_detallado()
-    
-    # Resultados clave
-    doc.add_heading('Resultados Clave de la Simulación', level=2)
-    for k, v in resumen.items():
-        p = doc.add_paragraph()
-        p.add_run(f"{k}: ").bold = True
-        p.add_run(v)
-    
-    # Gráfico de operación
-    doc.add_heading('Operación Horaria Detallada', level=2)
-    doc.add_paragraph("La simulación considera la operación individual de cada contenedor BESS:")
-    
-    # Solo mostramos las primeras 24 filas (primer día)
-    table = doc.add_table(rows=1, cols=len(df_ops.columns))
-    table.style = 'Medium Shading 1'
-    hdr_cells = table.rows[0].cells
-    for col in df_ops.columns:
-        hdr_cell = hdr_cells[list(df_ops.columns).index(col)]
-        hdr_cell.text = col
-        hdr_cell.paragraphs[0].runs[0].bold = True
-    
-    for _, row in df_ops.head(24).iterrows():
-        row_cells = table.add_row().cells
-        for i, value in enumerate(row):
-            if isinstance(value, float):
-                row_cells[i].text = f"{value:.2f}"
-            else:
-                row_cells[i].text = str(value)
-    
-    # ========= MODELO TÉRMICO BESS =========
-    doc.add_heading('Modelado Térmico de Contenedores BESS', level=1)
-    modelo_termico = modelo_termico_bess()
-    doc.add_picture(modelo_termico, width=Inches(6))
-    doc.add_paragraph("Figura 2: Comportamiento térmico durante operación diaria (contendor ENVISION EN-5MWh)").italic = True
-    
-    contenido = (
-        "El modelo térmico demuestra que:\n"
-        "- La temperatura se mantiene dentro de límites operativos (<45°C) en todo momento\n"
-        "- Los picos de temperatura durante descarga no superan los 42°C\n"
-        "- El sistema de refrigeración mantiene ΔT<3°C entre celdas\n"
-        "- No se alcanzan temperaturas críticas (>60°C) en ningún escenario\n\n"
-        "Diseño validado para operación en clima mediterráneo (hasta 40°C ambiente)"
-    )
-    doc.add_paragraph(contenido)
-    
-    # ========= ANÁLISIS ECONÓMICO =========
-    doc.add_heading('Análisis Económico Detallado', level=1)
-    
-    # Análisis de sensibilidad
-    doc.add_heading('Análisis de Sensibilidad', level=2)
-    sensibilidad = analisis_sensibilidad()
-    doc.add_picture(sensibilidad, width=Inches(6))
-    doc.add_paragraph("Figura 3: Sensibilidad del VAN a cambios en CAPEX y precios de energía").italic = True
-    
-    # Simulación Monte Carlo
-    doc.add_heading('Simulación Monte Carlo de VAN', level=2)
-    monte_carlo = simulacion_monte_carlo()
-    doc.add_picture('monte_carlo_van.png', width=Inches(6))
-    doc.add_paragraph("Figura 4: Distribución del VAN con 10,000 simulaciones").italic = True
-    
-    for k, v in monte_carlo.items():
-        p = doc.add_paragraph()
-        p.add_run(f"{k}: ").bold = True
-        p.add_run(v)
-    
-    # ========= GESTIÓN DE RIESGOS =========
-    doc.add_heading('Gestión Integral de Riesgos', level=1)
-    riesgos = [
-        ("Degradación baterías", 
-         "Reducción capacidad >2%/año", 
-         "Sistemas gestión térmica activa, limitar DoD al 80%, reemplazo programado, garantías extendidas"),
-        
-        ("Volatilidad precios", 
-         "Reducción spread arbitraje", 
-         "Combinar PPA a largo plazo con mercados spot, participación en servicios auxiliares, contratos a futuro"),
-        
-        ("Compatibilidad normativa", 
-         "Cambios códigos de red", 
-         "Diseño modular, actualizaciones firmware, cumplimiento IEC 62933, participación en asociaciones sectoriales"),
-        
-        ("Rendimiento PV", 
-         "Degradación paneles >0.5%/año", 
-         "Monitoreo performance ratio, limpieza programada, reemplazo estratégico, seguros de rendimiento"),
-        
-        ("Campo electromagnético", 
-         "Incumplimiento límites ICNIRP", 
-         "Distancias de seguridad, blindajes magnéticos, mediciones periódicas, diseño según IEC 62110")
-    ]
-    
-    tabla_riesgos = doc.add_table(rows=1, cols=3)
-    tabla_riesgos.style = 'Table Grid'
-    hdr_cells = tabla_riesgos.rows[0].cells
-    hdr_cells[0].text = 'Riesgo'
-    hdr_cells[1].text = 'Impacto Potencial'
-    hdr_cells[2].text = 'Mitigación'
-    for cell in hdr_cells:
-        cell.paragraphs[0].runs[0].bold = True
-    
-    for riesgo, impacto, mitigacion in riesgos:
-        row_cells = tabla_riesgos.add_row().cells
-        row_cells[0].text = riesgo
-        row_cells[1].text = impacto
-        row_cells[2].text = mitigacion
-    
-    # ========= ASPECTOS NORMATIVOS =========
-    doc.add_heading('Cumplimiento Normativo', level=1)
-    certificaciones = lista_certificaciones()
-    
-    table = doc.add_table(rows=1, cols=len(certificaciones.columns))
-    table.style = 'Light Shading'
-    hdr_cells = table.rows[0].cells
-    for i, col in enumerate(certificaciones.columns):
-        hdr_cells[i].text = col
-        hdr_cells[i].paragraphs[0].runs[0].bold = True
-    
-    for _, row in certificaciones.iterrows():
-        row_cells = table.add_row().cells
-        for i, value in enumerate(row):
-            row_cells[i].text = str(value)
-    
-    # ========= PLAN DE IMPLEMENTACIÓN =========
-    doc.add_heading('Plan de Implementación', level=1)
-    cronograma = cronograma_implementacion()
-    doc.add_picture(cronograma, width=Inches(10))
-    doc.add_paragraph("Figura 5: Cronograma detallado del proyecto").italic = True
-    
-    # ========= CONCLUSIONES =========
-    doc.add_heading('Conclusiones y Recomendaciones', level=1)
-    conclusiones = [
-        "La solución propuesta con contenedores BESS de 20' e integración AMIKIT en media tensión es técnica y económicamente viable",
-        "El diseño cumple con todas las normativas aplicables, incluyendo límites de campo electromagnético (<90 μT) y requisitos de medición MID",
-        "El sistema de medida avanzado clase 0.2S garantiza precisión para facturación y control",
-        "La reducción del 82% en curtailment maximiza el aprovechamiento del recurso solar disponible",
-        "El VAN positivo de €3.2 millones y ROI de 4.8 años demuestran rentabilidad sólida con CAPEX optimizado",
-        "La solución en contenedores permite implementación rápida con mínima obra civil",
-        "Se recomienda iniciar estudio de detalle considerando datos reales de la planta"
-    ]
-    
-    for conclusion in conclusiones:
-        p = doc.add_paragraph(style='List Bullet')
-        p.add_run(conclusion)
-    
-    doc.add_heading('Próximos Pasos', level=2)
-    pasos = [
-        "1. Validación con datos horarios reales de generación PV",
-        "2. Estudio de detalle para cumplimiento código REE C60",
-        "3. Ingeniería de detalle y especificaciones técnicas",
-        "4. Plan de implementación en fases con hitos clave",
-        "5. Solicitud de permisos y acuerdo de conexión"
-    ]
-    
-    for paso in pasos:
-        doc.add_paragraph(paso)
-    
-    # ========= GUARDAR DOCUMENTO =========
-    doc.save('Informe_Tecnico_Completo_Actualizado.docx')
-    print("Informe generado: 'Informe_Tecnico_Completo_Actualizado.docx'")
-
-# --- EJECUCIÓN PRINCIPAL ---
-if __name__ == "__main__":
-    print("Generando informe técnico completo...")
-    generar_informe_completo()
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import pandas as pd
+from docx import Document
+from docx.shared import Inches, Pt, RGBColor
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.section import WD_ORIENT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from xml.sax.saxutils import escape
+from io import BytesIO
+import math
+from datetime import date, datetime
+import configuracion
+import diagram
+import flujo_caja
+import modelos
+import precision
+import puntos_control
+from cache_informe import clave_seccion, leer_seccion, guardar_seccion
+from instrumentacion import etapa
+from diagram import CLAVES_DIAGRAMA, crear_diagrama_profesional
+from modelos import (definir_planta, calcular_transformador_detallado,
+                     simular_arbitraje, resumen_arbitraje, calcular_matriz_sensibilidad,
+                     estudio_cortocircuito, simular_termico,
+                     calcular_monte_carlo)
+
+# Constantes técnicas actualizadas según requerimientos
+BESS_CONTAINER_SPECS = {
+    "Proveedor": ["ENVISION", "SUNGROW", "CATL"],
+    "Modelo": ["EN-5MWh", "PowerTitan", "EnerOne"],
+    "Capacidad": ["5 MWh"] * 3,
+    "Tamaño Contenedor": ["20 pies"] * 3,
+    "Tecnología": ["LiFePO4"] * 3,
+    "Voltaje DC": ["1500V"] * 3,
+    "Densidad Energía": ["280 Wh/L", "305 Wh/L", "295 Wh/L"],
+    "Ciclos": ["7000@80%DoD"] * 3,
+    "Garantía": ["10 años"] * 3
+}
+
+# Especificaciones AMIKIT mejoradas con sistema de medida avanzado y GIS
+AMIKIT_SPECS = {
+    "Componente": [
+        "Sistema AMIKIT", 
+        "Transformador Hibrido", 
+        "PCS Integrado", 
+        "Protecciones Digitales",
+        "Sistema de Medida",
+        "Celdas MT GIS",
+        "Transformadores de Instrumentación"
+    ],
+    "Modelo": [
+        "AMK-30MV", 
+        "ABB AMDT 5MVA", 
+        "SMA SC 2500", 
+        "SIPROTEC 5 Multifunción",
+        "ZERA ZMQ 304 + LANMU Meter",
+        "Schneider GM Seco RM6",
+        "ABB TOS 30kV"
+    ],
+    "Especificación": [
+        "Integración MT/BT con gestión activa de flujos y comunicaciones IEC 61850",
+        "30kV/690V, Dyn11, Z=6%, pérdidas < 5kW, refrigeración ONAN",
+        "2.5 MW bidireccional, eficiencia 98.7%, THD < 3%, función grid-forming",
+        "87T/50/51/67/27/59 con IEC 61850, tiempo actuación < 35ms, registrador de eventos",
+        "Clase 0.2S (IEC 62053-22), MID 2014/32/EU, medición bidireccional",
+        "30kV, 630A, Icw=25kA/1s, SF6-free, diseño compacto",
+        "30kV, relación 30000/100V, clase 0.2, 30VA, precisión ±0.2%"
+    ],
+    "Normativa": [
+        "IEC 61850-7-420, IEEE 1547-2018, UNE-EN 50549-1",
+        "IEC 60076-16, EN 50588-1, IEC 60076-7",
+        "IEC 62109-1/2, VDE-AR-N 4110, IEEE 1547a",
+        "IEC 60255, EN 50550, IEC 61660-1",
+        "IEC 62052-11, IEC 62053-22, MID 2014/32/EU, REE PE 13.3",
+        "IEC 62271-200, IEC 60420, IEC 62271-1",
+        "IEC 61869-1/3, IEC 60044-2, OIML R46"
+    ]
+}
+
+# Parámetros para cálculo de campos magnéticos según ICNIRP 2010
+EMF_PARAMS = {
+    "Frecuencia": "50 Hz",
+    "Límite exposición laboral": "100 μT",
+    "Límite exposición pública": "200 μT",
+    "Normativa de referencia": "ICNIRP 2010, Real Decreto 299/2016",
+    "Método de cálculo": "Modelo de dipolos magnéticos según IEC 62110",
+    "Factor de seguridad": "1.5"
+}
+
+def figura_a_buffer(fig, dpi=300, formato='png', **kwargs):
+    """Renderiza una figura de matplotlib en un buffer en memoria y la cierra"""
+    with etapa("figura", formato=formato, dpi=dpi) as registro:
+        buffer = BytesIO()
+        fig.savefig(buffer, dpi=dpi, format=formato, **kwargs)
+        plt.close(fig)
+        buffer.seek(0)
+        registro["bytes"] = buffer.getbuffer().nbytes
+    return buffer
+
+def escribir_tabla_docx(doc, datos, columnas=None, estilo='Light Shading', formatos=None, alineaciones=None):
+    """Escribe una tabla completa en el documento construyendo su XML en bloque"""
+    if not isinstance(datos, pd.DataFrame):
+        datos = pd.DataFrame(datos if isinstance(datos, np.ndarray) else list(datos), columns=columnas)
+    columnas = list(datos.columns) if columnas is None else list(columnas)
+    formatos = formatos or {}
+    alineaciones = alineaciones or {}
+    
+    tabla = doc.add_table(rows=0, cols=len(columnas))
+    tabla.style = estilo
+    tbl = tabla._tbl
+    # Anchos de columna en twips (dxa) a partir de la rejilla creada por python-docx
+    anchos = [int(col.w / 635) for col in tbl.tblGrid.gridCol_lst]
+    
+    def celda(texto, ancho, alineacion=None, negrita=False):
+        ppr = f'<w:pPr><w:jc w:val="{alineacion}"/></w:pPr>' if alineacion else ''
+        rpr = '<w:rPr><w:b/></w:rPr>' if negrita else ''
+        return (f'<w:tc><w:tcPr><w:tcW w:w="{ancho}" w:type="dxa"/></w:tcPr>'
+                f'<w:p>{ppr}<w:r>{rpr}<w:t xml:space="preserve">{texto}</w:t></w:r></w:p></w:tc>')
+    
+    with etapa("docx:tabla", elementos=len(datos)):
+        # Formateo por columna (vectorizado sobre cada serie)
+        textos_columnas = []
+        for j, col in enumerate(columnas):
+            serie = datos.iloc[:, j]
+            formato = formatos.get(col)
+            if formato is None and pd.api.types.is_float_dtype(serie):
+                formato = '{:.2f}'
+            if formato is None:
+                textos = serie.astype(str).tolist()
+            elif callable(formato):
+                textos = [formato(v) for v in serie]
+            else:
+                textos = [formato.format(v) for v in serie]
+            alineacion = alineaciones.get(col)
+            textos_columnas.append([celda(escape(t), anchos[j], alineacion) for t in textos])
+    
+        encabezado = ''.join(celda(escape(str(col)), anchos[j], alineaciones.get(col), negrita=True)
+                             for j, col in enumerate(columnas))
+        filas = [f'<w:tr>{encabezado}</w:tr>']
+        filas.extend(f'<w:tr>{"".join(celdas)}</w:tr>' for celdas in zip(*textos_columnas))
+    
+        # Un único parseo XML para todas las filas
+        fragmento = parse_xml(f'<w:tbl {nsdecls("w")}>{"".join(filas)}</w:tbl>')
+        tbl.extend(list(fragmento))
+    return tabla
+
+def analisis_sensibilidad(planta=None, dpi=300, formato='png'):
+    """Genera matriz de sensibilidad para parámetros clave"""
+    fig, ax = plt.subplots(figsize=(12, 8))
+    
+    precios_energia, capex_bess, van_matrix = calcular_matriz_sensibilidad(planta)
+    
+    # Heatmap profesional
+    im = ax.imshow(van_matrix, cmap="RdYlGn")
+    cbar = ax.figure.colorbar(im, ax=ax)
+    cbar.set_label('VAN (M€)', rotation=270, labelpad=20)
+    
+    # Etiquetas
+    ax.set_xticks(np.arange(len(capex_bess)))
+    ax.set_yticks(np.arange(len(precios_energia)))
+    ax.set_xticklabels([f"{c:.0f}€/kWh" for c in capex_bess])
+    ax.set_yticklabels([f"{p:.0f}€/MWh" for p in precios_energia])
+    ax.set_xlabel("CAPEX BESS (€/kWh)")
+    ax.set_ylabel("Precio Medio Energía (€/MWh)")
+    ax.set_title("Análisis de Sensibilidad: VAN vs CAPEX y Precios Energía")
+    
+    # Texto en celdas
+    for i in range(len(precios_energia)):
+        for j in range(len(capex_bess)):
+            ax.text(j, i, f"{van_matrix[i, j]:.1f}", ha="center", va="center", color="black", fontsize=9)
+    
+    plt.tight_layout()
+    return figura_a_buffer(fig, dpi=dpi, formato=formato)
+
+def modelo_termico_bess(planta=None, dpi=300, formato='png'):
+    """Simula comportamiento térmico de contenedores BESS"""
+    tiempo, temperatura, potencia, kpis = simular_termico(planta)
+    T_max_oper = kpis["limite_operativo"]  # °C
+    
+    # Gráfico profesional
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+    
+    color = 'tab:red'
+    ax1.set_xlabel('Tiempo (h)', fontsize=12)
+    ax1.set_ylabel('Temperatura (°C)', color=color, fontsize=12)
+    ax1.plot(tiempo, temperatura, color=color, linewidth=2)
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.axhline(y=T_max_oper, color='r', linestyle='--', linewidth=2, label='Límite operativo')
+    ax1.axhline(y=60, color='darkred', linestyle='-.', linewidth=2, label='Límite seguridad')
+    ax1.set_ylim(20, 65)
+    ax1.legend(loc='upper left')
+    ax1.grid(True, linestyle='--', alpha=0.7)
+    
+    ax2 = ax1.twinx()
+    color = 'tab:blue'
+    ax2.set_ylabel('Potencia (kW)', color=color, fontsize=12)
+    ax2.plot(tiempo, potencia, color=color, linewidth=2)
+    ax2.tick_params(axis='y', labelcolor=color)
+    ax2.set_ylim(-6000, 6000)
+    
+    plt.title('Comportamiento Térmico del BESS (Contenedor ENVISION EN-5MWh)', fontsize=14)
+    plt.grid(True)
+    plt.tight_layout()
+    return figura_a_buffer(fig, dpi=dpi, formato=formato)
+
+def cronograma_implementacion(dpi=300, formato='png'):
+    """Genera diagrama de Gantt para el proyecto actualizado"""
+    # Crear fechas
+    fechas = {
+        "Estudio Detalle": (datetime(2024, 7, 1), datetime(2024, 9, 30)),
+        "Ingeniería Básica": (datetime(2024, 8, 1), datetime(2024, 11, 30)),
+        "Procura Equipos": (datetime(2024, 10, 1), datetime(2025, 4, 30)),
+        "Preparación Terreno": (datetime(2025, 2, 1), datetime(2025, 5, 31)),
+        "Instalación BESS": (datetime(2025, 4, 1), datetime(2025, 8, 31)),
+        "Integración AMIKIT": (datetime(2025, 6, 1), datetime(2025, 9, 30)),
+        "Conexión y Pruebas": (datetime(2025, 8, 1), datetime(2025, 11, 30)),
+        "Puesta en Marcha": (datetime(2025, 10, 1), datetime(2026, 1, 31))
+    }
+    
+    # Crear gráfico de Gantt profesional
+    fig, ax = plt.subplots(figsize=(14, 6))
+    colors = plt.cm.tab10(np.linspace(0, 1, len(fechas)))
+    
+    for i, (tarea, (inicio, fin)) in enumerate(fechas.items()):
+        duracion = (fin - inicio).days
+        ax.barh(tarea, duracion, left=inicio, height=0.6, color=colors[i], edgecolor='black')
+    
+    ax.set_xlabel("Timeline", fontsize=12)
+    ax.set_title("Cronograma de Implementación del Proyecto", fontsize=14)
+    ax.xaxis.set_major_locator(mdates.MonthLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
+    fig.autofmt_xdate()
+    plt.grid(axis='x', linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    return figura_a_buffer(fig, dpi=dpi, formato=formato)
+
+def operacion_arbitraje(planta=None):
+    """Simulación de arbitraje del informe: (tabla de operaciones, resumen formateado, KPI numéricos)"""
+    operaciones, kpis = simular_arbitraje(planta)
+    return pd.DataFrame(operaciones), resumen_arbitraje(kpis), kpis
+
+def simulacion_monte_carlo(planta=None, n_sim=10000, dpi=300, formato='png', punto_control=None):
+    """Realiza simulación Monte Carlo para VAN del proyecto actualizado
+
+    Devuelve (resumen formateado, figura, KPI numéricos).
+    """
+    with etapa("monte_carlo:calculo", elementos=n_sim):
+        van_results, kpis = calcular_monte_carlo(n_sim, planta, punto_control=punto_control)
+    van_mean = kpis["van_medio"]
+    
+    # Histograma profesional
+    fig = plt.figure(figsize=(10, 6))
+    n, bins, patches = plt.hist(van_results, bins=50, color='#1f77b4', edgecolor='#003366', alpha=0.7)
+    
+    # Colorear áreas positivas/negativas
+    for i in range(len(bins)-1):
+        if bins[i] < 0:
+            patches[i].set_facecolor('#ff7f0e')
+    
+    plt.axvline(van_mean, color='r', linestyle='dashed', linewidth=2, label=f'Media: €{van_mean/1e6:.2f}M')
+    plt.title('Distribución del Valor Actual Neto (VAN) - Simulación Monte Carlo', fontsize=14)
+    plt.xlabel('VAN (€)', fontsize=12)
+    plt.ylabel('Frecuencia', fontsize=12)
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    figura = figura_a_buffer(fig, dpi=dpi, formato=formato)
+    
+    resultados = {
+        "VAN Promedio (€)": f"{van_mean:,.0f}",
+        "Desviación Estándar (€)": f"{kpis['van_desviacion']:,.0f}",
+        "Probabilidad VAN > 0 (%)": f"{kpis['prob_van_positivo_pct']:.1f}%",
+        "Intervalo 95% Confianza (€)": f"[{kpis['van_p2_5']:,.0f}, {kpis['van_p97_5']:,.0f}]",
+        "Simulaciones": f"{n_sim}"
+    }
+    return resultados, figura, kpis
+
+def generar_tabla_especificaciones():
+    """Crea tabla profesional de especificaciones técnicas actualizada"""
+    especificaciones = [
+        ("Módulos FV", "JinkoTiger Neo 78TR", "625W", "22.6%", "25 años", "IEC 61215/61730"),
+        ("Inversores", "Sungrow SG3500HV", "3.5MW", "98.8%", "IP66", "IEC 62109-2"),
+        ("Baterías", "CATL EnerC 306Ah", "3.2V, 306Ah", "6000@80%DoD", "CTP 3.0", "IEC 62619"),
+        ("Contenedores BESS", "ENVISION EN-5MWh", "5MWh/20'", "280Wh/L", "Aire forzado", "IEC 62933"),
+        ("Sistema AMIKIT", "AMK-30MV", "30kV/690V", "IEC 61850", "Clase 0.2S MID", "IEC 61850-7-420"),
+        ("SCADA", "Siemens Spectrum Power", "N/A", "IEC 62443-3-3", "Redundante", "IEC 62443")
+    ]
+    
+    return pd.DataFrame(especificaciones, 
+                        columns=["Componente", "Modelo", "Parámetro Clave", "Eficiencia/Vida", "Característica", "Normativa"])
+
+def lista_certificaciones():
+    """Lista de certificaciones requeridas y obtenidas actualizada"""
+    normas = [
+        ("IEC 62933-5-2", "Seguridad sistemas almacenamiento", "Requisito", "Certificado"),
+        ("IEC 61850-7-420", "Comunicaciones sistemas DER", "Requisito", "Certificado"),
+        ("UNE-EN 50549-1", "Conexión a red", "Requisito", "Certificado"),
+        ("IEC 62477-1", "Seguridad convertidores", "Requisito", "Certificado"),
+        ("IEC 62109-1", "Seguridad inversores", "Requisito", "Certificado"),
+        ("CEI 0-21", "Conexión a red BT", "Requisito España", "Certificado"),
+        ("MID 2014/32/EU", "Medición para facturación", "Requisito", "En proceso"),
+        ("ISO 50001", "Gestión energética", "Recomendada", "Planificado")
+    ]
+    
+    return pd.DataFrame(normas, columns=["Norma", "Ámbito", "Prioridad", "Estado"])
+
+# Motor de flujos de caja con el que las secciones calculan VAN, TIR y LCOS
+def _cifras_informe(planta, kpis, kpis_monte_carlo):
+    """Cifras de la planta y de los resultados calculados que se citan en el texto del informe"""
+    bess, economia = planta.bess, planta.economia
+    payback = kpis["payback_anos"]
+    return {
+        "pv": f"{planta.potencia_pv / 1000:g} MW",
+        "bess": f"{bess.potencia / 1000:g}MW/{bess.capacidad_total / 1000:g}MWh",
+        "contenedores": f"{bess.n_contenedores} contenedores de {bess.capacidad_contenedor / 1000:g} MWh",
+        "curtailment": f"{kpis['reduccion_curtailment_pct']:.0f}%",
+        "perdida": f"{kpis['energia_perdida_kwh_dia'] * 365 / 1e6:.2f} GWh/año",
+        "ingresos": f"{kpis['ingresos_anuales']:,.0f} €",
+        "van": f"{kpis['van'] / 1e6:.2f} M€",
+        "retorno": "sin recuperación de la inversión" if math.isnan(payback) else f"retorno en {payback:.1f} años",
+        "capex": f"{economia.capex / bess.capacidad_total:.0f}k€/MWh (total {economia.capex / 1e6:.2f} M€)",
+        "prob_van": f"{kpis_monte_carlo['prob_van_positivo_pct']:.0f}%",
+        "viable": kpis["van"] > 0
+    }
+
+def resumen_ejecutivo(planta, kpis, kpis_monte_carlo):
+    """Texto del resumen ejecutivo con la configuración y los resultados de la planta"""
+    c = _cifras_informe(planta, kpis, kpis_monte_carlo)
+    return (
+        f"Este informe presenta un análisis técnico-económico completo para la hibridación de una planta fotovoltaica "
+        f"existente de {c['pv']} mediante la incorporación de un sistema de almacenamiento BESS de {c['bess']} en "
+        f"{c['contenedores']} (ENVISION EN-5MWh). La solución propuesta integra tecnología AMIKIT para la conexión en "
+        f"media tensión, con un sistema de medición de precisión clase 0.2S certificado MID y cumplimiento de normativa "
+        f"de campos electromagnéticos (<100 μT según ICNIRP 2010). La simulación de arbitraje energético obtiene unos "
+        f"ingresos de {c['ingresos']} anuales, una reducción del curtailment del {c['curtailment']} y un VAN de "
+        f"{c['van']} ({c['retorno']}; probabilidad de VAN positivo {c['prob_van']} en la simulación Monte Carlo)."
+    )
+
+def beneficios_clave(planta, kpis, kpis_monte_carlo):
+    """Beneficios clave de la solución con las cifras calculadas"""
+    c = _cifras_informe(planta, kpis, kpis_monte_carlo)
+    return [
+        "Integración profesional en media tensión con sistema AMIKIT (células GIS, protecciones digitales)",
+        "Sistema de medida avanzado clase 0.2S con certificación MID para facturación precisa",
+        f"Reducción del {c['curtailment']} en curtailment (pérdida residual de {c['perdida']})",
+        f"Ingresos por arbitraje energético: {c['ingresos']} anuales",
+        "Cumplimiento estricto de normativa EMF (ICNIRP 2010) con campo magnético < 90μT",
+        f"CAPEX de {c['capex']}",
+        f"VAN de {c['van']} ({c['retorno']})"
+    ]
+
+def conclusiones_informe(planta, kpis, kpis_monte_carlo):
+    """Conclusiones del informe; la valoración económica depende del VAN calculado"""
+    c = _cifras_informe(planta, kpis, kpis_monte_carlo)
+    if c["viable"]:
+        viabilidad = ("La solución propuesta con contenedores BESS de 20' e integración AMIKIT en media tensión es "
+                      "técnica y económicamente viable")
+        economica = f"El VAN de {c['van']} ({c['retorno']}) demuestra la rentabilidad del proyecto"
+    else:
+        viabilidad = ("La solución propuesta con contenedores BESS de 20' e integración AMIKIT en media tensión es "
+                      "técnicamente viable, pero no rentable con los supuestos actuales")
+        economica = (f"El VAN de {c['van']} ({c['retorno']}) obliga a revisar CAPEX, estrategia de despacho o "
+                     f"ingresos adicionales (servicios de ajuste) antes de invertir")
+    return [
+        viabilidad,
+        "El diseño cumple con todas las normativas aplicables, incluyendo límites de campo electromagnético (<90 μT) y requisitos de medición MID",
+        "El sistema de medida avanzado clase 0.2S garantiza precisión para facturación y control",
+        f"La reducción del {c['curtailment']} en curtailment mejora el aprovechamiento del recurso solar disponible",
+        economica,
+        "La solución en contenedores permite implementación rápida con mínima obra civil",
+        "Se recomienda iniciar estudio de detalle considerando datos reales de la planta"
+    ]
+
+# Módulos de cálculo de los que dependen las secciones. La clave de caché incluye su código
+# completo: cualquier cambio en ellos invalida las secciones sin mantener listas de funciones.
+_MODULOS_CALCULO = [modelos, flujo_caja, configuracion, precision, puntos_control]
+
+# Secciones calculadas del informe: (función, código del que depende, grupos de la planta de los que depende)
+SECCIONES_INFORME = {
+    "diagrama": (crear_diagrama_profesional, [diagram] + _MODULOS_CALCULO, list(CLAVES_DIAGRAMA)),
+    "transformador": (calcular_transformador_detallado, _MODULOS_CALCULO, ["transformador", "bess"]),
+    "cortocircuito": (estudio_cortocircuito, _MODULOS_CALCULO, ["red", "transformador", "bess"]),
+    "arbitraje": (operacion_arbitraje, _MODULOS_CALCULO, ["red", "bess", "economia", "escenario"]),
+    "termico": (modelo_termico_bess, [figura_a_buffer] + _MODULOS_CALCULO, ["termico", "bess"]),
+    "sensibilidad": (analisis_sensibilidad, [figura_a_buffer] + _MODULOS_CALCULO, ["bess", "economia"]),
+    "monte_carlo": (simulacion_monte_carlo, [figura_a_buffer] + _MODULOS_CALCULO,
+                    ["red", "bess", "economia", "escenario"]),
+    "cronograma": (cronograma_implementacion, [figura_a_buffer], [])
+}
+
+def _contar_elementos(valor):
+    """Número de filas o entradas del resultado de una sección (para la instrumentación)"""
+    if isinstance(valor, tuple):
+        valor = valor[0]
+    return len(valor) if hasattr(valor, "__len__") else 1
+
+def calcular_seccion(nombre, planta, directorio_cache=None):
+    """Calcula una sección del informe, reutilizando la caché si sus dependencias no han cambiado"""
+    funcion, auxiliares, claves = SECCIONES_INFORME[nombre]
+    # La sección recibe la planta completa pero su clave solo depende de los grupos que usa
+    argumentos = (planta,) if claves else ()
+    with etapa(f"seccion:{nombre}") as registro:
+        if directorio_cache is None:
+            valor = funcion(*argumentos)
+            registro["elementos"] = _contar_elementos(valor)
+            return valor
+        
+        # La precisión activa cambia los resultados de los núcleos vectoriales (precision.py)
+        parametros = {**{k: getattr(planta, k) for k in claves}, "precision": precision.actual()}
+        if nombre == "diagrama":
+            parametros["fecha"] = date.today().isoformat()   # Fecha de emisión del cajetín
+        clave = clave_seccion(nombre, [funcion] + auxiliares, parametros)
+        encontrada, valor = leer_seccion(directorio_cache, nombre, clave)
+        # El estado de la caché queda en el perfil por etapas (instrumentacion), no en la salida
+        registro["cache"] = "reutilizada" if encontrada else "recalculada"
+        if encontrada:
+            return valor
+        valor = funcion(*argumentos)
+        registro["elementos"] = _contar_elementos(valor)
+        guardar_seccion(directorio_cache, nombre, clave, valor)
+        return valor
+
+def generar_informe_completo(planta=None, ruta_salida='Informe_Tecnico_Completo_Actualizado.docx', activos=None,
+                             directorio_cache=None, calculos=None):
+    """Genera un informe profesional en Word con todos los componentes actualizados
+
+    Si se pasa un diccionario en calculos se rellena con los resultados numéricos del informe
+    (operaciones y KPI del arbitraje, KPI del Monte Carlo), p. ej. para registrarlos sin recalcular.
+    """
+    planta = definir_planta(planta)
+    with etapa("informe", planta=planta.nombre):
+        return _componer_informe(planta, ruta_salida, activos, directorio_cache, calculos)
+
+def _componer_informe(planta, ruta_salida, activos, directorio_cache, calculos=None):
+    """Compone y guarda el documento Word del informe"""
+    activos = activos or {}
+    # La plantilla y las figuras estáticas pueden venir precargadas (generación en lote)
+    doc = Document(BytesIO(activos["plantilla"])) if "plantilla" in activos else Document()
+    
+    # Configuración inicial
+    section = doc.sections[0]
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width = Inches(11)
+    section.page_height = Inches(8.5)
+    
+    # ========= PORTADA =========
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("INFORME TÉCNICO: HIBRIDACIÓN PV + BESS CON INTEGRACIÓN AMIKIT")
+    run.font.size = Pt(24)
+    run.font.color.rgb = RGBColor(0, 51, 102)
+    run.bold = True
+    
+    doc.add_paragraph().add_run().add_break()
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run(f"{planta.nombre}: Planta Fotovoltaica {planta.potencia_pv/1000:g}MW + "
+                    f"BESS {planta.bess.potencia/1000:g}MW/{planta.bess.capacidad_total/1000:g}MWh en contenedores de 20'")
+    run.font.size = Pt(18)
+    run.font.color.rgb = RGBColor(0, 102, 204)
+    
+    doc.add_paragraph().add_run().add_break()
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("Solución técnica con integración AMIKIT en media tensión, medición de precisión y cumplimiento EMF")
+    run.font.size = Pt(14)
+    
+    doc.add_paragraph().add_run().add_break()
+    doc.add_paragraph().add_run().add_break()
+    
+    # Resultados que cita el resumen ejecutivo (las secciones se escriben más adelante)
+    df_ops, resumen, kpis_arbitraje = calcular_seccion("arbitraje", planta, directorio_cache)
+    monte_carlo, figura_monte_carlo, kpis_monte_carlo = calcular_seccion("monte_carlo", planta, directorio_cache)
+    if calculos is not None:
+        calculos.update({"operaciones": df_ops.to_dict("records"), "kpis_arbitraje": kpis_arbitraje,
+                         "kpis_monte_carlo": kpis_monte_carlo})
+    
+    # ========= RESUMEN EJECUTIVO =========
+    doc.add_heading('Resumen Ejecutivo', level=1)
+    doc.add_paragraph(resumen_ejecutivo(planta, kpis_arbitraje, kpis_monte_carlo))
+    
+    doc.add_heading('Beneficios Clave', level=2)
+    for beneficio in beneficios_clave(planta, kpis_arbitraje, kpis_monte_carlo):
+        p = doc.add_paragraph(style='List Bullet')
+        p.add_run(beneficio)
+    
+    # ========= DIAGRAMA UNIFILAR =========
+    doc.add_heading('Diagrama Unifilar Profesional', level=1)
+    diagrama = calcular_seccion("diagrama", planta, directorio_cache)
+    doc.add_picture(diagrama, width=Inches(10))
+    last_paragraph = doc.paragraphs[-1] 
+    last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph("Figura 1: Diagrama unifilar detallado con integración AMIKIT en media tensión").italic = True
+    doc.add_paragraph("Nota: Sistema cumple IEC 61850, IEC 62110, UNE-EN 50549 y MID para medición").italic = True
+    
+    # ========= ESPECIFICACIONES TÉCNICAS =========
+    doc.add_heading('Especificaciones Técnicas Detalladas', level=1)
+    especificaciones = generar_tabla_especificaciones()
+    
+    escribir_tabla_docx(doc, especificaciones)
+    
+    # ======== DETALLE SISTEMA AMIKIT Y MEDICIÓN ========
+    doc.add_heading('Sistema AMIKIT para Integración en Media Tensión', level=2)
+    doc.add_paragraph("El sistema AMIKIT es una solución integrada para la conexión de plantas de generación y almacenamiento a redes de media tensión, basada en estándares internacionales y diseñada para cumplir con los requisitos de los códigos de red más exigentes.")
+    
+    doc.add_heading('Arquitectura del Sistema', level=3)
+    arquitectura = [
+        "Celdas GIS Schneider GM Seco RM6: Diseño SF6-free, capacidad 630A continuos, 25kA/1s de cortocircuito",
+        "Transformador Híbrido ABB AMDT 5MVA: Optimizado para operación con generación renovable, baja impedancia (6%) y alta eficiencia (>98%)",
+        "Convertidor de Potencia SMA SC 2500: Tecnología bidireccional con función grid-forming para soporte de red y capacidad black start",
+        "Sistema de Protecciones SIPROTEC 5: Relés multifunción con comunicación IEC 61850, registrador de eventos y calidad de energía",
+        "Medidor de Energía ZERA ZMQ 304: Clase 0.2S, certificación MID, medición bidireccional activa-reactiva"
+    ]
+    for item in arquitectura:
+        doc.add_paragraph(item, style='List Bullet')
+    
+    doc.add_heading('Punto de Medida para Facturación y Control', level=3)
+    medicion = [
+        "Equipo: Medidor trifásico ZERA ZMQ 304, clase 0.2S según IEC 62053-22",
+        "Certificación: MID 2014/32/EU para facturación, cumplimiento REE PE 13.3",
+        "Precisión: ±0.2% en rango 5-120% de In, ±0.5% para energía reactiva",
+        "Funciones: Medición activa, reactiva, aparente, energía en cuatro cuadrantes, armónicos hasta 40º orden",
+        "Comunicaciones: Modbus TCP, IEC 61850-8-1 (MMS), interfaz óptica para verificación in situ",
+        "Transformadores: ABB TOS 30kV (tensión) y ABB TCS (corriente) clase 0.2",
+        "Integración: Con SCADA central mediante protocolo IEC 61850 para monitorización en tiempo real"
+    ]
+    for item in medicion:
+        doc.add_paragraph(item, style='List Bullet')
+    
+    doc.add_paragraph("La configuración de medida incluye transformadores de precisión ubicados estratégicamente para garantizar la exactitud requerida por el operador de red, con calibración trazable a patrones nacionales.")
+    
+    # ========= FUNDAMENTOS TÉCNICOS =========
+    doc.add_heading('Fundamentos Técnicos del Diseño', level=1)
+    
+    # Explicación integración AMIKIT
+    doc.add_heading('Integración en Media Tensión con AMIKIT', level=2)
+    contenido = (
+        "El sistema AMIKIT proporciona una solución completa para la conexión en media tensión, con los siguientes componentes clave:\n\n"
+        "1. **Celdas GIS (Schneider GM Seco RM6):**\n"
+        "   - Diseño encapsulado SF6-free para 30kV con tecnología de vacío\n"
+        "   - Capaz de 630A continuos y 25kA/1s de corriente de cortocircuito\n"
+        "   - Interruptor-seccionador con mando motorizado y enclavamiento mecánico\n"
+        "   - Diseño compacto para reducción de huella y facilidad de mantenimiento\n\n"
+        "2. **Transformador Híbrido (ABB AMDT 5MVA):**\n"
+        "   - Relación 30kV/690V, grupo de conexión Dyn11 para minimizar armónicos\n"
+        "   - Impedancia del 6% para limitación de corrientes de cortocircuito\n"
+        "   - Diseño optimizado para operación con inversores (THD < 3% en vacío)\n"
+        "   - Refrigeración ONAN con capacidad de sobrecarga del 150% durante 30 minutos\n\n"
+        "3. **PCS Integrado (SMA SC 2500):**\n"
+        "   - Convertidor bidireccional de 2.5 MW con eficiencia del 98.7%\n"
+        "   - Funciones grid-forming para soporte de red (frecuencia, tensión, inercia sintética)\n"
+        "   - Respuesta en frecuencia (FRT) según requisitos REE C60\n"
+        "   - Operación en isla con capacidad black start\n\n"
+        "4. **Sistema de Protecciones (SIPROTEC 5):**\n"
+        "   - Protecciones diferenciales (87T), sobrecorriente (50/51)\n"
+        "   - Protecciones direccionales (67), sub/sovretensión (27/59)\n"
+        "   - Protección de frecuencia (81), disparo por vector de impedancia (21)\n"
+        "   - Comunicación IEC 61850 para coordinación centralizada con SCADA\n\n"
+        "5. **Punto de Medida (ZERA ZMQ 304):**\n"
+        "   - Clase de precisión 0.2S según IEC 62053-22\n"
+        "   - Cumplimiento MID 2014/32/EU para facturación\n"
+        "   - Medición de energía en cuatro cuadrantes, potencia activa/reactiva\n"
+        "   - Análisis de calidad de energía (THD, flicker, desequilibrios)"
+    )
+    doc.add_paragraph(contenido)
+    
+    # ========= CÁLCULOS MAGNÉTICOS Y EMF =========
+    doc.add_heading('Cálculos Magnéticos y Verificación EMF', level=1)
+    calc_traf = calcular_seccion("transformador", planta, directorio_cache)
+    
+    for seccion, contenido in calc_traf.items():
+        doc.add_heading(seccion, level=2)
+        
+        if isinstance(contenido, dict):
+            # Tabla para parámetros
+            escribir_tabla_docx(doc, contenido.items(), columnas=['Parámetro', 'Valor'])
+        else:
+            for item in contenido:
+                p = doc.add_paragraph(style='List Bullet')
+                p.add_run(item)
+    
+    # ========= ESTUDIO DE CORTOCIRCUITO =========
+    doc.add_heading('Estudio de Cortocircuito (IEC 60909)', level=1)
+    estudio_cc = calcular_seccion("cortocircuito", planta, directorio_cache)
+    
+    doc.add_paragraph("Cálculos realizados según norma IEC 60909 para determinar corrientes de fallo:")
+    
+    escribir_tabla_docx(doc, estudio_cc)
+    
+    # ========= SIMULACIÓN DE OPERACIÓN =========
+    doc.add_heading('Simulación de Operación con Contenedores BESS', level=1)
+    
+    # Resultados clave
+    doc.add_heading('Resultados Clave de la Simulación', level=2)
+    for k, v in resumen.items():
+        p = doc.add_paragraph()
+        p.add_run(f"{k}: ").bold = True
+        p.add_run(v)
+    
+    # Gráfico de operación
+    doc.add_heading('Operación Horaria Detallada', level=2)
+    doc.add_paragraph("La simulación considera la operación individual de cada contenedor BESS:")
+    
+    # Tabla completa de operación (todas las horas y contenedores)
+    escribir_tabla_docx(doc, df_ops, estilo='Medium Shading 1')
+    
+    # ========= MODELO TÉRMICO BESS =========
+    doc.add_heading('Modelado Térmico de Contenedores BESS', level=1)
+    modelo_termico = calcular_seccion("termico", planta, directorio_cache)
+    doc.add_picture(modelo_termico, width=Inches(6))
+    doc.add_paragraph("Figura 2: Comportamiento térmico durante operación diaria (contendor ENVISION EN-5MWh)").italic = True
+    
+    contenido = (
+        "El modelo térmico demuestra que:\n"
+        "- La temperatura se mantiene dentro de límites operativos (<45°C) en todo momento\n"
+        "- Los picos de temperatura durante descarga no superan los 42°C\n"
+        "- El sistema de refrigeración mantiene ΔT<3°C entre celdas\n"
+        "- No se alcanzan temperaturas críticas (>60°C) en ningún escenario\n\n"
+        "Diseño validado para operación en clima mediterráneo (hasta 40°C ambiente)"
+    )
+    doc.add_paragraph(contenido)
+    
+    # ========= ANÁLISIS ECONÓMICO =========
+    doc.add_heading('Análisis Económico Detallado', level=1)
+    
+    # Análisis de sensibilidad
+    doc.add_heading('Análisis de Sensibilidad', level=2)
+    sensibilidad = calcular_seccion("sensibilidad", planta, directorio_cache)
+    doc.add_picture(sensibilidad, width=Inches(6))
+    doc.add_paragraph("Figura 3: Sensibilidad del VAN a cambios en CAPEX y precios de energía").italic = True
+    
+    # Simulación Monte Carlo
+    doc.add_heading('Simulación Monte Carlo de VAN', level=2)
+    doc.add_picture(figura_monte_carlo, width=Inches(6))
+    doc.add_paragraph(f"Figura 4: Distribución del VAN con {kpis_monte_carlo['simulaciones']:,} simulaciones").italic = True
+    
+    for k, v in monte_carlo.items():
+        p = doc.add_paragraph()
+        p.add_run(f"{k}: ").bold = True
+        p.add_run(v)
+    
+    # ========= GESTIÓN DE RIESGOS =========
+    doc.add_heading('Gestión Integral de Riesgos', level=1)
+    riesgos = [
+        ("Degradación baterías", 
+         "Reducción capacidad >2%/año", 
+         "Sistemas gestión térmica activa, limitar DoD al 80%, reemplazo programado, garantías extendidas"),
+        
+        ("Volatilidad precios", 
+         "Reducción spread arbitraje", 
+         "Combinar PPA a largo plazo con mercados spot, participación en servicios auxiliares, contratos a futuro"),
+        
+        ("Compatibilidad normativa", 
+         "Cambios códigos de red", 
+         "Diseño modular, actualizaciones firmware, cumplimiento IEC 62933, participación en asociaciones sectoriales"),
+        
+        ("Rendimiento PV", 
+         "Degradación paneles >0.5%/año", 
+         "Monitoreo performance ratio, limpieza programada, reemplazo estratégico, seguros de rendimiento"),
+        
+        ("Campo electromagnético", 
+         "Incumplimiento límites ICNIRP", 
+         "Distancias de seguridad, blindajes magnéticos, mediciones periódicas, diseño según IEC 62110")
+    ]
+    
+    escribir_tabla_docx(doc, riesgos, columnas=['Riesgo', 'Impacto Potencial', 'Mitigación'], estilo='Table Grid')
+    
+    # ========= ASPECTOS NORMATIVOS =========
+    doc.add_heading('Cumplimiento Normativo', level=1)
+    certificaciones = lista_certificaciones()
+    
+    escribir_tabla_docx(doc, certificaciones)
+    
+    # ========= PLAN DE IMPLEMENTACIÓN =========
+    doc.add_heading('Plan de Implementación', level=1)
+    cronograma = BytesIO(activos["cronograma"]) if "cronograma" in activos else calcular_seccion("cronograma", planta, directorio_cache)
+    doc.add_picture(cronograma, width=Inches(10))
+    doc.add_paragraph("Figura 5: Cronograma detallado del proyecto").italic = True
+    
+    # ========= CONCLUSIONES =========
+    doc.add_heading('Conclusiones y Recomendaciones', level=1)
+    for conclusion in conclusiones_informe(planta, kpis_arbitraje, kpis_monte_carlo):
+        p = doc.add_paragraph(style='List Bullet')
+        p.add_run(conclusion)
+    
+    doc.add_heading('Próximos Pasos', level=2)
+    pasos = [
+        "1. Validación con datos horarios reales de generación PV",
+        "2. Estudio de detalle para cumplimiento código REE C60",
+        "3. Ingeniería de detalle y especificaciones técnicas",
+        "4. Plan de implementación en fases con hitos clave",
+        "5. Solicitud de permisos y acuerdo de conexión"
+    ]
+    
+    for paso in pasos:
+        doc.add_paragraph(paso)
+    
+    # ========= GUARDAR DOCUMENTO =========
+    with etapa("docx:guardar"):
+        doc.save(ruta_salida)
+    print(f"Informe generado: '{ruta_salida}'")
+    return ruta_salida, resumen
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    import argparse
+    import instrumentacion
+    parser = argparse.ArgumentParser(description="Generador de informe técnico PV + BESS")
+    parser.add_argument("--sin-cache", action="store_true", help="Recalcula todas las secciones del informe")
+    parser.add_argument("--cache", default=".cache_informe", help="Directorio de caché de secciones")
+    parser.add_argument("--perfil", help="Fichero de perfil por etapas (.json o .trace.json para Chrome)")
+    args = parser.parse_args()
+    
+    if args.perfil:
+        instrumentacion.activar()
+    print("Generando informe técnico completo...")
+    generar_informe_completo(directorio_cache=None if args.sin_cache else args.cache)
+    if args.perfil:
+        print(instrumentacion.resumen_texto())
+        print(f"Perfil guardado en '{instrumentacion.exportar(args.perfil)}'")
     print("¡Proceso completado! Busca el archivo 'Informe_Tecnico_Completo_Actualizado.docx'")
\ No newline at end of file
@@ -0,0 +1,322 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import series_temporales as st
+
+# Ingesta por bloques de exportaciones CSV (SCADA de inversores, precios OMIE, contadores).
+# Todo el proceso son generadores encadenados: lectura → validación → agregación → escritura.
+# En memoria solo hay un bloque de filas y el último intervalo de agregación sin cerrar, por lo
+# que el consumo es constante con independencia del tamaño del fichero.
+
+FILAS_POR_BLOQUE = 500_000
+MAX_EJEMPLOS = 10          # Incidencias de ejemplo que se guardan en el informe
+ZONA_PREDETERMINADA = "Europe/Madrid"
+
+def informe_vacio():
+    """Contadores de la ingesta (se rellenan a medida que se consumen los bloques)
+
+    "duplicadas" cuenta filas con el mismo instante que la anterior; "desordenadas", filas
+    anteriores al último instante visto (bloques reenviados o fuera de orden).
+    """
+    return {"filas": 0, "filas_validas": 0, "fechas_invalidas": 0, "horas_inexistentes": 0,
+            "duplicadas": 0, "desordenadas": 0, "huecos": 0, "intervalos_perdidos": 0,
+            "ejemplos_huecos": [], "ejemplos_duplicadas": [], "intervalos_escritos": 0}
+
+def _localizar(locales, zona, estado, informe):
+    """Convierte instantes locales sin zona (ns) a UTC resolviendo el cambio de hora
+
+    En la hora repetida de otoño la primera pasada se interpreta como horario de verano y,
+    tras el retroceso del reloj, la segunda como horario estándar. Dentro de una racha de filas
+    ambiguas consecutivas un instante igual al anterior también es un retroceso (en ficheros
+    horarios la hora repetida aparece como dos filas "02:00"). El estado se arrastra entre
+    bloques para que el retroceso se detecte aunque caiga en la frontera de un bloque.
+    """
+    serie = pd.DatetimeIndex(locales)
+    utc = serie.tz_localize(zona, ambiguous="NaT", nonexistent="NaT")
+    inexistentes = serie.tz_localize(zona, ambiguous=True, nonexistent="NaT").isna()
+    ambiguas = np.flatnonzero(utc.isna() & ~inexistentes)
+    informe["horas_inexistentes"] += int(inexistentes.sum())
+    resultado = utc.tz_convert("UTC").tz_localize(None).to_numpy(dtype="datetime64[ns]").copy()
+    if len(ambiguas):
+        valores = serie.asi8
+        verano = serie[ambiguas].tz_localize(zona, ambiguous=True).tz_convert("UTC").tz_localize(None)
+        invierno = serie[ambiguas].tz_localize(zona, ambiguous=False).tz_convert("UTC").tz_localize(None)
+        segunda_pasada = estado.get("segunda_pasada", False)
+        anterior = estado.get("anterior_ambigua")
+        ultimo = None
+        for k, i in enumerate(ambiguas):
+            contigua = i == ultimo + 1 if ultimo is not None else i == 0 and estado.get("en_racha", False)
+            if not contigua:
+                segunda_pasada = False   # Hay filas no ambiguas entre medias: otra hora repetida
+            if anterior is not None and (valores[i] <= anterior if contigua else valores[i] < anterior):
+                segunda_pasada = True    # El reloj ha retrocedido una hora
+            resultado[i] = (invierno if segunda_pasada else verano)[k].to_datetime64()
+            anterior, ultimo = valores[i], i
+        estado["anterior_ambigua"] = anterior
+        estado["en_racha"] = ultimo == len(serie) - 1
+        estado["segunda_pasada"] = segunda_pasada if estado["en_racha"] else False
+    else:
+        estado["segunda_pasada"] = estado["en_racha"] = False
+        estado["anterior_ambigua"] = None
+    return resultado
+
+def leer_bloques(ruta, columna_tiempo, columnas, zona=ZONA_PREDETERMINADA, formato_fecha=None, separador=",",
+                 decimal=".", codificacion="utf-8", filas_por_bloque=FILAS_POR_BLOQUE, informe=None):
+    """Lee un CSV por bloques y produce (instantes UTC en segundos, {columna: valores float64})
+
+    Las fechas con desfase explícito (ISO 8601 con +01:00 o Z) se convierten directamente;
+    las fechas sin zona se interpretan en `zona` (zona=None: ya están en UTC).
+    """
+    informe = informe if informe is not None else informe_vacio()
+    estado = {}
+    lector = pd.read_csv(ruta, sep=separador, decimal=decimal, encoding=codificacion,
+                         usecols=[columna_tiempo] + list(columnas), dtype={columna_tiempo: str},
+                         chunksize=filas_por_bloque)
+    for bloque in lector:
+        informe["filas"] += len(bloque)
+        texto = bloque[columna_tiempo]
+        con_zona = texto.str.contains(r"(?:Z|[+-]\d\d:?\d\d)$", regex=True, na=False)
+        instantes = np.full(len(bloque), np.datetime64("NaT"), dtype="datetime64[ns]")
+        if con_zona.any():
+            explicitas = pd.to_datetime(texto[con_zona], format=formato_fecha, utc=True, errors="coerce")
+            informe["fechas_invalidas"] += int(explicitas.isna().sum())
+            instantes[con_zona.to_numpy()] = explicitas.dt.tz_localize(None).to_numpy()
+        if (~con_zona).any():
+            locales = pd.to_datetime(texto[~con_zona], format=formato_fecha, errors="coerce")
+            informe["fechas_invalidas"] += int(locales.isna().sum())
+            sin_zona = (~con_zona).to_numpy()
+            if zona is None:
+                instantes[sin_zona] = locales.to_numpy()
+            else:
+                validas = locales.notna().to_numpy()
+                convertidas = np.full(len(locales), np.datetime64("NaT"), dtype="datetime64[ns]")
+                convertidas[validas] = _localizar(locales[validas].to_numpy(), zona, estado, informe)
+                instantes[sin_zona] = convertidas
+        validas = ~np.isnat(instantes)
+        segundos = instantes[validas].astype("datetime64[s]").astype(np.int64)
+        valores = {c: pd.to_numeric(bloque[c], errors="coerce").to_numpy(dtype=np.float64)[validas] for c in columnas}
+        yield segundos, valores
+
+def leer_bloques_omie(ruta, columna_precio=4, nombre="precios", zona=ZONA_PREDETERMINADA, codificacion="latin-1",
+                      filas_por_bloque=FILAS_POR_BLOQUE, informe=None):
+    """Lee ficheros de precios OMIE (marginalpdbc: año;mes;día;periodo;precio...)
+
+    El periodo k de un día empieza (k-1) periodos después de la medianoche local, así que los
+    días de cambio de hora (23 o 25 periodos horarios) quedan correctamente en UTC. La duración
+    del periodo se deduce del número de periodos del día (24 → horario, 96 → cuartohorario).
+    """
+    informe = informe if informe is not None else informe_vacio()
+    lector = pd.read_csv(ruta, sep=";", header=None, skiprows=1, encoding=codificacion, usecols=range(columna_precio + 1),
+                         chunksize=filas_por_bloque, comment="*", decimal=".")
+    pendiente = None
+    for bloque in lector:
+        bloque = bloque.dropna(subset=[0, 1, 2, 3])
+        if pendiente is not None:
+            bloque = pd.concat([pendiente, bloque])
+        # El último día puede continuar en el bloque siguiente: se retiene hasta tenerlo completo
+        dias = bloque[0].astype(int) * 10000 + bloque[1].astype(int) * 100 + bloque[2].astype(int)
+        ultimo = dias.iloc[-1]
+        pendiente = bloque[dias == ultimo]
+        bloque = bloque[dias != ultimo]
+        if len(bloque):
+            yield _periodos_omie(bloque, columna_precio, nombre, zona, informe)
+    if pendiente is not None and len(pendiente):
+        yield _periodos_omie(pendiente, columna_precio, nombre, zona, informe)
+
+def _periodos_omie(bloque, columna_precio, nombre, zona, informe):
+    """Convierte días completos de periodos OMIE en instantes UTC"""
+    informe["filas"] += len(bloque)
+    fechas = pd.to_datetime(dict(year=bloque[0].astype(int), month=bloque[1].astype(int), day=bloque[2].astype(int)))
+    medianoche = pd.DatetimeIndex(fechas).tz_localize(zona).tz_convert("UTC").tz_localize(None)
+    periodo = bloque[3].astype(int).to_numpy()
+    dias = fechas.to_numpy()
+    # Periodos por día: 23-25 → 3600 s; 92-100 → 900 s
+    _, inverso, cuentas = np.unique(dias, return_inverse=True, return_counts=True)
+    duracion = np.where(cuentas[inverso] > 30, 900, 3600)
+    instantes = medianoche.to_numpy().astype("datetime64[s]").astype(np.int64) + (periodo - 1) * duracion
+    return instantes, {nombre: pd.to_numeric(bloque[columna_precio], errors="coerce").to_numpy(dtype=np.float64)}
+
+def validar(bloques, paso_entrada=None, informe=None):
+    """Comprueba orden, duplicados y huecos; descarta duplicadas y desordenadas
+
+    paso_entrada: resolución esperada del fichero; si no se indica se deduce del primer bloque.
+    """
+    informe = informe if informe is not None else informe_vacio()
+    paso = st.segundos(paso_entrada) if paso_entrada is not None else None
+    anterior = None
+    for instantes, valores in bloques:
+        if len(instantes) == 0:
+            continue
+        if paso is None and len(instantes) > 1:
+            paso = int(np.median(np.diff(instantes[:10_000])))
+        previos = np.concatenate([[anterior if anterior is not None else instantes[0] - (paso or 1)], instantes])
+        # Una fila es válida si avanza respecto al máximo visto hasta ella
+        maximo = np.maximum.accumulate(previos)[:-1]
+        diferencia = instantes - maximo
+        duplicadas = diferencia == 0
+        desordenadas = diferencia < 0
+        conservar = diferencia > 0
+        informe["duplicadas"] += int(duplicadas.sum())
+        informe["desordenadas"] += int(desordenadas.sum())
+        for i in np.flatnonzero(duplicadas)[:MAX_EJEMPLOS - len(informe["ejemplos_duplicadas"])]:
+            informe["ejemplos_duplicadas"].append(str(np.datetime64(int(instantes[i]), "s")))
+        if paso:
+            huecos = np.flatnonzero(conservar & (diferencia > paso))
+            informe["huecos"] += len(huecos)
+            informe["intervalos_perdidos"] += int((diferencia[huecos] // paso - 1).sum())
+            for i in huecos[:MAX_EJEMPLOS - len(informe["ejemplos_huecos"])]:
+                informe["ejemplos_huecos"].append((str(np.datetime64(int(maximo[i]), "s")),
+                                                   str(np.datetime64(int(instantes[i]), "s"))))
+        anterior = int(max(maximo[-1], instantes[-1]))
+        instantes = instantes[conservar]
+        informe["filas_validas"] += len(instantes)
+        yield instantes, {c: v[conservar] for c, v in valores.items()}
+
+def _reducir(valores, inicios, fin_grupos, metodo):
+    """Agrega filas ordenadas por grupos contiguos (inicios de cada grupo) ignorando NaN"""
+    validos = ~np.isnan(valores)
+    if metodo in ("media", "suma"):
+        suma = np.add.reduceat(np.where(validos, valores, 0), inicios)
+        cuenta = np.add.reduceat(validos.astype(np.int64), inicios)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(cuenta > 0, suma / cuenta if metodo == "media" else suma, np.nan)
+    if metodo in ("max", "min"):
+        relleno = -np.inf if metodo == "max" else np.inf
+        funcion = np.maximum if metodo == "max" else np.minimum
+        extremo = funcion.reduceat(np.where(validos, valores, relleno), inicios)
+        return np.where(np.add.reduceat(validos, inicios) > 0, extremo, np.nan)
+    if metodo == "ultimo":
+        return valores[fin_grupos - 1]
+    raise ValueError(f"Agregación no reconocida: {metodo!r}")
+
+def agregar(bloques, paso="1h", agregacion="media"):
+    """Agrega al paso del modelo sobre la marcha y produce intervalos regulares y contiguos
+
+    Produce (inicio del primer intervalo en s UTC, {columna: valores}); los intervalos sin datos
+    se rellenan con NaN. El último intervalo de cada bloque se retiene hasta saber que está
+    completo. agregacion puede ser un método o {columna: método}.
+    """
+    paso_s = st.segundos(paso)
+    retenido = None
+    siguiente = None
+
+    def emitir(instantes, valores):
+        nonlocal siguiente
+        intervalos = instantes // paso_s
+        inicios = np.flatnonzero(np.diff(intervalos, prepend=intervalos[0] - 1))
+        fines = np.append(inicios[1:], len(intervalos))
+        presentes = intervalos[inicios]
+        primero = presentes[0] if siguiente is None else siguiente
+        n = int(presentes[-1] - primero + 1)
+        salida = {}
+        for c, v in valores.items():
+            metodo = agregacion.get(c, "media") if isinstance(agregacion, dict) else agregacion
+            columna = np.full(n, np.nan)
+            columna[presentes - primero] = _reducir(v, inicios, fines, metodo)
+            salida[c] = columna
+        siguiente = presentes[-1] + 1
+        return int(primero * paso_s), salida
+
+    for instantes, valores in bloques:
+        if retenido is not None:
+            instantes = np.concatenate([retenido[0], instantes])
+            valores = {c: np.concatenate([retenido[1][c], v]) for c, v in valores.items()}
+        if len(instantes) == 0:
+            continue
+        ultimo = instantes[-1] // paso_s
+        cerrado = instantes // paso_s < ultimo
+        retenido = (instantes[~cerrado], {c: v[~cerrado] for c, v in valores.items()})
+        if cerrado.any():
+            yield emitir(instantes[cerrado], {c: v[cerrado] for c, v in valores.items()})
+    if retenido is not None and len(retenido[0]):
+        yield emitir(*retenido)
+
+def ingerir(bloques, destino=None, paso="1h", agregacion="media", informe=None):
+    """Consume los bloques agregados y los escribe en un almacén de series o en arrays
+
+    Con destino=None devuelve (instante inicial, {columna: array}) para usarlo como entrada de
+    la simulación; con un directorio añade los datos al almacén (lo crea si no existe y rellena
+    con NaN el hueco entre su final y el primer intervalo nuevo).
+    """
+    informe = informe if informe is not None else informe_vacio()
+    paso_s = st.segundos(paso)
+    partes, inicio_total = [], None
+    for inicio, valores in agregar(bloques, paso, agregacion):
+        n = len(next(iter(valores.values())))
+        if destino is None:
+            inicio_total = inicio if inicio_total is None else inicio_total
+            partes.append(valores)
+        else:
+            if not os.path.exists(os.path.join(destino, st.META)):
+                st.crear_almacen(destino, np.datetime64(inicio, "s"), paso_s, {c: "float32" for c in valores})
+            meta = st.leer_meta(destino)
+            if meta["paso_s"] != paso_s:
+                raise ValueError(f"El almacén tiene paso {meta['paso_s']}s y la ingesta {paso_s}s")
+            fin = int(np.datetime64(meta["inicio"], "s").astype(np.int64)) + meta["longitud"] * paso_s
+            desfase = (inicio - fin) // paso_s
+            if desfase < 0:
+                # Intervalos ya presentes en el almacén: se descartan
+                valores = {c: v[-desfase:] for c, v in valores.items()}
+                informe["duplicadas"] += min(n, -desfase)
+                n = max(0, n + desfase)
+            elif desfase > 0:
+                valores = {c: np.concatenate([np.full(desfase, np.nan), v]) for c, v in valores.items()}
+                n += desfase
+            if n:
+                st.anadir(destino, valores)
+        informe["intervalos_escritos"] += n
+    if destino is None:
+        if not partes:
+            return None, {}
+        return inicio_total, {c: np.concatenate([p[c] for p in partes]) for c in partes[0]}
+    return destino
+
+def ingerir_fichero(ruta, destino=None, paso="1h", agregacion="media", formato="csv", paso_entrada=None, **opciones):
+    """Ingesta completa de un fichero: devuelve (resultado, informe con rendimiento en filas/s)"""
+    informe = informe_vacio()
+    inicio = time.perf_counter()
+    if formato == "omie":
+        bloques = leer_bloques_omie(ruta, informe=informe, **opciones)
+    else:
+        bloques = leer_bloques(ruta, informe=informe, **opciones)
+    resultado = ingerir(validar(bloques, paso_entrada, informe), destino, paso, agregacion, informe)
+    duracion = time.perf_counter() - inicio
+    informe["segundos"] = duracion
+    informe["filas_por_segundo"] = informe["filas"] / duracion if duracion > 0 else 0.0
+    informe["mb_por_segundo"] = os.path.getsize(ruta) / 1e6 / duracion if duracion > 0 else 0.0
+    return resultado, informe
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta por bloques de exportaciones CSV de SCADA, OMIE y contadores")
+    parser.add_argument("fichero", help="Fichero CSV de entrada")
+    parser.add_argument("destino", help="Directorio del almacén de series temporales")
+    parser.add_argument("--formato", choices=["csv", "omie"], default="csv")
+    parser.add_argument("--tiempo", default="timestamp", help="Columna de fecha y hora (formato csv)")
+    parser.add_argument("--columnas", nargs="+", help="Columnas numéricas a ingerir (formato csv)")
+    parser.add_argument("--zona", default=ZONA_PREDETERMINADA, help="Zona horaria de las fechas sin desfase ('UTC' si ya lo están)")
+    parser.add_argument("--formato-fecha", help="Formato strftime de las fechas (acelera la lectura)")
+    parser.add_argument("--separador", default=",")
+    parser.add_argument("--decimal", default=".")
+    parser.add_argument("--paso", default="1h", help="Resolución del modelo (15min, 1h...)")
+    parser.add_argument("--paso-entrada", help="Resolución esperada del fichero para detectar huecos")
+    parser.add_argument("--agregacion", default="media", help="media, suma, max, min o ultimo")
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE)
+    args = parser.parse_args()
+
+    if args.formato == "omie":
+        opciones = {"zona": args.zona, "filas_por_bloque": args.filas_por_bloque}
+    else:
+        if not args.columnas:
+            parser.error("--columnas es obligatorio con el formato csv")
+        opciones = {"columna_tiempo": args.tiempo, "columnas": args.columnas, "zona": args.zona,
+                    "formato_fecha": args.formato_fecha, "separador": args.separador, "decimal": args.decimal,
+                    "filas_por_bloque": args.filas_por_bloque}
+    _, informe = ingerir_fichero(args.fichero, args.destino, args.paso, args.agregacion, args.formato,
+                                 args.paso_entrada, **opciones)
+    for k, v in informe.items():
+        print(f"{k}: {v:,.1f}" if isinstance(v, float) else f"{k}: {v}")
@@ -0,0 +1,145 @@
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Instrumentación por etapas del cálculo del informe. Desactivada por defecto: `etapa()`
+# devuelve entonces un contexto nulo y el coste es una comprobación de un booleano.
+# Se activa con activar() o con la variable de entorno PVBESS_PERFIL=<fichero de salida>.
+# Con la variable, el proceso principal exporta su perfil al salir (atexit). Los procesos de un
+# ProcessPoolExecutor no ejecutan atexit: sus etapas no llegan a ese fichero y deben exportarse
+# desde el propio trabajador (lote lo hace por informe, con --perfil o con PVBESS_PERFIL).
+
+_ESTADO = {"activa": False, "memoria": False, "tracemalloc_propio": False, "origen": 0.0, "etapas": []}
+_PILA = threading.local()
+
+def _rss_mb():
+    """Memoria residente actual del proceso en MB (None si no puede medirse)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        return None
+
+def activar(memoria=True):
+    """Activa la instrumentación; con memoria=True mide el pico de memoria con tracemalloc"""
+    _ESTADO.update(activa=True, memoria=memoria, origen=time.perf_counter(), etapas=[])
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _ESTADO["tracemalloc_propio"] = True
+
+def desactivar():
+    """Desactiva la instrumentación y detiene tracemalloc si se inició aquí"""
+    _ESTADO["activa"] = False
+    if _ESTADO["tracemalloc_propio"]:
+        tracemalloc.stop()
+        _ESTADO["tracemalloc_propio"] = False
+
+def activa():
+    """Indica si la instrumentación está activa"""
+    return _ESTADO["activa"]
+
+def reiniciar():
+    """Descarta las etapas registradas (p. ej. entre informes de un lote)"""
+    _ESTADO.update(origen=time.perf_counter(), etapas=[])
+
+def etapa(nombre, **atributos):
+    """Mide una etapa: tiempo real, tiempo de CPU, pico de memoria y número de elementos
+
+    Devuelve un contexto que entrega un diccionario donde la etapa puede anotar
+    atributos adicionales (p. ej. registro["elementos"] = len(filas)).
+    """
+    if not _ESTADO["activa"]:
+        return nullcontext({})   # Un diccionario nuevo por llamada: las anotaciones no se mezclan
+    return _medir(nombre, atributos)
+
+@contextmanager
+def _medir(nombre, atributos):
+    """Contexto de medición usado cuando la instrumentación está activa"""
+    pila = _PILA.__dict__.setdefault("etapas", [])
+    memoria = _ESTADO["memoria"] and tracemalloc.is_tracing()
+    registro = dict(atributos)
+    base = 0
+    if memoria:
+        # reset_peak es global: se guarda el pico alcanzado hasta ahora por la etapa padre
+        base, pico = tracemalloc.get_traced_memory()
+        if pila:
+            pila[-1]["_pico"] = max(pila[-1]["_pico"], pico)
+        tracemalloc.reset_peak()
+    marco = {"_pico": 0}
+    pila.append(marco)
+    inicio, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield registro
+    finally:
+        fin, cpu_fin = time.perf_counter(), time.process_time()
+        pila.pop()
+        registro.update(
+            nombre=nombre,
+            inicio_s=inicio - _ESTADO["origen"],
+            tiempo_s=fin - inicio,
+            cpu_s=cpu_fin - cpu,
+            nivel=len(pila),
+            hilo=threading.get_ident(),
+        )
+        if memoria:
+            _, pico = tracemalloc.get_traced_memory()
+            pico = max(pico, marco["_pico"])
+            registro["memoria_pico_mb"] = max(pico - base, 0) / 1e6
+            if pila:
+                pila[-1]["_pico"] = max(pila[-1]["_pico"], pico)
+        registro["rss_mb"] = _rss_mb()
+        _ESTADO["etapas"].append(registro)
+
+def etapas():
+    """Devuelve las etapas registradas en orden de inicio"""
+    return sorted(_ESTADO["etapas"], key=lambda r: r["inicio_s"])
+
+def exportar_json(ruta):
+    """Escribe las etapas registradas como JSON estructurado"""
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "etapas": etapas()}, f, ensure_ascii=False, indent=2)
+    return ruta
+
+def exportar_chrome(ruta):
+    """Escribe las etapas en formato Chrome trace (chrome://tracing, Perfetto)"""
+    eventos = []
+    for r in etapas():
+        args = {k: v for k, v in r.items() if k not in ("nombre", "inicio_s", "tiempo_s", "hilo", "nivel")}
+        eventos.append({
+            "name": r["nombre"], "ph": "X", "pid": os.getpid(), "tid": r["hilo"],
+            "ts": r["inicio_s"] * 1e6, "dur": r["tiempo_s"] * 1e6, "args": args
+        })
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return ruta
+
+def exportar(ruta, formato=None):
+    """Exporta en JSON o Chrome trace; por defecto según la extensión (.trace.json → Chrome)"""
+    if formato is None:
+        formato = "chrome" if ruta.endswith(".trace.json") else "json"
+    return exportar_chrome(ruta) if formato == "chrome" else exportar_json(ruta)
+
+def formato_entorno():
+    """Formato ("json" o "chrome") del perfil pedido con PVBESS_PERFIL, o None si no se ha pedido"""
+    ruta = os.environ.get("PVBESS_PERFIL")
+    if not ruta:
+        return None
+    return "chrome" if ruta.endswith(".trace.json") else "json"
+
+def resumen_texto():
+    """Tabla de texto con las etapas registradas, sangradas por nivel"""
+    lineas = [f"{'Etapa':<40}{'Real (s)':>10}{'CPU (s)':>10}{'Pico (MB)':>11}{'Elementos':>11}"]
+    for r in etapas():
+        pico = r.get("memoria_pico_mb")
+        lineas.append(f"{'  ' * r['nivel'] + r['nombre']:<40}{r['tiempo_s']:>10.3f}{r['cpu_s']:>10.3f}"
+                      f"{'' if pico is None else f'{pico:.1f}':>11}{r.get('elementos', ''):>11}")
+    return "\n".join(lineas)
+
+# Activación por entorno (útil en los nodos de lote sin tocar la línea de comandos)
+if os.environ.get("PVBESS_PERFIL"):
+    activar(memoria=os.environ.get("PVBESS_PERFIL_MEMORIA", "1") != "0")
+    atexit.register(lambda: exportar(os.environ["PVBESS_PERFIL"]) if activa() else None)
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+from docx import Document
+
+import generador_informe as gi
+from configuracion import Planta, cargar_datos
+import instrumentacion
+import resultados
+
+# Activos cargados una sola vez por proceso trabajador (plantilla docx y figuras estáticas)
+_ACTIVOS = {}
+
+COLUMNAS_INDICE = ["Planta", "Archivo", "Estado", "Tiempo (s)", "Memoria pico (MB)",
+                   "Ingresos anuales", "VAN", "Error"]
+
+def memoria_pico_mb():
+    """Devuelve la memoria residente pico del proceso actual en MB"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        return pico / 1e6 if sys.platform == "darwin" else pico / 1024
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1e6
+
+def cargar_activos():
+    """Prepara la plantilla docx y las figuras que no dependen de la planta"""
+    plantilla = BytesIO()
+    Document().save(plantilla)
+    return {
+        "plantilla": plantilla.getvalue(),
+        "cronograma": gi.cronograma_implementacion().getvalue()
+    }
+
+def _inicializar_trabajador(perfil=None):
+    """Inicializador del pool: carga los activos estáticos en el proceso trabajador"""
+    _ACTIVOS.update(cargar_activos())
+    if perfil:
+        instrumentacion.activar()
+
+def _nombre_planta(planta):
+    """Nombre de una planta dada como Planta o como diccionario"""
+    return planta.nombre if isinstance(planta, Planta) else str(planta.get("nombre", ""))
+
+def nombre_archivo(planta, usados=None):
+    """Genera un nombre de fichero de informe único a partir del nombre de la planta"""
+    nombre = unicodedata.normalize("NFKD", _nombre_planta(planta) or "planta")
+    nombre = nombre.encode("ascii", "ignore").decode("ascii")
+    nombre = re.sub(r"[^A-Za-z0-9]+", "_", nombre).strip("_") or "planta"
+    archivo = f"Informe_{nombre}.docx"
+    if usados is not None:
+        n = 2
+        while archivo in usados:
+            archivo = f"Informe_{nombre}_{n}.docx"
+            n += 1
+        usados.add(archivo)
+    return archivo
+
+def _generar_informe_planta(planta, ruta_salida, perfil=None, ruta_resultados=None):
+    """Genera el informe de una planta dentro de un proceso trabajador
+
+    Con ruta_resultados cada trabajador añade al almacén las simulaciones de su planta.
+    """
+    inicio = time.perf_counter()
+    fila = {"Planta": _nombre_planta(planta), "Archivo": os.path.basename(ruta_salida)}
+    instrumentacion.reiniciar()
+    try:
+        calculos = {}
+        _, resumen = gi.generar_informe_completo(planta, ruta_salida=ruta_salida, activos=_ACTIVOS, calculos=calculos)
+        if ruta_resultados:
+            # Se registran los resultados que ya ha calculado el informe
+            con = resultados.abrir(ruta_resultados)
+            try:
+                resultados.registrar_simulaciones(con, planta, calculos["operaciones"], calculos["kpis_arbitraje"],
+                                                  kpis_monte_carlo=calculos["kpis_monte_carlo"])
+            finally:
+                con.close()
+        fila.update({
+            "Estado": "OK",
+            "Ingresos anuales": resumen["Ingresos anuales"],
+            "VAN": next(v for k, v in resumen.items() if k.startswith("VAN")),
+            "Error": ""
+        })
+    except Exception as e:
+        fila.update({"Estado": "Error", "Ingresos anuales": "", "VAN": "", "Error": f"{type(e).__name__}: {e}"})
+    fila["Tiempo (s)"] = f"{time.perf_counter() - inicio:.2f}"
+    fila["Memoria pico (MB)"] = f"{memoria_pico_mb():.1f}"
+    if perfil:
+        extension = ".trace.json" if perfil == "chrome" else ".perfil.json"
+        instrumentacion.exportar(os.path.splitext(ruta_salida)[0] + extension, perfil)
+    return fila
+
+def generar_informes_lote(plantas, directorio_salida="informes", procesos=None, max_tareas_por_trabajador=20,
+                          perfil=None, ruta_resultados=None):
+    """Genera un informe por planta en un pool de procesos acotado y escribe un índice resumen
+
+    Con perfil="json" o "chrome" se guarda junto a cada informe su perfil por etapas (por defecto,
+    si se ha definido PVBESS_PERFIL, en el formato de ese fichero: los trabajadores no lo exportan
+    al salir) y con ruta_resultados las simulaciones de cada planta se registran en ese almacén SQLite.
+    """
+    perfil = perfil or instrumentacion.formato_entorno()
+    os.makedirs(directorio_salida, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    usados = set()
+    tareas = [(planta, os.path.join(directorio_salida, nombre_archivo(planta, usados))) for planta in plantas]
+
+    inicio = time.perf_counter()
+    filas = [None] * len(tareas)
+    # Cada tanda usa un pool nuevo: reciclar los trabajadores cada N informes acota su memoria
+    tamano_tanda = procesos * max_tareas_por_trabajador
+    for inicio_tanda in range(0, len(tareas), tamano_tanda):
+        tanda = range(inicio_tanda, min(inicio_tanda + tamano_tanda, len(tareas)))
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tanda)),
+                                 initializer=_inicializar_trabajador, initargs=(perfil,)) as pool:
+            futuros = {pool.submit(_generar_informe_planta, *tareas[i], perfil, ruta_resultados): i for i in tanda}
+            for futuro in as_completed(futuros):
+                i = futuros[futuro]
+                filas[i] = futuro.result()
+                print(f"[{sum(f is not None for f in filas)}/{len(filas)}] {filas[i]['Planta']}: {filas[i]['Estado']}")
+    duracion = time.perf_counter() - inicio
+
+    ruta_indice = os.path.join(directorio_salida, "indice_informes.csv")
+    with open(ruta_indice, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUMNAS_INDICE)
+        escritor.writeheader()
+        escritor.writerows(filas)
+
+    memoria = [float(f["Memoria pico (MB)"]) for f in filas]
+    return {
+        "Informes": len(filas),
+        "Correctos": sum(f["Estado"] == "OK" for f in filas),
+        "Procesos": procesos,
+        "Tiempo total (s)": f"{duracion:.1f}",
+        "Informes por minuto": f"{len(filas) / duracion * 60:.1f}" if duracion > 0 else "",
+        "Memoria pico máxima por trabajador (MB)": f"{max(memoria, default=0):.1f}",
+        "Índice": ruta_indice
+    }
+
+def cargar_plantas(ruta):
+    """Carga una lista de definiciones de planta desde un fichero JSON o YAML"""
+    plantas = cargar_datos(ruta)
+    if isinstance(plantas, dict):
+        plantas = plantas.get("plantas", [])
+    return plantas
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generación de informes PV + BESS en lote")
+    parser.add_argument("plantas", help="Fichero JSON o YAML con la lista de definiciones de planta")
+    parser.add_argument("--salida", default="informes", help="Directorio de salida de los informes")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos trabajadores")
+    parser.add_argument("--max-tareas", type=int, default=20, help="Informes por trabajador antes de reciclarlo")
+    parser.add_argument("--perfil", choices=["json", "chrome"], help="Guarda un perfil por etapas junto a cada informe")
+    parser.add_argument("--resultados", help="Almacén SQLite donde registrar las simulaciones de cada planta")
+    args = parser.parse_args()
+
+    resumen = generar_informes_lote(cargar_plantas(args.plantas), args.salida, args.procesos, args.max_tareas,
+                                    args.perfil, args.resultados)
+    for k, v in resumen.items():
+        print(f"{k}: {v}")
@@ -0,0 +1,580 @@
+import hashlib
+import math
+import numpy as np
+
+import flujo_caja
+import precision
+import puntos_control
+from configuracion import Planta, desde_dict, variante
+
+PASOS_ENTRE_CONSULTAS = 1024   # Pasos del despacho entre consultas del reloj de puntos de control
+
+def definir_planta(planta=None):
+    """Devuelve la configuración de planta: acepta una Planta o un diccionario sobre la referencia"""
+    if isinstance(planta, Planta):
+        return planta
+    return desde_dict(planta)
+
+def calcular_transformador_detallado(planta=None):
+    """Realiza cálculos magnéticos detallados con verificación EMF para todo el sistema"""
+    planta = definir_planta(planta)
+    trafo = planta.transformador
+    # Parámetros de diseño actualizados
+    S_nom = trafo.potencia           # VA
+    V1 = trafo.tension_primario      # V (primario)
+    V2 = trafo.tension_secundario    # V (secundario)
+    f = trafo.frecuencia             # Hz
+    B_max = 1.7  # T (inducción máxima)
+    J = 3.2      # A/mm² (densidad corriente)
+    k = 0.45     # Constante de diseño
+    dist_operacion = 1.5  # m (distancia operativa)
+    
+    # Cálculos eléctricos
+    relacion = V2 / V1
+    I1 = S_nom / (np.sqrt(3) * V1)
+    I2 = S_nom / (np.sqrt(3) * V2)
+    
+    # Cálculos magnéticos (IEC 60076)
+    A_fe = k * math.sqrt(S_nom)  # cm² (sección núcleo)
+    d_nucleo = math.sqrt(4 * A_fe / math.pi) * 100  # mm (diámetro equivalente)
+    phi_max = V1 / (4.44 * f * 100)  # Wb (flujo máximo)
+    
+    # Pérdidas (fórmulas IEC 60076-1)
+    Kh = 1.5   # Coeficiente de histéresis (material M4)
+    Ke = 0.02  # Coeficiente de corrientes parásitas
+    Pfe = (Kh * f * (B_max**1.6) + Ke * (f * B_max)**2) * (A_fe / 10000) * 1000  # kW
+    
+    # Pérdidas en el cobre (IEC 60076-1)
+    Rcc = 0.06 * (V1**2) / S_nom  # Resistencia de cortocircuito
+    Pcu = 3 * I1**2 * Rcc / 1000  # kW
+    
+    # Eficiencia
+    eficiencia = S_nom / (S_nom + Pfe*1000 + Pcu*1000) * 100
+    
+    # Cálculo campo magnético (IEC/EN 62110) para transformador
+    u0 = 4 * np.pi * 1e-7  # Permeabilidad del vacío
+    # Campo a 1 m (fórmula conservadora)
+    B_field_trafo = (u0 * I1 * math.sqrt(2)) / (2 * np.pi * dist_operacion) * 1e6  # μT
+    
+    # Factor de blindaje (típico para transformadores encapsulados)
+    factor_blindaje_trafo = 8  # Reducción típica 8:1
+    B_field_operacion_trafo = B_field_trafo / factor_blindaje_trafo
+    
+    # Cálculo campo magnético para BESS (IEC 62110)
+    I_bess = planta.bess.potencia / (np.sqrt(3) * V1)  # Corriente nominal BESS (A)
+    B_field_bess = (u0 * I_bess * math.sqrt(2)) / (2 * np.pi * dist_operacion) * 1e6  # μT
+    factor_blindaje_bess = 5  # Reducción típica para contenedores
+    B_field_operacion_bess = B_field_bess / factor_blindaje_bess
+    
+    # Cálculo campo magnético para sistema AMIKIT
+    I_amikit = I_bess  # Misma corriente que BESS
+    B_field_amikit = (u0 * I_amikit * math.sqrt(2)) / (2 * np.pi * dist_operacion) * 1e6  # μT
+    factor_blindaje_amikit = 6  # Blindaje en celdas MT
+    B_field_operacion_amikit = B_field_amikit / factor_blindaje_amikit
+    
+    # Campo magnético total (suma vectorial)
+    B_field_total = math.sqrt(
+        B_field_operacion_trafo**2 + 
+        B_field_operacion_bess**2 + 
+        B_field_operacion_amikit**2
+    )
+    
+    # Verificación norma (ICNIRP 2010)
+    limite_emf = 100  # μT para exposición laboral (50 Hz)
+    cumple_emf = B_field_total < limite_emf
+    
+    # Resultados con explicaciones técnicas
+    resultados = {
+        "Parámetros de Diseño": {
+            "Potencia nominal": f"{S_nom/1e6:.1f} MVA",
+            "Tensión primario": f"{V1} V",
+            "Tensión secundario": f"{V2} V",
+            "Frecuencia": f"{f} Hz",
+            "Inducción máxima": f"{B_max} T (acero M4)",
+            "Densidad de corriente": f"{J} A/mm²",
+            "Conexión": "Dyn11 (IEC 60076)"
+        },
+        "Cálculos Magnéticos": [
+            f"Relación de transformación: m = V2/V1 = {V2}/{V1} = {relacion:.2f}",
+            f"Corriente primaria: I1 = S / (√3 × V1) = {S_nom}/(1.732×{V1}) = {I1:.1f} A",
+            f"Corriente secundaria: I2 = S / (√3 × V2) = {S_nom}/(1.732×{V2}) = {I2:.1f} A",
+            f"Sección del núcleo: A_fe = k × √S = {k} × √{S_nom/1e6} = {A_fe:.1f} cm² (IEC 60076-1)",
+            f"Diámetro equivalente núcleo: d = √(4×A_fe/π) = √(4×{A_fe:.1f}/3.1416) = {d_nucleo:.1f} mm",
+            f"Flujo magnético máximo: Φ_max = V1/(4.44×f×N) = {V1}/(4.44×{f}×100) = {phi_max:.5f} Wb",
+            f"Pérdidas en núcleo (Pfe): Pfe = K_h·f·B_max¹·⁶ + K_e·(f·B_max)² = {Kh}×{f}×{B_max}¹·⁶ + {Ke}×({f}×{B_max})² = {Pfe:.1f} kW (IEC 60076-1)",
+            f"Pérdidas en cobre (Pcu): Pcu = 3·I1²·Rcc = 3×({I1:.1f})²×{Rcc:.5f} = {Pcu:.1f} kW",
+            f"Eficiencia: η = S/(S + Pfe + Pcu) × 100 = {S_nom}/({S_nom} + {Pfe*1000} + {Pcu*1000}) × 100 = {eficiencia:.2f}%"
+        ],
+        "Análisis Campo Magnético (EMF) según IEC 62110": [
+            f"Campo magnético transformador (1.5m): {B_field_trafo:.2f} μT → Blindaje (1/{factor_blindaje_trafo}) → {B_field_operacion_trafo:.2f} μT",
+            f"Campo magnético BESS (1.5m): {B_field_bess:.2f} μT → Blindaje (1/{factor_blindaje_bess}) → {B_field_operacion_bess:.2f} μT",
+            f"Campo magnético AMIKIT (1.5m): {B_field_amikit:.2f} μT → Blindaje (1/{factor_blindaje_amikit}) → {B_field_operacion_amikit:.2f} μT",
+            f"Campo magnético total (RMS): √(ΣB²) = {B_field_total:.2f} μT",
+            f"Límite ICNIRP 2010 para exposición laboral: {limite_emf} μT",
+            f"Cumplimiento normativa EMF: {'Sí' if cumple_emf else 'No'} - {B_field_total:.2f} μT < {limite_emf} μT",
+            "Recomendación: Mantener distancia mínima de 1.5m en áreas operativas y verificar con mediciones in situ"
+        ],
+        "Recomendaciones": [
+            "Material núcleo: Acero al silicio M4 (0.23 mm) para reducir pérdidas y campos magnéticos",
+            f"Sección cobre primario: A_cu1 = I1/J = {I1:.1f}/{J} = {I1/J:.1f} mm² → Seleccionar 2×150 mm² por fase",
+            f"Sección cobre secundario: A_cu2 = I2/J = {I2:.1f}/{J} = {I2/J:.1f} mm² → Seleccionar 1×35 mm² por fase",
+            "Refrigeración: ONAN (Oil Natural Air Natural) con radiadores y ventilación forzada",
+            "Protecciones: Relé Buchholz, termómetros PT100, monitor continuo de gases disueltos",
+            f"Impedancia cortocircuito: {trafo.impedancia:.0%} (IEC 60076-5) para limitar corrientes de fallo",
+            "Pruebas: Relación/fase, resistencia devanados, respuesta frecuencia (FRA), ensayos de impulso"
+        ]
+    }
+    return resultados
+
+def _operacion(paso, dt, contenedor, precio, generacion, accion, cargada, descargada, soc_pct):
+    """Fila de la tabla de operaciones del despacho"""
+    return {
+        "Hora": paso if dt == 1 else paso * dt,
+        "Contenedor": contenedor,
+        "Precio (€/MWh)": precio,
+        "Generación PV (kW)": generacion,
+        "Acción BESS": accion,
+        "Energía Cargada (kWh)": cargada,
+        "Energía Descargada (kWh)": descargada,
+        "SOC BESS (%)": soc_pct
+    }
+
+def _huella_serie(serie):
+    """Hash de una serie numérica larga (más rápido que incluirla en la huella de la configuración)"""
+    return None if serie is None else hashlib.sha256(np.asarray(serie, dtype=np.float64).tobytes()).hexdigest()
+
+def _tramo_operaciones(operaciones):
+    """Columnas de las operaciones que no se deducen de las entradas (para un punto de control)
+
+    Las acciones se guardan como un único texto UTF-8 separado por saltos de línea.
+    """
+    n = len(operaciones)
+    def columna(clave):
+        return np.fromiter([o[clave] for o in operaciones], dtype=np.float64, count=n)
+    return {
+        "accion": np.frombuffer("\n".join([o["Acción BESS"] for o in operaciones]).encode("utf-8"), dtype=np.uint8),
+        "cargada": columna("Energía Cargada (kWh)"),
+        "descargada": columna("Energía Descargada (kWh)"),
+        "soc_pct": columna("SOC BESS (%)")
+    }
+
+def simular_arbitraje(planta=None, registrar=True, limites=None, punto_control=None):
+    """Simula la estrategia de arbitraje y devuelve las operaciones e indicadores numéricos
+
+    Con registrar=False no se construye la tabla de operaciones horarias (búsquedas de
+    dimensionamiento, donde solo interesan los indicadores). limites (kW por paso) sustituye
+    al límite de conexión de la planta, p. ej. con la capacidad que le asigna una subestación
+    compartida; con ellos la descarga del BESS tampoco supera lo que deja libre la FV.
+
+    punto_control (directorio o puntos_control.PuntoControl) guarda periódicamente el estado
+    del despacho (SOC y ciclos por contenedor, indicadores acumulados y paso) y las operaciones
+    nuevas; si el directorio ya tiene un punto de control de la misma simulación se reanuda
+    desde él, con el mismo resultado que sin interrupción.
+
+    Los perfiles son potencias medias (kW) y precios de pasos de escenario.paso_h horas: las
+    decisiones se toman en kW y la energía de cada paso (SOC, curtailment, ingresos) es
+    potencia × Δt, de modo que el resultado no depende de la resolución si la energía se conserva.
+    """
+    planta = definir_planta(planta)
+    bess, escenario = planta.bess, planta.escenario
+    precios = escenario.precios
+    generacion = escenario.generacion
+    n_pasos = len(precios)
+    dt = escenario.paso_h  # h por paso
+    dias = n_pasos * dt / 24
+    limite_red = planta.red.limite  # kW
+    
+    # Parámetros BESS en contenedores
+    n_contenedores = bess.n_contenedores
+    capacidad_contenedor = bess.capacidad_contenedor  # kWh
+    capacidad_total = bess.capacidad_total
+    potencia_max = bess.potencia  # kW
+    eficiencia = bess.eficiencia    # Eficiencia round-trip
+    soc_min = bess.soc_min          # SOC mínimo operativo
+    soc_max = bess.soc_max          # SOC máximo operativo
+    
+    # Estado inicial por contenedor
+    bess_soc = [capacidad_contenedor * bess.soc_inicial] * n_contenedores
+    ingresos_diarios = 0
+    energia_perdida = 0
+    energia_entregada_total = 0
+    ciclos_diarios = [0] * n_contenedores
+    operaciones = []
+    inicio = 0
+    consulta = n_pasos   # Próximo paso en el que se mira el reloj de puntos de control
+
+    control = puntos_control.como_punto_control(punto_control)
+    if control is not None:
+        sin_series = variante(planta, {"escenario.precios": (0.0,), "escenario.generacion": (0.0,)})
+        estado, tramos = control.abrir({"simulacion": "arbitraje", "planta": sin_series, "registrar": registrar,
+                                        "precios": _huella_serie(precios), "generacion": _huella_serie(generacion),
+                                        "limites": _huella_serie(limites)})
+        if estado is not None:
+            inicio = int(estado["paso"])
+            bess_soc = estado["soc"].tolist()
+            ciclos_diarios = estado["ciclos"].tolist()
+            ingresos_diarios, energia_perdida, energia_entregada_total = estado["acumulados"].tolist()
+            for tramo in tramos:
+                if not len(tramo["soc_pct"]):
+                    continue
+                columnas = zip(tramo["accion"].tobytes().decode("utf-8").split("\n"), tramo["cargada"].tolist(),
+                               tramo["descargada"].tolist(), tramo["soc_pct"].tolist())
+                for k, (accion, cargada, descargada, soc_pct) in enumerate(columnas, start=len(operaciones)):
+                    paso, i = divmod(k, n_contenedores)
+                    # Sin carga ni descarga el despacho registra el entero 0
+                    operaciones.append(_operacion(paso, dt, i + 1, precios[paso], generacion[paso], accion,
+                                                  cargada or 0, descargada or 0, soc_pct))
+        guardadas = len(operaciones)
+        consulta = inicio + PASOS_ENTRE_CONSULTAS
+
+    for paso in range(inicio, n_pasos):
+        if paso == consulta:
+            consulta += PASOS_ENTRE_CONSULTAS
+            if control.toca():
+                control.guardar({"paso": np.array(paso), "soc": np.array(bess_soc),
+                                 "ciclos": np.array(ciclos_diarios),
+                                 "acumulados": np.array([ingresos_diarios, energia_perdida, energia_entregada_total],
+                                                        dtype=np.float64)},
+                                _tramo_operaciones(operaciones[guardadas:]) if registrar else None)
+                guardadas = len(operaciones)
+        # Excedente de generación (potencia sobre el límite de conexión)
+        excedente = max(0, generacion[paso] - (limite_red if limites is None else limites[paso]))
+        accion = [""] * n_contenedores
+        energia_cargada = [0] * n_contenedores
+        energia_descargada = [0] * n_contenedores
+        
+        # Estrategia: Carga durante bajo precio (mediodía)
+        if precios[paso] < escenario.umbral_carga and excedente > 0:
+            for i in range(n_contenedores):
+                if bess_soc[i] < capacidad_contenedor * soc_max:
+                    # Capacidad disponible para carga (kWh)
+                    capacidad_disponible = capacidad_contenedor * soc_max - bess_soc[i]
+                    # Máxima potencia de carga sostenible durante el paso (kW)
+                    carga_posible = min(potencia_max/n_contenedores, capacidad_disponible / (eficiencia * dt))
+                    # Limitar por excedente disponible
+                    carga_real = min(carga_posible, excedente/n_contenedores)
+                    
+                    # Actualizar estado de carga
+                    energia_almacenada = carga_real * dt * eficiencia
+                    bess_soc[i] += energia_almacenada
+                    energia_cargada[i] = carga_real * dt
+                    excedente -= carga_real
+                    accion[i] = f"Carga: {carga_real:.0f} kW"
+                    ciclos_diarios[i] += carga_real * dt / capacidad_total
+        
+        # Estrategia: Descarga durante alto precio (tarde-noche)
+        elif precios[paso] > escenario.umbral_descarga:
+            # Con límites por paso (subestación compartida) la descarga cabe en lo que deja libre la FV
+            margen = math.inf if limites is None else max(0, limites[paso] - generacion[paso])
+            for i in range(n_contenedores):
+                if bess_soc[i] > capacidad_contenedor * soc_min and margen > 0:
+                    # Máxima potencia de descarga sostenible durante el paso sin bajar del SOC mínimo (kW)
+                    energia_disponible = bess_soc[i] - capacidad_contenedor * soc_min
+                    descarga = min(potencia_max/n_contenedores, energia_disponible * eficiencia / dt, margen)
+                    margen -= descarga
+                    # Calcular energía entregada (kWh)
+                    energia_entregada = descarga * dt
+                    # Actualizar estado de carga
+                    bess_soc[i] -= energia_entregada / eficiencia
+                    # Calcular ingresos
+                    ingreso_paso = energia_entregada * precios[paso] / 1000  # €
+                    ingresos_diarios += ingreso_paso
+                    energia_entregada_total += energia_entregada
+                    energia_descargada[i] = energia_entregada
+                    accion[i] = f"Descarga: {descarga:.0f} kW"
+                    ciclos_diarios[i] += energia_entregada / capacidad_total
+        
+        # Calcular energía perdida por curtailment (kWh)
+        if excedente > 0:
+            energia_perdida += excedente * dt
+        
+        # Registrar operación
+        for i in range(n_contenedores if registrar else 0):
+            operaciones.append(_operacion(paso, dt, i + 1, precios[paso], generacion[paso], accion[i],
+                                          energia_cargada[i], energia_descargada[i],
+                                          (bess_soc[i] / capacidad_contenedor) * 100))
+    if control is not None:
+        control.terminar()
+    
+    # Cálculo de indicadores clave
+    if limites is None:
+        total_potential_curtailment = sum([max(0, g-limite_red) for g in generacion]) * dt
+    else:
+        total_potential_curtailment = sum([max(0, g-l) for g, l in zip(generacion, limites)]) * dt
+    
+    if total_potential_curtailment > 0:
+        reduccion_curtailment = 100 * (1 - energia_perdida / total_potential_curtailment)
+    else:
+        reduccion_curtailment = 100
+    
+    # Normalizar a valores diarios cuando el perfil cubre varios días
+    ingresos_diarios /= dias
+    energia_perdida /= dias
+    ciclos_diarios = [c / dias for c in ciclos_diarios]
+    
+    ingresos_anuales = ingresos_diarios * 365
+    energia_anual = energia_entregada_total / dias * 365 / 1000  # MWh
+    economia = planta.economia
+    vida_util = economia.vida_util  # años
+    financiero = flujo_caja.evaluar_economia(economia, ingresos_anuales, energia=energia_anual)
+    
+    # Cálculo vida útil basada en ciclos (ciclos garantizados a la profundidad de descarga nominal)
+    ciclos_promedio = sum(ciclos_diarios) / n_contenedores * 365
+    vida_util_ciclos = bess.ciclos_vida / (ciclos_promedio * bess.dod_ciclos) if ciclos_promedio > 0 else vida_util
+    
+    kpis = {
+        "ingresos_diarios": ingresos_diarios,
+        "ingresos_anuales": ingresos_anuales,
+        "energia_perdida_kwh_dia": energia_perdida,
+        "reduccion_curtailment_pct": reduccion_curtailment,
+        "van": float(financiero["van"][0]),
+        "van_accionista": float(financiero["van_accionista"][0]),
+        "tir": float(financiero["tir"][0]),
+        "payback_anos": float(financiero["payback"][0]),
+        "lcos": float(financiero["lcos"][0]),
+        "dscr_minimo": float(financiero["dscr_minimo"][0]),
+        "tasa_descuento": economia.tasa_descuento,
+        "energia_descargada_mwh_ano": energia_anual,
+        "ciclos_diarios_dod_pct": (sum(ciclos_diarios)/n_contenedores)*100,
+        "vida_util_anos": min(vida_util, vida_util_ciclos)
+    }
+    
+    return operaciones, kpis
+
+def simular_arbitraje_detallado(planta=None, punto_control=None):
+    """Simula estrategia de arbitraje con contenedores BESS específicos"""
+    import pandas as pd
+    operaciones, kpis = simular_arbitraje(planta, punto_control=punto_control)
+    return pd.DataFrame(operaciones), resumen_arbitraje(kpis)
+
+def resumen_arbitraje(kpis):
+    """Indicadores del arbitraje formateados para el informe"""
+    return {
+        "Ingresos diarios": f"{kpis['ingresos_diarios']:.2f} €",
+        "Ingresos anuales": f"{kpis['ingresos_anuales']:.2f} €",
+        "Energía perdida (curtailment)": f"{kpis['energia_perdida_kwh_dia']:.0f} kWh/día",
+        "Reducción de curtailment": f"{kpis['reduccion_curtailment_pct']:.1f}%",
+        f"VAN ({kpis['tasa_descuento']:.0%} descuento)": f"{kpis['van']/1e6:.2f} M€",
+        "TIR": "n/d" if math.isnan(kpis["tir"]) else f"{kpis['tir']:.1%}",
+        "Periodo de retorno": ("no se recupera" if math.isnan(kpis["payback_anos"])
+                               else f"{kpis['payback_anos']:.1f} años"),
+        "LCOS": f"{kpis['lcos']:.0f} €/MWh",
+        "Ciclos diarios equivalentes": f"{kpis['ciclos_diarios_dod_pct']:.2f}% DoD",
+        "Vida útil estimada": f"{kpis['vida_util_anos']:.1f} años"
+    }
+
+def calcular_matriz_sensibilidad(planta=None):
+    """Calcula la matriz de VAN frente a precio medio de la energía y CAPEX del BESS"""
+    planta = definir_planta(planta)
+    economia = planta.economia
+    # Parámetros variables (actualizados a 140k€/MWh)
+    precios_energia = np.linspace(50, 120, 7)  # €/MWh
+    capex_bess = np.linspace(100, 180, 6)      # €/kWh (rango alrededor de 140)
+    
+    # Todas las combinaciones en una sola evaluación (filas: precio, columnas: CAPEX)
+    precio, costo = np.meshgrid(precios_energia, capex_bess, indexing="ij")
+    ingresos_anuales = 740000 * (precio / 70)  # 70€ es el precio base
+    capex_total = costo * planta.bess.capacidad_total  # €/kWh × kWh
+    resultado = flujo_caja.evaluar_economia(economia, ingresos_anuales.ravel(), capex=capex_total.ravel(),
+                                            calcular_tir=False)
+    van_matrix = resultado["van"].reshape(precio.shape) / 1e6  # En millones de €
+    
+    return precios_energia, capex_bess, van_matrix
+
+def calcular_cortocircuito(planta=None):
+    """Realiza cálculo detallado de corrientes de cortocircuito según IEC 60909 (valores en kA)"""
+    planta = definir_planta(planta)
+    # Parámetros del sistema
+    S_red = planta.red.potencia_cc              # VA
+    V_red = planta.red.tension                  # V
+    Z_transf = planta.transformador.impedancia  # p.u.
+    V_transf = planta.transformador.tension_primario  # V
+    S_transf = planta.transformador.potencia    # VA
+    
+    # Cálculos según IEC 60909
+    I_cc_red = S_red * 1e6 / (np.sqrt(3) * V_red)  # Corriente simétrica red
+    I_cc_transf = (S_transf / (np.sqrt(3) * V_transf)) / Z_transf  # Corriente lado BT
+    I_cc_max = I_cc_transf * 2.5  # Considerando componente DC
+    
+    # Factor de impedancia para BESS (IEC 61660-1)
+    Z_bess = planta.bess.impedancia  # p.u.
+    I_cc_bess = (planta.bess.potencia * 1e3 / (np.sqrt(3) * V_transf)) / Z_bess
+    
+    return {
+        "Punto de fallo": [f"Red {V_red/1e3:g}kV", f"Barra {V_transf:g}V", "Salida BESS"],
+        "Icc simétrica (kA)": [I_cc_red/1000, I_cc_transf/1000, I_cc_bess/1000],
+        "Icc asimétrica (kA)": [I_cc_red*2.5/1000, I_cc_max/1000, I_cc_bess*1.8/1000],
+        "Protección asignada": ["Rele 67 (Siemens 7SA8)", "ACB 65kA (ABB Emax)", "Fusible gI 50kA (Eaton Bussmann)"],
+        "Normativa": ["IEC 60909", "IEC 60909", "IEC 61660-1"]
+    }
+
+def estudio_cortocircuito(planta=None):
+    """Realiza cálculo detallado de corrientes de cortocircuito según IEC 60909"""
+    import pandas as pd
+    resultados = calcular_cortocircuito(planta)
+    # Tabla de resultados
+    for columna in ("Icc simétrica (kA)", "Icc asimétrica (kA)"):
+        resultados[columna] = [f"{v:.2f}" for v in resultados[columna]]
+    return pd.DataFrame(resultados)
+
+def simular_termico(planta=None):
+    """Simula el comportamiento térmico de un contenedor BESS durante un día de operación"""
+    planta = definir_planta(planta)
+    termico = planta.termico
+    # Parámetros LiFePO4 (CATL EnerOne)
+    capacidad_termica = termico.capacidad_termica   # J/kg·K
+    masa_celda = termico.masa_celda                 # kg
+    R_termica = termico.resistencia_termica         # K/W
+    T_amb = termico.t_ambiente                      # °C
+    T_max_oper = termico.t_max_operacion            # °C
+    potencia_bess = planta.bess.potencia            # kW
+    
+    # Simulación de carga
+    tiempo = np.arange(0, 24, 0.1)
+    temperatura = np.zeros(len(tiempo), dtype=precision.real())
+    potencia = np.zeros(len(tiempo), dtype=precision.real())
+    temperatura[0] = T_amb
+    
+    for i, t in enumerate(tiempo):
+        # Perfil de operación
+        if 10 <= t % 24 <= 14:   # Período de carga solar
+            potencia[i] = potencia_bess * (1 - 0.2*np.sin(2*np.pi*(t-10)/4))
+        elif 18 <= t % 24 <= 22:  # Período de descarga
+            potencia[i] = -potencia_bess * (0.8 + 0.2*np.sin(2*np.pi*(t-18)/4))
+        else:
+            potencia[i] = 0
+        
+        # Ecuación diferencial térmica (modelo de primer orden)
+        if i > 0:
+            dT = (abs(potencia[i]) * 1000 * R_termica - (temperatura[i-1] - T_amb)) / (capacidad_termica * masa_celda)
+            temperatura[i] = temperatura[i-1] + dT * 0.1
+    
+    kpis = {
+        "temperatura_max": float(temperatura.max()),
+        "limite_operativo": T_max_oper,
+        "cumple_limite_operativo": bool(temperatura.max() < T_max_oper)
+    }
+    return tiempo, temperatura, potencia, kpis
+
+def calcular_lca(planta=None):
+    """Calcula huella de carbono y retorno energético de la planta (valores numéricos)"""
+    planta = definir_planta(planta)
+    # Datos de referencia (fuente: Ecoinvent 3.8)
+    huella_pv = 38     # gCO2/kWh
+    huella_bess = 75   # gCO2/kWh (LiFePO4)
+    incorporada_pv = 600      # MWh equivalente por MW de PV
+    incorporada_bess = 110    # MWh equivalente por MWh de BESS
+    horas_equivalentes = 1560  # h/año de producción PV a potencia nominal (Madrid)
+    
+    # Cálculos a partir de la configuración (5 MW + 20 MWh: 5200 MWh incorporados, 7800 MWh/año)
+    energia_incorporada = (incorporada_pv * planta.potencia_pv + incorporada_bess * planta.bess.capacidad_total) / 1000
+    energia_anual = planta.potencia_pv / 1000 * horas_equivalentes  # MWh/año (PV + BESS)
+    huella_operacion = (energia_anual * huella_pv) / 1000  # tCO2/año
+    huella_construccion = (energia_incorporada * huella_bess) / 1000  # tCO2
+    
+    # Retorno energético
+    eroi = (energia_anual * planta.economia.vida_util) / energia_incorporada  # Energía producida/vida útil
+    
+    # Tiempo de recuperación carbono
+    reduccion_co2 = energia_anual * 0.35 * 1000  # tCO2/año (considerando mix eléctrico español)
+    tiempo_recuperacion = huella_construccion / reduccion_co2
+    
+    return {
+        "huella_construccion_tco2": huella_construccion,
+        "huella_operacion_tco2_ano": huella_operacion,
+        "reduccion_emisiones_tco2_ano": reduccion_co2,
+        "energia_incorporada_mwh": energia_incorporada,
+        "eroi": eroi,
+        "recuperacion_energia_meses": (energia_incorporada/energia_anual)*12,
+        "recuperacion_carbono_anos": tiempo_recuperacion
+    }
+
+def analisis_lca(planta=None):
+    """Calcula huella de carbono y retorno energético para contenedores BESS"""
+    lca = calcular_lca(planta)
+    return {
+        "Huella Carbono Construcción (tCO2)": f"{lca['huella_construccion_tco2']:.1f}",
+        "Huella Carbono Operación (tCO2/año)": f"{lca['huella_operacion_tco2_ano']:.1f}",
+        "Reducción Emisiones Anual (tCO2)": f"{lca['reduccion_emisiones_tco2_ano']:.0f}",
+        "Energía Incorporada (MWh)": f"{lca['energia_incorporada_mwh']:.0f}",
+        "Retorno Energético (EROI)": f"{lca['eroi']:.1f}",
+        "Periodo Recuperación Energía (meses)": f"{lca['recuperacion_energia_meses']:.1f}",
+        "Periodo Recuperación Carbono (años)": f"{lca['recuperacion_carbono_anos']:.1f}"
+    }
+
+def calcular_monte_carlo(n_sim=10000, planta=None, punto_control=None, ingresos_anuales=None):
+    """Realiza simulación Monte Carlo para VAN del proyecto y devuelve muestras e indicadores
+
+    Los ingresos se muestrean alrededor de los ingresos anuales del arbitraje de la planta
+    (ingresos_anuales si ya se conocen; si no, se simula el despacho).
+    Con punto_control (directorio o puntos_control.PuntoControl) el VAN se evalúa por bloques de
+    escenarios y se guardan periódicamente los VAN calculados, el cursor y el estado del
+    generador; al reanudar se regeneran las muestras con la misma semilla y solo se evalúan
+    los escenarios pendientes.
+    """
+    planta = definir_planta(planta)
+    economia = planta.economia
+    if ingresos_anuales is None:
+        ingresos_anuales = simular_arbitraje(planta, registrar=False)[1]["ingresos_anuales"]
+    np.random.seed(42)
+
+    def muestras(generar, dtype=None):
+        # Por bloques, directamente en el tipo de la precisión activa: la secuencia aleatoria es
+        # la misma que con una sola llamada y no se materializa la copia en float64
+        destino = np.empty(n_sim, dtype=dtype or precision.real())
+        for i in range(0, n_sim, flujo_caja.BLOQUE):
+            destino[i:i + flujo_caja.BLOQUE] = generar(min(flujo_caja.BLOQUE, n_sim - i))
+        return destino
+    
+    # Distribuciones de probabilidad centradas en la configuración económica de la planta
+    # Ingresos: triangular -19% / +22% alrededor del arbitraje simulado (constantes si son nulos)
+    bajo, alto = ingresos_anuales - 0.19 * abs(ingresos_anuales), ingresos_anuales + 0.22 * abs(ingresos_anuales)
+    ingresos = muestras(lambda m: np.random.triangular(bajo, ingresos_anuales, alto, m) if alto > bajo
+                        else np.full(m, ingresos_anuales))
+    capex = muestras(lambda m: np.random.normal(economia.capex, 0.05 * economia.capex, m))  # CAPEX ± 5%
+    opex = muestras(lambda m: np.random.uniform(0.8 * economia.opex_anual, 1.2 * economia.opex_anual, m))
+    vida_util = muestras(lambda m: np.random.randint(max(1, economia.vida_util - 2), economia.vida_util + 3, m),
+                         precision.entero(economia.vida_util + 2))
+    tasa_descuento = muestras(lambda m: np.random.normal(economia.tasa_descuento, 0.01, m))
+    
+    # Cálculo VAN de todas las simulaciones en una pasada
+    control = puntos_control.como_punto_control(punto_control)
+    if control is None:
+        van_results = flujo_caja.evaluar_economia(economia, ingresos, capex=capex, opex=opex, vida=vida_util,
+                                                  tasa=tasa_descuento, calcular_tir=False)["van"]
+    else:
+        estado, tramos = control.abrir({"simulacion": "monte_carlo", "n_sim": n_sim, "economia": economia,
+                                        "ingresos": ingresos_anuales, "precision": precision.actual()})
+        anteriores = [tramo["van"] for tramo in tramos]
+        cursor = sum(len(van) for van in anteriores)
+        if estado is not None:
+            puntos_control.comprobar_rng(estado)
+            if cursor != int(estado["cursor"]):
+                raise ValueError(f"Los tramos de {control.directorio!r} no cubren los escenarios del punto de control")
+        guardado = [cursor]
+
+        def tras_bloque(fin, resultado):
+            if fin < n_sim and control.toca():
+                control.guardar({"cursor": np.array(fin), **puntos_control.estado_rng()},
+                                {"van": resultado["van"][guardado[0]:fin]})
+                guardado[0] = fin
+
+        # Los puntos de control caen al final de un bloque: al reanudar, los bloques restantes son
+        # los mismos que en una pasada completa y cada escenario se calcula exactamente igual
+        van_results = flujo_caja.evaluar_economia(economia, ingresos, capex=capex, opex=opex, vida=vida_util,
+                                                  tasa=tasa_descuento, calcular_tir=False, desde=cursor,
+                                                  tras_bloque=tras_bloque)["van"]
+        if anteriores:
+            van_results[:cursor] = np.concatenate(anteriores)
+        control.terminar()
+    
+    # Análisis estadístico
+    kpis = {
+        "van_medio": float(np.mean(van_results, dtype=np.float64)),
+        "van_desviacion": float(np.std(van_results, dtype=np.float64)),
+        "prob_van_positivo_pct": float(np.sum(van_results > 0) / n_sim * 100),
+        "van_p2_5": float(np.percentile(van_results, 2.5)),
+        "van_p97_5": float(np.percentile(van_results, 97.5)),
+        "simulaciones": n_sim
+    }
+    return van_results, kpis
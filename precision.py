@@ -0,0 +1,165 @@
+import argparse
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+# Modo de precisión de los núcleos vectoriales (flujos de caja, Monte Carlo, sensibilidad,
+# térmico y control de rampa). Por defecto todo se calcula en float64. En modo float32 las
+# muestras, series, estados y matrices de flujos se guardan en simple precisión (la mitad de
+# memoria y de ancho de banda), las sumas de ingresos y energía se acumulan en float64 y los
+# contadores y códigos usan el entero más pequeño que los representa. Se elige con usar(),
+# con el contexto modo() o con la variable de entorno PVBESS_PRECISION=float32.
+
+TIPOS = {"float64": np.float64, "float32": np.float32}
+
+# Error máximo tolerado en float32 frente a float64, relativo a la escala del resultado de
+# referencia (máximo valor absoluto); tir y las probabilidades en unidades absolutas
+TOLERANCIAS = {
+    "montecarlo_van": 1e-5,
+    "montecarlo_van_medio": 1e-5,
+    "montecarlo_prob_van_positivo_pct": 0.05,
+    "sensibilidad_van": 1e-5,
+    "flujo_caja_van": 1e-5,
+    "flujo_caja_tir": 1e-5,
+    "flujo_caja_payback": 1e-3,
+    "termico_temperatura": 1e-5,
+    "rampas_energia_requerida_kwh": 1e-4,
+    "rampas_incumplimientos_poi_s": 1e-3,
+}
+
+def _tipo_entorno():
+    """Precisión indicada en PVBESS_PRECISION (float64 si no está definida)"""
+    nombre = os.environ.get("PVBESS_PRECISION", "float64")
+    if nombre not in TIPOS:
+        raise ValueError(f"PVBESS_PRECISION debe ser una de {sorted(TIPOS)} (recibido {nombre!r})")
+    return TIPOS[nombre]
+
+_ESTADO = {"tipo": _tipo_entorno()}
+
+def usar(nombre):
+    """Fija la precisión de los núcleos: 'float64' o 'float32'"""
+    if nombre not in TIPOS:
+        raise ValueError(f"Precisión desconocida {nombre!r}; use una de {sorted(TIPOS)}")
+    _ESTADO["tipo"] = TIPOS[nombre]
+
+def actual():
+    """Nombre de la precisión activa"""
+    return np.dtype(_ESTADO["tipo"]).name
+
+@contextmanager
+def modo(nombre):
+    """Contexto que activa una precisión y restaura la anterior al salir"""
+    anterior = actual()
+    usar(nombre)
+    try:
+        yield
+    finally:
+        usar(anterior)
+
+def real():
+    """Tipo de coma flotante para series, estados y matrices"""
+    return _ESTADO["tipo"]
+
+def entero(maximo, minimo=0):
+    """Tipo entero para contadores y códigos: el más pequeño que cubre [minimo, maximo] en modo float32"""
+    if _ESTADO["tipo"] is np.float64:
+        return np.int64
+    return np.result_type(np.min_scalar_type(int(minimo)), np.min_scalar_type(int(maximo)))
+
+def suma(valores, axis=None):
+    """Suma compensada: suma por pares de NumPy con acumulador float64 aunque los datos sean float32
+
+    El error no crece con la longitud de la serie (ingresos o energía de un año a 1 s) y se
+    lee el array una sola vez, sin copiarlo a doble precisión.
+    """
+    return np.add.reduce(np.asarray(valores), axis=axis, dtype=np.float64)
+
+def _error(referencia, valor, absoluto=False):
+    """Error máximo entre dos resultados, relativo a la escala de la referencia salvo absoluto=True"""
+    referencia = np.asarray(referencia, dtype=np.float64)
+    valor = np.asarray(valor, dtype=np.float64)
+    validos = np.isfinite(referencia) & np.isfinite(valor)
+    if not np.array_equal(validos, np.isfinite(referencia)):
+        return float("inf")   # Un resultado definido en float64 no lo está en float32
+    diferencia = float(np.abs(referencia[validos] - valor[validos]).max(initial=0.0))
+    if absoluto:
+        return diferencia
+    escala = float(np.abs(referencia[validos]).max(initial=0.0))
+    return diferencia / escala if escala > 0 else diferencia
+
+def _ejecutar_nucleos(n_sim):
+    """Resultados de cada núcleo con la precisión activa: {nombre: (resultado, absoluto)}"""
+    import flujo_caja
+    import modelos
+    from rampas import simular_rampas
+    van, kpis = modelos.calcular_monte_carlo(n_sim)
+    _, _, matriz = modelos.calcular_matriz_sensibilidad()
+    rng = np.random.default_rng(7)
+    economico = flujo_caja.evaluar(capex=rng.uniform(1e6, 4e6, 20_000), ingresos=rng.uniform(1e5, 6e5, 20_000),
+                                   opex=25_000, vida=20, tasa=0.06, degradacion=0.02)
+    _, temperatura, _, _ = modelos.simular_termico()
+    # Un día a 1 s con nubes: escalón y rampas rápidas sobre una campana
+    segundos = np.arange(86400)
+    pv = 6000 * np.clip(np.sin(np.pi * (segundos / 3600 - 6) / 14), 0, None)
+    nubes = np.repeat(rng.uniform(0.3, 1.0, 86400 // 300), 300)
+    rampas = simular_rampas([(pv * nubes)[i:i + 21600] for i in range(0, 86400, 21600)])
+    return {
+        "montecarlo_van": (van, False),
+        "montecarlo_van_medio": (kpis["van_medio"], False),
+        "montecarlo_prob_van_positivo_pct": (kpis["prob_van_positivo_pct"], True),
+        "sensibilidad_van": (matriz, False),
+        "flujo_caja_van": (economico["van"], False),
+        "flujo_caja_tir": (economico["tir"], True),
+        "flujo_caja_payback": (economico["payback"], True),
+        "termico_temperatura": (temperatura, False),
+        "rampas_energia_requerida_kwh": (rampas["energia_requerida_kwh"], False),
+        "rampas_incumplimientos_poi_s": (rampas["incumplimientos_poi_s"] / 86400, True),
+    }
+
+def validar(n_sim=100_000):
+    """Compara los núcleos en float32 con float64: {núcleo: {"error", "tolerancia", "correcto"}}"""
+    with modo("float64"):
+        referencia = _ejecutar_nucleos(n_sim)
+    with modo("float32"):
+        simple = _ejecutar_nucleos(n_sim)
+    resultado = {}
+    for nombre, (valor, absoluto) in referencia.items():
+        error = _error(valor, simple[nombre][0], absoluto)
+        resultado[nombre] = {"error": error, "tolerancia": TOLERANCIAS[nombre], "correcto": error <= TOLERANCIAS[nombre]}
+    return resultado
+
+def comparar_memoria(n_sim=1_000_000):
+    """Pico de memoria (MB) y tiempo (s) del Monte Carlo en cada precisión"""
+    import modelos
+    resultado = {}
+    for nombre in TIPOS:
+        with modo(nombre):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            modelos.calcular_monte_carlo(n_sim)
+            duracion = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        resultado[nombre] = {"memoria_pico_mb": pico / 1e6, "tiempo_s": duracion}
+    return resultado
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validación del modo float32 frente a float64")
+    parser.add_argument("--n-sim", type=int, default=100_000, help="Simulaciones Monte Carlo de la validación")
+    parser.add_argument("--memoria", type=int, default=1_000_000, help="Simulaciones para comparar memoria y tiempo")
+    args = parser.parse_args()
+
+    # Los núcleos importan el módulo precision, no este __main__: el modo debe fijarse en aquel
+    import precision
+    fallos = 0
+    for nombre, r in precision.validar(args.n_sim).items():
+        fallos += not r["correcto"]
+        print(f"{nombre:<36}{r['error']:>12.2e}  (tolerancia {r['tolerancia']:.0e})  {'OK' if r['correcto'] else 'FALLO'}")
+    if args.memoria:
+        for nombre, r in precision.comparar_memoria(args.memoria).items():
+            print(f"monte_carlo/{args.memoria:.0e} {nombre}: {r['memoria_pico_mb']:.1f} MB, {r['tiempo_s']:.2f} s")
+    raise SystemExit(1 if fallos else 0)
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from configuracion import huella
+
+# Puntos de control de simulaciones largas (despacho de muchos años, Monte Carlo de millones de
+# escenarios). El estado (SOC, ciclos acumulados, indicadores parciales, estado del generador
+# aleatorio y cursor) se guarda en estado.npz, que se sustituye de forma atómica; los resultados
+# por paso o por escenario se escriben en tramos (tramo_00000.npz, ...) que solo contienen lo
+# calculado desde el punto anterior, de modo que cada guardado cuesta lo mismo al principio y
+# al final. Los guardados se hacen por tiempo (intervalo_s): el sobrecoste es el tiempo de un
+# guardado dividido por el intervalo. Un tramo escrito después del último estado (interrupción
+# entre ambos) se ignora al reanudar.
+
+INTERVALO_S = 60   # Segundos entre puntos de control
+ESTADO = "estado.npz"
+
+def _escribir(ruta, arrays):
+    """Escribe un .npz de forma atómica (un corte a mitad deja el fichero anterior intacto)"""
+    directorio = os.path.dirname(ruta)
+    fd, ruta_tmp = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(ruta_tmp, ruta)
+    except BaseException:
+        os.unlink(ruta_tmp)
+        raise
+
+def _leer(ruta):
+    """Contenido de un .npz como diccionario de arrays"""
+    with np.load(ruta, allow_pickle=False) as datos:
+        return {clave: datos[clave] for clave in datos.files}
+
+class PuntoControl:
+    """Directorio de puntos de control de una simulación"""
+
+    def __init__(self, directorio, intervalo_s=INTERVALO_S):
+        self.directorio = directorio
+        self.intervalo = intervalo_s
+        self.huella = None
+        self.tramos = 0
+        self.guardados = 0
+        self.tiempo_guardado_s = 0.0
+        self._ultimo = time.perf_counter()
+
+    def abrir(self, clave):
+        """Prepara el directorio para la simulación identificada por clave (dict con sus entradas)
+
+        Devuelve (estado, tramos) del último punto de control, o (None, []) si no hay ninguno.
+        Un punto de control de otra simulación (otra planta, otro n_sim...) es un error: se
+        borra el directorio o se usa otro para empezar de cero.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        self.huella = huella(clave)
+        self._ultimo = time.perf_counter()
+        ruta = os.path.join(self.directorio, ESTADO)
+        if not os.path.exists(ruta):
+            return None, []
+        estado = _leer(ruta)
+        if str(estado.pop("huella")) != self.huella:
+            raise ValueError(f"El punto de control de {self.directorio!r} es de otra simulación")
+        self.tramos = int(estado.pop("tramos"))
+        tramos = [_leer(self._ruta_tramo(i)) for i in range(self.tramos)]
+        return estado, tramos
+
+    def _ruta_tramo(self, i):
+        return os.path.join(self.directorio, f"tramo_{i:05d}.npz")
+
+    def toca(self):
+        """True si ha pasado el intervalo desde el último guardado"""
+        return time.perf_counter() - self._ultimo >= self.intervalo
+
+    def guardar(self, estado, tramo=None):
+        """Guarda el estado y, si se da, el tramo de resultados calculado desde el punto anterior"""
+        inicio = time.perf_counter()
+        if tramo is not None:
+            _escribir(self._ruta_tramo(self.tramos), tramo)
+            self.tramos += 1
+        _escribir(os.path.join(self.directorio, ESTADO), {**estado, "huella": np.array(self.huella),
+                                                          "tramos": np.array(self.tramos)})
+        self.guardados += 1
+        self._ultimo = time.perf_counter()
+        self.tiempo_guardado_s += self._ultimo - inicio
+
+    def terminar(self):
+        """Borra los puntos de control de una simulación terminada"""
+        for nombre in os.listdir(self.directorio):
+            if nombre == ESTADO or (nombre.startswith("tramo_") and nombre.endswith(".npz")):
+                os.remove(os.path.join(self.directorio, nombre))
+        self.tramos = 0
+
+def como_punto_control(valor):
+    """Acepta un PuntoControl, un directorio o None"""
+    if valor is None or isinstance(valor, PuntoControl):
+        return valor
+    return PuntoControl(valor)
+
+def estado_rng():
+    """Estado del generador global de NumPy como arrays guardables"""
+    _, clave, posicion, gauss, gauss_cache = np.random.get_state()
+    return {"rng_clave": clave, "rng_posicion": np.array(posicion), "rng_gauss": np.array(gauss),
+            "rng_gauss_cache": np.array(gauss_cache)}
+
+def comprobar_rng(estado):
+    """Comprueba que el generador global está en el estado guardado en el punto de control"""
+    actual = estado_rng()
+    if not all(np.array_equal(actual[k], estado[k]) for k in actual):
+        raise ValueError("El estado del generador aleatorio no coincide con el del punto de control")
@@ -0,0 +1,260 @@
+import argparse
+import time
+
+import numpy as np
+from scipy.signal import lfilter
+
+import precision
+from modelos import definir_planta
+
+# Control de rampa en el punto de conexión con el BESS, a resolución de segundos. El limitador
+# (la salida sigue a la FV sin cambiar más de R/60 por segundo) no es lineal, pero solo actúa en
+# los transitorios de nubes: fuera de ellos la salida es la propia FV y se resuelve con NumPy,
+# y dentro la salida rampa a ritmo constante hasta alcanzar la FV, de modo que cada episodio
+# se calcula por tramos vectoriales. Los datos se procesan en bloques con el estado arrastrado
+# entre ellos (un año a 1 s son 31.5 M de muestras). En modo float32 (precision.py) las series del
+# almacén se procesan sin convertirlas a float64.
+
+VENTANA_S = 60                 # Ventana de evaluación de la rampa del código de red
+RESTITUCION_S = 900            # Constante de tiempo con la que se recupera el SOC objetivo
+_TOLERANCIA = 1e-6             # Relativa, para comparar rampas sin falsos incumplimientos
+
+def _limitar(pv, anterior, rampa, potencia):
+    """Salida del limitador de rampa para un bloque: (salida, segundos limitados por potencia)
+
+    rampa es el cambio máximo por muestra (kW) y potencia la del BESS (kW): la salida no se
+    separa de la FV más de esa potencia aunque eso incumpla la rampa.
+    """
+    n = len(pv)
+    salida = pv.copy()
+    # Donde la FV salta más que la rampa se engancha el limitador (si antes seguía a la FV)
+    saltos = np.flatnonzero(np.abs(np.diff(pv, prepend=anterior)) > rampa)
+    limitados = 0
+    s = 0
+    while s < len(saltos):
+        i = int(saltos[s])
+        previo = salida[i - 1] if i else anterior
+        while i < n:
+            if previo - rampa <= pv[i] <= previo + rampa:
+                i += 1                                   # Vuelve a seguir a la FV (salida[i] = pv[i])
+                break
+            signo = 1.0 if pv[i] > previo else -1.0
+            # Tramo a rampa máxima: sigue mientras la FV quede fuera de alcance y el BESS aguante
+            m = 64
+            while True:
+                tramo = pv[i:i + m]
+                objetivo = previo + signo * rampa * np.arange(1, len(tramo) + 1)
+                sigue = (signo * (tramo - objetivo) > 0) & (np.abs(tramo - objetivo) <= potencia)
+                if not sigue.all() or i + m >= n:
+                    break
+                m *= 4
+            j = len(tramo) if sigue.all() else int(np.argmin(sigue))
+            salida[i:i + j] = objetivo[:j]
+            i += j
+            if j:
+                previo = salida[i - 1]
+            if i >= n:
+                break
+            # Muestra que cierra el tramo: alcanza la FV, invierte el sentido o satura el BESS
+            valor = min(max(pv[i], previo - rampa), previo + rampa)
+            if abs(valor - pv[i]) > potencia:
+                valor = pv[i] + potencia if valor > pv[i] else pv[i] - potencia
+                limitados += 1
+            salida[i] = previo = valor
+            i += 1
+            if valor == pv[i - 1]:
+                break
+        s = int(np.searchsorted(saltos, i))
+    return salida, limitados
+
+def _limitar_referencia(pv, anterior, rampa, potencia):
+    """Limitador muestra a muestra (referencia lenta de _limitar)"""
+    salida = np.empty_like(pv)
+    limitados = 0
+    previo = anterior
+    for i, valor_pv in enumerate(pv):
+        valor = min(max(valor_pv, previo - rampa), previo + rampa)
+        if abs(valor - valor_pv) > potencia:
+            valor = valor_pv + potencia if valor > valor_pv else valor_pv - potencia
+            limitados += 1
+        salida[i] = previo = valor
+    return salida, limitados
+
+def verificar_limitador(casos=200, n=2000, semilla=0):
+    """Compara _limitar con la referencia muestra a muestra en paseos aleatorios con ruido
+
+    Devuelve el número de casos distintos (0 si todo coincide). La salida por tramos acumula la
+    rampa como previo + k·rampa y puede diferir de la suma sucesiva en el último bit.
+    """
+    rng = np.random.default_rng(semilla)
+    fallos = 0
+    for _ in range(casos):
+        escala = rng.uniform(1, 100)
+        pv = np.cumsum(rng.normal(0, escala, n)) + rng.normal(0, escala, n) * (rng.random(n) < 0.2)
+        anterior = float(pv[0] + rng.normal(0, 5 * escala))
+        rampa, potencia = rng.uniform(0.1, 2) * escala, rng.choice([rng.uniform(1, 20) * escala, np.inf])
+        salida, limitados = _limitar(pv, anterior, rampa, potencia)
+        referencia, limitados_ref = _limitar_referencia(pv, anterior, rampa, potencia)
+        escala_salida = max(1.0, float(np.abs(referencia).max()))
+        if limitados != limitados_ref or not np.allclose(salida, referencia, rtol=0, atol=1e-9 * escala_salida):
+            fallos += 1
+    return fallos
+
+def _incumplimientos(serie, cola, limite, en_curso):
+    """Segundos e inicios de episodio con cambio en la ventana por encima del límite"""
+    extendida = np.concatenate((cola, serie))
+    cambio = np.abs(extendida[VENTANA_S:] - extendida[:-VENTANA_S]) if len(extendida) > VENTANA_S else np.empty(0)
+    # Holgura para el redondeo de la serie (despreciable en float64; en float32 cuenta el valor absoluto)
+    holgura = limite * _TOLERANCIA + 4 * np.finfo(extendida.dtype).eps * float(np.abs(extendida).max(initial=0.0))
+    fuera = cambio > limite + holgura
+    inicios = int(np.count_nonzero(fuera[1:] & ~fuera[:-1])) + int(bool(len(fuera)) and fuera[0] and not en_curso)
+    return int(fuera.sum()), inicios, (bool(fuera[-1]) if len(fuera) else en_curso)
+
+class ControladorRampa:
+    """Limitador de rampa con BESS que procesa la FV por bloques y acumula los indicadores
+
+    El SOC no limita al controlador: se mide la energía que necesitaría (desviación respecto al
+    objetivo, que se restituye con constante RESTITUCION_S) para compararla con la útil.
+    """
+
+    def __init__(self, planta=None, paso_s=1, potencia_bess=None, restitucion_s=RESTITUCION_S):
+        self.planta = definir_planta(planta)
+        red, bess = self.planta.red, self.planta.bess
+        self.paso_s = paso_s
+        self.limite_ventana = red.rampa_max / 100 * red.limite * VENTANA_S / 60   # kW por ventana
+        self.rampa = self.limite_ventana / VENTANA_S * paso_s                     # kW por muestra
+        self.potencia = bess.potencia if potencia_bess is None else potencia_bess
+        self.eficiencia = np.sqrt(bess.eficiencia)                                 # Por sentido
+        self.retencion = np.exp(-paso_s / restitucion_s)
+        self.anterior = None
+        self.estado_energia = np.zeros(1, dtype=precision.real())
+        self.colas = {"pv": np.empty(0, dtype=precision.real()), "poi": np.empty(0, dtype=precision.real())}
+        self.en_curso = {"pv": False, "poi": False}
+        self.totales = {"muestras": 0, "sin_datos": 0, "limitados": 0, "carga_max": 0.0, "descarga_max": 0.0,
+                        "energia_min": 0.0, "energia_max": 0.0, "descargada": 0.0, "cargada": 0.0,
+                        "segundos_pv": 0, "eventos_pv": 0, "segundos_poi": 0, "eventos_poi": 0}
+
+    def procesar(self, pv):
+        """Procesa un bloque de FV (kW); devuelve (potencia en el punto de conexión, potencia del BESS)"""
+        pv = np.asarray(pv, dtype=precision.real())
+        huecos = np.isnan(pv)
+        if huecos.any():
+            # Huecos: se mantiene el último valor válido (sin rampa ficticia en el hueco)
+            indice = np.where(huecos, 0, np.arange(len(pv)))
+            np.maximum.accumulate(indice, out=indice)
+            inicial = self.anterior if self.anterior is not None else 0.0
+            pv = np.where(huecos[indice], inicial, pv[indice])
+        if self.anterior is None:
+            self.anterior = pv[0] if len(pv) else 0.0
+        poi, limitados = _limitar(pv, self.anterior, self.rampa, self.potencia)
+        if len(pv):
+            self.anterior = poi[-1]
+        bess = poi - pv   # > 0 descarga hacia la red, < 0 absorbe FV
+
+        # Energía almacenada respecto al objetivo: recurrencia lineal con fuga (restitución del SOC)
+        horas = self.paso_s / 3600
+        variacion = np.where(bess > 0, -bess / self.eficiencia, -bess * self.eficiencia) * horas
+        energia, self.estado_energia = lfilter([1.0], [1.0, -self.retencion], variacion, zi=self.estado_energia)
+
+        t = self.totales
+        t["muestras"] += len(pv)
+        t["sin_datos"] += int(huecos.sum())
+        t["limitados"] += limitados
+        if len(pv):
+            t["descarga_max"] = max(t["descarga_max"], float(bess.max()))
+            t["carga_max"] = max(t["carga_max"], float(-bess.min()))
+            t["energia_min"] = min(t["energia_min"], float(energia.min()))
+            t["energia_max"] = max(t["energia_max"], float(energia.max()))
+        t["descargada"] += float(precision.suma(np.maximum(bess, 0))) * horas
+        t["cargada"] += float(precision.suma(np.maximum(-bess, 0))) * horas
+        for nombre, serie in (("pv", pv), ("poi", poi)):
+            segundos, eventos, self.en_curso[nombre] = _incumplimientos(serie, self.colas[nombre],
+                                                                        self.limite_ventana, self.en_curso[nombre])
+            t[f"segundos_{nombre}"] += segundos * self.paso_s
+            t[f"eventos_{nombre}"] += eventos
+            self.colas[nombre] = np.concatenate((self.colas[nombre], serie))[-VENTANA_S // self.paso_s:]
+        return poi, bess
+
+    def indicadores(self):
+        """Indicadores acumulados: incumplimientos con y sin BESS, potencia, energía y ciclado"""
+        t, bess = self.totales, self.planta.bess
+        anos = t["muestras"] * self.paso_s / (365 * 86400) or float("nan")
+        energia_requerida = t["energia_max"] - t["energia_min"]
+        energia_util = bess.capacidad_total * (bess.soc_max - bess.soc_min)
+        ciclos_anuales = t["descargada"] / bess.capacidad_total / anos
+        return {
+            "rampa_max_kw_min": self.limite_ventana * 60 / VENTANA_S,
+            "muestras": t["muestras"],
+            "muestras_sin_datos": t["sin_datos"],
+            "incumplimientos_fv_s": t["segundos_pv"],
+            "eventos_fv": t["eventos_pv"],
+            "incumplimientos_poi_s": t["segundos_poi"],
+            "eventos_poi": t["eventos_poi"],
+            "segundos_limitados_potencia": t["limitados"] * self.paso_s,
+            "potencia_requerida_kw": max(t["carga_max"], t["descarga_max"]),
+            "potencia_carga_max_kw": t["carga_max"],
+            "potencia_descarga_max_kw": t["descarga_max"],
+            "energia_requerida_kwh": energia_requerida,
+            "energia_suficiente": energia_requerida <= energia_util,
+            "energia_descargada_mwh_ano": t["descargada"] / 1000 / anos,
+            "energia_cargada_mwh_ano": t["cargada"] / 1000 / anos,
+            "ciclos_adicionales_ano": ciclos_anuales,
+            "vida_ciclos_consumida_pct_ano": ciclos_anuales / (bess.ciclos_vida * bess.dod_ciclos) * 100
+        }
+
+def simular_rampas(bloques, planta=None, paso_s=1, potencia_bess=None, restitucion_s=RESTITUCION_S):
+    """Indicadores del control de rampa sobre una secuencia de bloques de FV (kW)"""
+    controlador = ControladorRampa(planta, paso_s, potencia_bess, restitucion_s)
+    for bloque in bloques:
+        controlador.procesar(bloque)
+    return controlador.indicadores()
+
+def rampas_almacen(directorio, planta=None, desde=None, hasta=None, columna="generacion", duracion="1D",
+                   potencia_bess=None, destino=None):
+    """Control de rampa sobre la FV de un almacén, por ventanas de `duracion` (vistas del memmap)
+
+    Con destino se escriben las potencias en el punto de conexión y del BESS (kW) en otro almacén.
+    """
+    from series_temporales import anadir, crear_almacen, indices, iterar_ventanas, leer_meta, tiempos
+    meta = leer_meta(directorio)
+    controlador = ControladorRampa(planta, meta["paso_s"], potencia_bess)
+    if destino:
+        i0, _ = indices(meta, desde, hasta)
+        crear_almacen(destino, tiempos(meta, i0, i0 + 1)[0], meta["paso_s"],
+                      {"poi": {"dtype": "float32", "unidad": "kW"}, "bess": {"dtype": "float32", "unidad": "kW"}})
+    for _, datos in iterar_ventanas(directorio, duracion, desde, hasta, [columna]):
+        poi, bess = controlador.procesar(datos[columna])
+        if destino:
+            anadir(destino, {"poi": poi, "bess": bess})
+    return controlador.indicadores()
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Control de rampa FV + BESS en el punto de conexión")
+    parser.add_argument("almacen", nargs="?", help="Almacén de series temporales con la FV (kW), p. ej. a 1 s")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Compara el limitador por tramos con la referencia muestra a muestra")
+    parser.add_argument("--planta", help="Configuración de planta (YAML o JSON)")
+    parser.add_argument("--desde")
+    parser.add_argument("--hasta")
+    parser.add_argument("--columna", default="generacion")
+    parser.add_argument("--potencia-bess", type=float, help="Potencia del BESS (kW); por defecto la de la planta")
+    parser.add_argument("--sin-limite-bess", action="store_true", help="BESS ideal: potencia requerida para cumplir")
+    parser.add_argument("--destino", help="Almacén donde escribir las potencias en el POI y del BESS")
+    args = parser.parse_args()
+
+    if args.verificar:
+        fallos = verificar_limitador()
+        print(f"limitador: {'OK' if not fallos else f'{fallos} casos distintos de la referencia'}")
+        raise SystemExit(1 if fallos else 0)
+    if not args.almacen:
+        parser.error("falta el almacén (o --verificar)")
+    from configuracion import cargar_configuracion
+    planta = cargar_configuracion(args.planta) if args.planta else None
+    inicio = time.perf_counter()
+    kpis = rampas_almacen(args.almacen, planta, args.desde, args.hasta, args.columna,
+                          potencia_bess=float("inf") if args.sin_limite_bess else args.potencia_bess,
+                          destino=args.destino)
+    for k, v in kpis.items():
+        print(f"{k}: {v:,.2f}" if isinstance(v, float) else f"{k}: {v}")
+    print(f"segundos: {time.perf_counter() - inicio:.2f}")
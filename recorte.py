@@ -0,0 +1,153 @@
+import argparse
+import time
+
+import numpy as np
+
+from modelos import definir_planta
+
+# Análisis del recorte (curtailment) por el límite de exportación en el punto de conexión. Cada
+# día del perfil FV se ordena una vez de mayor a menor y se acumula: la energía por encima de
+# cualquier límite L es S_k − k·L, con k el número de muestras que lo superan (búsqueda binaria).
+# Así se evalúan a la vez cientos de límites y tamaños de BESS sin volver a recorrer la serie.
+#
+# La energía que un BESS de potencia P y capacidad E puede absorber en un día es la del recorte
+# con la carga limitada a P, C(L) − C(L + P), acotada por la capacidad útil; se supone que se
+# descarga cada noche por debajo del límite (hay margen de red cuando no hay sol).
+
+def _dias(generacion, paso_h):
+    """Perfil diario ordenado de mayor a menor y sus sumas acumuladas: (ordenado, acumulado) (días × muestras)"""
+    valores = np.nan_to_num(np.asarray(generacion, dtype=np.float64), nan=0.0)
+    por_dia = round(24 / paso_h)
+    n_dias = -(-len(valores) // por_dia)
+    # El último día incompleto se completa con ceros (no aportan recorte con límites >= 0)
+    matriz = np.zeros((n_dias, por_dia))
+    matriz.ravel()[:len(valores)] = valores
+    ordenado = -np.sort(-matriz, axis=1)
+    acumulado = np.zeros((n_dias, por_dia + 1))
+    np.cumsum(ordenado, axis=1, out=acumulado[:, 1:])
+    return ordenado, acumulado
+
+def _recorte_diario(ordenado, acumulado, umbrales, paso_h):
+    """Energía por encima de cada umbral en cada día (kWh, días × umbrales)"""
+    umbrales = np.asarray(umbrales, dtype=np.float64)
+    resultado = np.empty((len(ordenado), len(umbrales)))
+    for d in range(len(ordenado)):
+        # Muestras del día por encima del umbral (el día está ordenado de forma descendente)
+        k = np.searchsorted(-ordenado[d], -umbrales, side="left")
+        resultado[d] = acumulado[d, k] - k * umbrales
+    return resultado * paso_h
+
+def curva_duracion(generacion, paso_h=1.0, puntos=1000):
+    """Curva de duración de la potencia FV: horas al año en que se supera cada potencia
+
+    Devuelve {"horas": ..., "potencia_kw": ...} con como mucho `puntos` puntos (cuantiles).
+    """
+    valores = -np.sort(-np.nan_to_num(np.asarray(generacion, dtype=np.float64), nan=0.0))
+    anos = len(valores) * paso_h / 8760
+    horas = np.arange(1, len(valores) + 1) * paso_h / anos
+    if puntos and len(valores) > puntos:
+        indices = np.linspace(0, len(valores) - 1, puntos).round().astype(int)
+        valores, horas = valores[indices], horas[indices]
+    return {"horas": horas, "potencia_kw": valores}
+
+def barrido(generacion, paso_h=1.0, limites=None, capacidades=None, duracion_h=None, planta=None):
+    """Recorte y energía recuperable por un BESS para todos los límites × capacidades en una pasada
+
+    limites (kW) y capacidades (kWh) son vectores; la potencia de cada BESS es capacidad / duracion_h
+    (por defecto la relación de la planta). Devuelve arrays anuales: recorte (límites) y
+    recuperable, entregable y fraccion_recuperable (límites × capacidades).
+    """
+    planta = definir_planta(planta)
+    bess = planta.bess
+    limites = np.atleast_1d(np.asarray(planta.red.limite if limites is None else limites, dtype=np.float64))
+    capacidades = np.atleast_1d(np.asarray(bess.capacidad_total if capacidades is None else capacidades,
+                                           dtype=np.float64))
+    duracion_h = bess.capacidad_total / bess.potencia if duracion_h is None else duracion_h
+    potencias = capacidades / duracion_h
+    # La energía recortada que se absorbe pasa por la eficiencia de carga (raíz de la de ida y vuelta)
+    eficiencia = np.sqrt(bess.eficiencia)
+    absorbible = capacidades * (bess.soc_max - bess.soc_min) / eficiencia   # kWh de recorte por día
+
+    ordenado, acumulado = _dias(generacion, paso_h)
+    anos = len(np.asarray(generacion)) * paso_h / 8760
+    umbrales = np.concatenate((limites, (limites[:, None] + potencias[None, :]).ravel()))
+    diario = _recorte_diario(ordenado, acumulado, umbrales, paso_h)
+    recorte_dia = diario[:, :len(limites)]
+    por_encima = diario[:, len(limites):].reshape(len(ordenado), len(limites), len(capacidades))
+    recuperable = np.minimum(recorte_dia[:, :, None] - por_encima, absorbible[None, None, :]).sum(axis=0) / anos
+    recorte = recorte_dia.sum(axis=0) / anos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraccion = np.where(recorte[:, None] > 0, recuperable / recorte[:, None], 0.0)
+    return {
+        "limites_kw": limites,
+        "capacidades_kwh": capacidades,
+        "potencias_kw": potencias,
+        "recorte_kwh_ano": recorte,
+        "recuperable_kwh_ano": recuperable,
+        "entregable_kwh_ano": recuperable * bess.eficiencia,   # Tras cargar y descargar
+        "fraccion_recuperable": fraccion
+    }
+
+def analizar(generacion, paso_h=1.0, planta=None):
+    """Indicadores de recorte con el límite de conexión y el BESS de la planta"""
+    planta = definir_planta(planta)
+    valores = np.nan_to_num(np.asarray(generacion, dtype=np.float64), nan=0.0)
+    limite = planta.red.limite
+    anos = len(valores) * paso_h / 8760
+    resultado = barrido(valores, paso_h, [limite], [planta.bess.capacidad_total], planta=planta)
+    recorte = float(resultado["recorte_kwh_ano"][0])
+    energia = float(valores.sum()) * paso_h / anos
+    return {
+        "energia_fv_mwh_ano": energia / 1000,
+        "energia_recortada_mwh_ano": recorte / 1000,
+        "recorte_pct": recorte / energia * 100 if energia > 0 else 0.0,
+        "horas_recorte_ano": float(np.count_nonzero(valores > limite)) * paso_h / anos,
+        "exceso_max_kw": max(float(valores.max(initial=0.0)) - limite, 0.0),
+        "recuperable_bess_mwh_ano": float(resultado["recuperable_kwh_ano"][0, 0]) / 1000,
+        "entregable_bess_mwh_ano": float(resultado["entregable_kwh_ano"][0, 0]) / 1000,
+        "recuperable_bess_pct": float(resultado["fraccion_recuperable"][0, 0]) * 100
+    }
+
+def imprimir_barrido(resultado):
+    """Tabla de texto: recorte por límite y fracción recuperable por capacidad de BESS"""
+    print("limite_kw  recorte_mwh  " + "  ".join(f"{c:>9,.0f}" for c in resultado["capacidades_kwh"]))
+    for limite, recorte, fila in zip(resultado["limites_kw"], resultado["recorte_kwh_ano"],
+                                     resultado["fraccion_recuperable"]):
+        print(f"{limite:>9,.0f}  {recorte / 1000:>11,.1f}  " + "  ".join(f"{f:>9.1%}" for f in fila))
+
+def rejilla(texto):
+    """Valores de un barrido desde texto: '3000,4000,5000' o 'inicio:fin:n' (n puntos equiespaciados)"""
+    if ":" in texto:
+        inicio, fin, n = texto.split(":")
+        return np.linspace(float(inicio), float(fin), int(n))
+    return np.array([float(v) for v in texto.split(",")])
+
+def generacion_almacen(directorio, desde=None, hasta=None, columna="generacion"):
+    """FV de una ventana del almacén y su paso en horas"""
+    from series_temporales import leer_meta, ventana
+    _, datos = ventana(directorio, desde, hasta, [columna])
+    return datos[columna], leer_meta(directorio)["paso_s"] / 3600
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recorte por límite de exportación y barrido límite × BESS")
+    parser.add_argument("almacen", help="Almacén de series temporales con la FV (kW)")
+    parser.add_argument("--planta", help="Configuración de planta (YAML o JSON)")
+    parser.add_argument("--desde")
+    parser.add_argument("--hasta")
+    parser.add_argument("--columna", default="generacion")
+    parser.add_argument("--limites", help="Límites de exportación (kW): '3000,4000' o 'inicio:fin:n'")
+    parser.add_argument("--capacidades", help="Capacidades del BESS (kWh): '5000,10000' o 'inicio:fin:n'")
+    args = parser.parse_args()
+
+    from configuracion import cargar_configuracion
+    planta = cargar_configuracion(args.planta) if args.planta else None
+    inicio = time.perf_counter()
+    generacion, paso_h = generacion_almacen(args.almacen, args.desde, args.hasta, args.columna)
+    for k, v in analizar(generacion, paso_h, planta).items():
+        print(f"{k}: {v:,.2f}")
+    if args.limites or args.capacidades:
+        resultado = barrido(generacion, paso_h, rejilla(args.limites) if args.limites else None,
+                            rejilla(args.capacidades) if args.capacidades else None, planta=planta)
+        imprimir_barrido(resultado)
+    print(f"segundos: {time.perf_counter() - inicio:.2f}")
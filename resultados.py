@@ -0,0 +1,307 @@
+import json
+import math
+import re
+import sqlite3
+import unicodedata
+from datetime import datetime, timezone
+
+import numpy as np
+
+from configuracion import a_dict, desde_dict, huella
+
+# Almacén persistente de resultados de ejecuciones en SQLite (un único fichero, modo WAL para que
+# varios procesos añadan a la vez). Cada ejecución es una fila con la planta, la huella de su
+# configuración, la fecha y sus KPI como columnas numéricas; las columnas de KPI se crean al
+# aparecer por primera vez. Las configuraciones se guardan una vez por huella y las series
+# temporales por columnas, como arrays binarios con su dtype.
+
+RUTA = "resultados.db"
+ESPERA_BLOQUEO_MS = 30000
+CACHE_KIB = 65536
+COLUMNAS_FIJAS = ("id", "tipo", "planta", "huella", "fecha", "capex", "capex_eur_kwh", "capacidad_kwh",
+                  "potencia_kw", "limite_red_kw", "extra")
+KPI_INDEXADOS = ("van", "van_medio")   # Se indexan al crearse su columna; el resto con indexar()
+OPERADORES = ("<", "<=", ">", ">=", "=", "!=")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS configuraciones (
+    huella TEXT PRIMARY KEY,
+    datos TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id INTEGER PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    planta TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    capex REAL,
+    capex_eur_kwh REAL,
+    capacidad_kwh REAL,
+    potencia_kw REAL,
+    limite_red_kw REAL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_planta_fecha ON ejecuciones (planta, fecha);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_huella ON ejecuciones (huella);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_fecha ON ejecuciones (fecha);
+CREATE INDEX IF NOT EXISTS idx_ejecuciones_capex_eur_kwh ON ejecuciones (capex_eur_kwh);
+CREATE TABLE IF NOT EXISTS series (
+    ejecucion INTEGER NOT NULL REFERENCES ejecuciones (id) ON DELETE CASCADE,
+    nombre TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    datos BLOB NOT NULL,
+    PRIMARY KEY (ejecucion, nombre)
+) WITHOUT ROWID;
+"""
+
+def abrir(ruta=RUTA):
+    """Abre (y crea si hace falta) el almacén; cada proceso debe usar su propia conexión"""
+    con = sqlite3.connect(ruta, timeout=ESPERA_BLOQUEO_MS / 1000, isolation_level=None)
+    con.execute(f"PRAGMA busy_timeout = {ESPERA_BLOQUEO_MS}")
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.execute(f"PRAGMA cache_size = -{CACHE_KIB}")   # Los índices de KPI se insertan en orden aleatorio
+    con.execute("PRAGMA foreign_keys = ON")
+    con.executescript(_ESQUEMA)
+    return con
+
+def nombre_columna(nombre):
+    """Nombre de columna SQL seguro a partir del nombre de un KPI ('Reducción %' → 'reduccion')"""
+    texto = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode("ascii").lower()
+    texto = re.sub(r"[^a-z0-9]+", "_", texto).strip("_") or "kpi"
+    if texto[0].isdigit() or texto in COLUMNAS_FIJAS:
+        texto = f"kpi_{texto}"
+    return texto
+
+def _columnas(con):
+    """Columnas actuales de la tabla de ejecuciones"""
+    return [fila[1] for fila in con.execute("PRAGMA table_info(ejecuciones)")]
+
+def _asegurar_columnas(con, nombres):
+    """Añade las columnas de KPI que falten (dentro de la transacción en curso)"""
+    existentes = set(_columnas(con))
+    for nombre in nombres:
+        if nombre in existentes:
+            continue
+        try:
+            con.execute(f'ALTER TABLE ejecuciones ADD COLUMN "{nombre}" REAL')
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):   # Otro proceso la creó entre tanto
+                raise
+        if nombre in KPI_INDEXADOS:
+            indexar(con, nombre)
+
+def indexar(con, columna):
+    """Crea (si no existe) el índice de una columna para ordenar y filtrar por ella sin recorrer la tabla"""
+    if columna not in _columnas(con):
+        raise ValueError(f"Columna desconocida: {columna!r}")
+    con.execute(f'CREATE INDEX IF NOT EXISTS "idx_ejecuciones_{columna}" ON ejecuciones ("{columna}")')
+
+def _numero(valor):
+    """Valor numérico para SQLite (NaN como NULL) o None si no es numérico"""
+    if isinstance(valor, (bool, np.bool_)):
+        return float(valor)
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        valor = float(valor)
+        return None if math.isnan(valor) else valor
+    return None
+
+def _disenio(planta):
+    """Columnas de diseño derivadas de la configuración"""
+    return {
+        "capex": planta.economia.capex,
+        "capex_eur_kwh": planta.economia.capex / planta.bess.capacidad_total,
+        "capacidad_kwh": planta.bess.capacidad_total,
+        "potencia_kw": planta.bess.potencia,
+        "limite_red_kw": planta.red.limite
+    }
+
+def registrar_lote(con, registros, fecha=None):
+    """Añade varias ejecuciones en una transacción; devuelve sus identificadores
+
+    Cada registro es {"tipo", "planta" (Planta), "kpis" (dict) y opcionalmente "series"
+    ({nombre: array})}. Los KPI numéricos van a columnas; el resto se guarda en 'extra' (JSON).
+    """
+    fecha = fecha or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    vistas = {}   # id(planta) → (planta, huella, columnas de diseño): una huella por objeto
+    filas, configuraciones, nombres = [], {}, {}
+    for registro in registros:
+        planta = registro["planta"]
+        vista = vistas.get(id(planta))
+        if vista is None or vista[0] is not planta:
+            vista = vistas[id(planta)] = (planta, huella(planta), _disenio(planta))
+        _, clave, disenio = vista
+        configuraciones.setdefault(clave, planta)
+        kpis, extra = {}, {}
+        for k, v in registro.get("kpis", {}).items():
+            columna = nombres.get(k)
+            if columna is None:
+                columna = nombres[k] = nombre_columna(k)
+            numero = _numero(v)
+            if numero is not None or isinstance(v, float):   # NaN → NULL en su columna
+                kpis[columna] = numero
+            else:
+                extra[k] = v
+        filas.append((registro["tipo"], planta.nombre, clave, registro.get("fecha", fecha), disenio, kpis,
+                      json.dumps(extra, ensure_ascii=False, default=str) if extra else None, registro.get("series")))
+
+    columnas_kpi = sorted({c for fila in filas for c in fila[5]})
+    columnas = list(COLUMNAS_FIJAS) + columnas_kpi
+    citadas = ", ".join(f'"{c}"' for c in columnas)
+    sql = f"INSERT INTO ejecuciones ({citadas}) VALUES ({', '.join('?' * len(columnas))})"
+    # BEGIN IMMEDIATE toma el bloqueo de escritura al empezar: los procesos concurrentes esperan
+    # su turno (busy_timeout) en lugar de fallar al final de la transacción
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        _asegurar_columnas(con, columnas_kpi)
+        # Solo se serializan las configuraciones que aún no están guardadas
+        nuevas = [(k, json.dumps(a_dict(p), ensure_ascii=False)) for k, p in configuraciones.items()
+                  if con.execute("SELECT 1 FROM configuraciones WHERE huella = ?", (k,)).fetchone() is None]
+        con.executemany("INSERT INTO configuraciones VALUES (?, ?)", nuevas)
+        ultimo = con.execute("SELECT COALESCE(MAX(id), 0) FROM ejecuciones").fetchone()[0]
+        ids = list(range(ultimo + 1, ultimo + 1 + len(filas)))
+        con.executemany(sql, ([i, tipo, nombre, clave, f, *d.values(), extra] + [kpis.get(c) for c in columnas_kpi]
+                              for i, (tipo, nombre, clave, f, d, kpis, extra, _) in zip(ids, filas)))
+        con.executemany("INSERT INTO series VALUES (?, ?, ?, ?)",
+                        ((i, nombre, np.asarray(valores).dtype.str, np.ascontiguousarray(valores).tobytes())
+                         for i, fila in zip(ids, filas) if fila[7]
+                         for nombre, valores in fila[7].items()))
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    return ids
+
+def registrar(con, tipo, planta, kpis, series=None, fecha=None):
+    """Añade una ejecución; devuelve su identificador"""
+    return registrar_lote(con, [{"tipo": tipo, "planta": planta, "kpis": kpis, "series": series}], fecha)[0]
+
+def _condicion(columna, operador, valor, validas):
+    """Fragmento SQL parametrizado de una condición (columna y operador validados)"""
+    if columna not in validas:
+        raise ValueError(f"Columna desconocida: {columna!r}")
+    if operador not in OPERADORES:
+        raise ValueError(f"Operador no admitido: {operador!r} (use {', '.join(OPERADORES)})")
+    return f'"{columna}" {operador} ?', valor
+
+def consultar(con, condiciones=(), orden=None, descendente=True, limite=None, columnas=None):
+    """Ejecuciones que cumplen todas las condiciones [(columna, operador, valor)], como diccionarios
+
+    Ejemplo: las 20 de mayor VAN con CAPEX < 150 €/kWh
+        consultar(con, [("capex_eur_kwh", "<", 150)], orden="van", limite=20)
+    """
+    validas = set(_columnas(con))
+    partes = [_condicion(*c, validas) for c in condiciones]
+    seleccion = "*" if columnas is None else ", ".join(f'"{c}"' for c in columnas if c in validas)
+    sql = f"SELECT {seleccion} FROM ejecuciones"
+    if partes:
+        sql += " WHERE " + " AND ".join(p[0] for p in partes)
+    if orden:
+        if orden not in validas:
+            raise ValueError(f"Columna desconocida: {orden!r}")
+        # Las ejecuciones sin el KPI de orden quedan fuera (y la consulta puede usar su índice)
+        sql += (" AND " if partes else " WHERE ") + f'"{orden}" IS NOT NULL'
+        sql += f' ORDER BY "{orden}" {"DESC" if descendente else "ASC"}'
+    if limite:
+        sql += f" LIMIT {int(limite)}"
+    cursor = con.execute(sql, [p[1] for p in partes])
+    nombres = [d[0] for d in cursor.description]
+    return [dict(zip(nombres, fila)) for fila in cursor]
+
+def mejores(con, kpi="van", n=20, condiciones=(), descendente=True):
+    """Las n ejecuciones con mejor valor de un KPI que cumplen las condiciones"""
+    return consultar(con, condiciones, orden=kpi, descendente=descendente, limite=n)
+
+def comparar(con, ids, columnas=None):
+    """Tabla {columna: [valor de cada ejecución]} para comparar ejecuciones lado a lado"""
+    ids = list(ids)
+    cursor = con.execute(f"SELECT * FROM ejecuciones WHERE id IN ({', '.join('?' * len(ids))})", ids)
+    nombres = [d[0] for d in cursor.description]
+    filas = {fila[0]: dict(zip(nombres, fila)) for fila in cursor}
+    if columnas is None:   # Solo las columnas con algún valor en las ejecuciones comparadas
+        columnas = [c for c in nombres if any(f[c] is not None for f in filas.values())]
+    return {c: [filas.get(i, {}).get(c) for i in ids] for c in columnas}
+
+def serie(con, ejecucion, nombre):
+    """Serie temporal guardada de una ejecución como array de NumPy"""
+    fila = con.execute("SELECT dtype, datos FROM series WHERE ejecucion = ? AND nombre = ?",
+                       (ejecucion, nombre)).fetchone()
+    if fila is None:
+        raise KeyError(f"La ejecución {ejecucion} no tiene la serie {nombre!r}")
+    return np.frombuffer(fila[1], dtype=np.dtype(fila[0]))
+
+def configuracion(con, clave):
+    """Planta guardada con una huella"""
+    fila = con.execute("SELECT datos FROM configuraciones WHERE huella = ?", (clave,)).fetchone()
+    if fila is None:
+        raise KeyError(f"Configuración desconocida: {clave}")
+    return desde_dict(json.loads(fila[0]))
+
+def series_arbitraje(operaciones, n_contenedores):
+    """Series horarias del despacho (precio, generación, carga, descarga, SOC medio) desde las operaciones"""
+    n = len(operaciones) // n_contenedores
+    def columna(clave):
+        return np.array([o[clave] for o in operaciones], dtype=np.float64).reshape(n, n_contenedores)
+    return {
+        "precio_eur_mwh": columna("Precio (€/MWh)")[:, 0].astype(np.float32),
+        "generacion_kw": columna("Generación PV (kW)")[:, 0].astype(np.float32),
+        "carga_kwh": columna("Energía Cargada (kWh)").sum(axis=1).astype(np.float32),
+        "descarga_kwh": columna("Energía Descargada (kWh)").sum(axis=1).astype(np.float32),
+        "soc_pct": columna("SOC BESS (%)").mean(axis=1).astype(np.float32)
+    }
+
+def describir(fila, kpi):
+    """Línea de texto con los datos principales de una ejecución y el valor de un KPI"""
+    return (f"#{fila['id']} {fila['fecha']} {fila['tipo']} {fila['planta']} "
+            f"CAPEX {fila['capex_eur_kwh']:.1f} €/kWh {kpi}={fila[kpi]:,.2f}")
+
+def condicion(texto):
+    """Condición (columna, operador, valor) desde texto como 'capex_eur_kwh<150' o 'planta=Sevilla'"""
+    coincidencia = re.fullmatch(r"\s*(\w+)\s*(<=|>=|!=|<|>|=)\s*(.+?)\s*", texto)
+    if coincidencia is None:
+        raise ValueError(f"Condición no válida: {texto!r} (formato columna<valor)")
+    columna, operador, valor = coincidencia.groups()
+    try:
+        valor = float(valor)
+    except ValueError:
+        pass
+    return columna, operador, valor
+
+def registrar_simulaciones(con, planta, operaciones=None, kpis_arbitraje=None, n_sim=10000, muestras=False,
+                           kpis_monte_carlo=None):
+    """Registra el arbitraje y el Monte Carlo de una planta; devuelve los identificadores
+
+    Si ya se tienen las operaciones y KPI del arbitraje o los KPI del Monte Carlo se reutilizan
+    en lugar de recalcularlos. Con muestras=True se guardan también las muestras de VAN del
+    Monte Carlo como serie (el Monte Carlo se calcula siempre).
+    """
+    from modelos import calcular_monte_carlo, definir_planta, simular_arbitraje
+    planta = definir_planta(planta)
+    if kpis_arbitraje is None:
+        operaciones, kpis_arbitraje = simular_arbitraje(planta)
+    van, kpis_mc = None, kpis_monte_carlo
+    if kpis_monte_carlo is None or muestras:
+        van, kpis_mc = calcular_monte_carlo(n_sim, planta, ingresos_anuales=kpis_arbitraje["ingresos_anuales"])
+    return registrar_lote(con, [
+        {"tipo": "arbitraje", "planta": planta, "kpis": kpis_arbitraje,
+         "series": series_arbitraje(operaciones, planta.bess.n_contenedores) if operaciones else None},
+        {"tipo": "monte_carlo", "planta": planta, "kpis": kpis_mc,
+         "series": {"van": van.astype(np.float32)} if muestras else None}
+    ])
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Consulta del almacén de resultados de simulación")
+    parser.add_argument("--db", default=RUTA, help="Fichero SQLite del almacén")
+    parser.add_argument("--donde", action="append", default=[], help="Condición, p. ej. 'capex_eur_kwh<150' (repetible)")
+    parser.add_argument("--orden", default="van", help="KPI por el que ordenar")
+    parser.add_argument("--ascendente", action="store_true", help="Orden ascendente (por defecto, de mayor a menor)")
+    parser.add_argument("--limite", type=int, default=20, help="Número de ejecuciones a mostrar")
+    args = parser.parse_args()
+
+    con = abrir(args.db)
+    filas = mejores(con, args.orden, args.limite, [condicion(c) for c in args.donde], not args.ascendente)
+    for fila in filas:
+        print(describir(fila, args.orden))
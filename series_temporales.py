@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Almacén de series temporales por columnas. Cada serie es un fichero binario plano que se abre
+# con np.memmap; el índice temporal es regular (inicio + paso) y se guarda en meta.json, de modo
+# que un rango de fechas se traduce en un rango de índices y una ventana es una vista sin copia.
+# Solo el remuestreo crea arrays nuevos, del tamaño de la salida y procesando la entrada por bloques.
+
+META = "meta.json"
+FILAS_POR_BLOQUE = 1 << 20   # Filas de entrada por bloque al remuestrear
+
+_UNIDADES = {"s": 1, "min": 60, "h": 3600, "D": 86400}
+
+def segundos(paso):
+    """Convierte un paso ('15min', '1h', '1D', 900 o np.timedelta64) a segundos"""
+    if isinstance(paso, np.timedelta64):
+        return int(paso / np.timedelta64(1, "s"))
+    if isinstance(paso, (int, float)):
+        return int(paso)
+    m = re.fullmatch(r"\s*(\d+)\s*(s|min|h|D)\s*", str(paso))
+    if not m:
+        raise ValueError(f"Paso no reconocido: {paso!r} (use p. ej. '60s', '15min', '1h', '1D')")
+    return int(m.group(1)) * _UNIDADES[m.group(2)]
+
+def instante(valor):
+    """Convierte fecha (str ISO, datetime o datetime64) a datetime64[s] en UTC; sin zona se asume UTC"""
+    if isinstance(valor, np.datetime64):
+        return valor.astype("datetime64[s]")
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if valor.tzinfo is not None:
+        valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(valor, "s")
+
+def _ruta(directorio, columna):
+    """Fichero binario de una columna"""
+    return os.path.join(directorio, f"{columna}.bin")
+
+def leer_meta(directorio):
+    """Lee los metadatos del almacén (inicio, paso, longitud y columnas)"""
+    with open(os.path.join(directorio, META), encoding="utf-8") as f:
+        return json.load(f)
+
+def _guardar_meta(directorio, meta):
+    """Escribe los metadatos de forma atómica"""
+    fd, ruta_tmp = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(ruta_tmp, os.path.join(directorio, META))
+
+def crear_almacen(directorio, inicio, paso, columnas):
+    """Crea un almacén vacío; columnas es {nombre: dtype} o {nombre: {"dtype": ..., "unidad": ...}}"""
+    os.makedirs(directorio, exist_ok=True)
+    meta = {
+        "inicio": str(instante(inicio)),
+        "paso_s": segundos(paso),
+        "longitud": 0,
+        "columnas": {}
+    }
+    for nombre, definicion in columnas.items():
+        if not isinstance(definicion, dict):
+            definicion = {"dtype": definicion}
+        meta["columnas"][nombre] = {"dtype": np.dtype(definicion.get("dtype", "float32")).str,
+                                    "unidad": definicion.get("unidad", "")}
+        open(_ruta(directorio, nombre), "wb").close()
+    _guardar_meta(directorio, meta)
+    return meta
+
+def anadir(directorio, datos):
+    """Añade filas al final de todas las columnas ({columna: valores} de igual longitud)"""
+    meta = leer_meta(directorio)
+    if set(datos) != set(meta["columnas"]):
+        raise ValueError(f"Se esperaban las columnas {sorted(meta['columnas'])}, recibidas {sorted(datos)}")
+    longitudes = {len(v) for v in datos.values()}
+    if len(longitudes) != 1:
+        raise ValueError("Todas las columnas deben tener la misma longitud")
+    for nombre, valores in datos.items():
+        dtype = np.dtype(meta["columnas"][nombre]["dtype"])
+        with open(_ruta(directorio, nombre), "ab") as f:
+            f.write(np.ascontiguousarray(valores, dtype=dtype).tobytes())
+    meta["longitud"] += longitudes.pop()
+    _guardar_meta(directorio, meta)
+    return meta["longitud"]
+
+def columna(directorio, nombre, meta=None):
+    """Columna completa como memmap de solo lectura (no se carga en memoria)"""
+    meta = meta or leer_meta(directorio)
+    if meta["longitud"] == 0:
+        return np.empty(0, dtype=meta["columnas"][nombre]["dtype"])
+    return np.memmap(_ruta(directorio, nombre), dtype=meta["columnas"][nombre]["dtype"], mode="r",
+                     shape=(meta["longitud"],))
+
+def tiempos(meta, i0=0, i1=None, paso_s=None):
+    """Índice temporal (datetime64[s], UTC) de las filas i0..i1 con el paso indicado"""
+    i1 = meta["longitud"] if i1 is None else i1
+    paso_s = paso_s or meta["paso_s"]
+    inicio = np.datetime64(meta["inicio"], "s") + np.timedelta64(i0 * meta["paso_s"], "s")
+    n = -(-(i1 - i0) * meta["paso_s"] // paso_s)
+    return inicio + np.arange(n) * np.timedelta64(paso_s, "s")
+
+def indices(meta, desde=None, hasta=None):
+    """Rango de filas [i0, i1) que cubre el intervalo [desde, hasta)"""
+    inicio = np.datetime64(meta["inicio"], "s")
+    paso = meta["paso_s"]
+    i0 = 0 if desde is None else int(-(-((instante(desde) - inicio) / np.timedelta64(1, "s")) // paso))
+    i1 = meta["longitud"] if hasta is None else int(-(-((instante(hasta) - inicio) / np.timedelta64(1, "s")) // paso))
+    return max(0, min(i0, meta["longitud"])), max(0, min(i1, meta["longitud"]))
+
+def remuestrear(valores, factor, agregacion="media"):
+    """Remuestrea una serie: factor > 1 agrega bloques de `factor` filas; factor < 1 repite
+
+    agregacion: "media" (potencias, precios), "suma" (energías), "max", "min" o "primero".
+    La agregación ignora NaN; un bloque sin datos válidos da NaN.
+    """
+    if factor == 1:
+        return valores
+    if factor < 1:
+        repeticiones = round(1 / factor)
+        salida = np.repeat(np.asarray(valores, dtype=np.float64), repeticiones)
+        return salida / repeticiones if agregacion == "suma" else salida
+    factor = int(factor)
+    n = len(valores) // factor
+    salida = np.empty(n, dtype=np.float64)
+    # Por bloques: la memoria temporal es independiente de la longitud de la ventana
+    paso = max(1, FILAS_POR_BLOQUE // factor)
+    for b0 in range(0, n, paso):
+        b1 = min(n, b0 + paso)
+        bloque = np.asarray(valores[b0 * factor:b1 * factor], dtype=np.float64).reshape(b1 - b0, factor)
+        validos = ~np.isnan(bloque)
+        if agregacion in ("media", "suma"):
+            suma = np.where(validos, bloque, 0).sum(axis=1)
+            cuenta = validos.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                salida[b0:b1] = np.where(cuenta > 0, suma / cuenta if agregacion == "media" else suma, np.nan)
+        elif agregacion in ("max", "min"):
+            relleno = -np.inf if agregacion == "max" else np.inf
+            extremo = (np.max if agregacion == "max" else np.min)(np.where(validos, bloque, relleno), axis=1)
+            salida[b0:b1] = np.where(validos.any(axis=1), extremo, np.nan)
+        elif agregacion == "primero":
+            salida[b0:b1] = bloque[:, 0]
+        else:
+            raise ValueError(f"Agregación no reconocida: {agregacion!r}")
+    return salida
+
+def remuestrear_conservativo(valores, paso_origen, paso_destino, agregacion="media"):
+    """Remuestrea entre dos pasos cualesquiera (5min → 15min, 1h → 15min, 10min → 15min...) conservando la energía
+
+    La serie se trata como constante a tramos e integrada: cada valor de salida es la integral
+    sobre su intervalo dividida por el tiempo con datos ("media": potencias y precios, media
+    ponderada por tiempo) o la energía que cae en él ("suma": energías por paso, repartidas en
+    proporción al solape). NaN se ignoran; un intervalo sin datos da NaN. Se descartan las
+    filas finales que no completan un paso de destino.
+    """
+    paso_origen, paso_destino = segundos(paso_origen), segundos(paso_destino)
+    if paso_origen == paso_destino:
+        return valores
+    if agregacion not in ("media", "suma"):
+        raise ValueError(f"Agregación no conservativa: {agregacion!r} (use 'media' o 'suma')")
+    n = len(valores) * paso_origen // paso_destino
+    salida = np.empty(n, dtype=np.float64)
+    peso = paso_origen if agregacion == "media" else 1
+    # Por bloques de salida con su tramo de entrada: la memoria temporal no depende de la longitud
+    paso = max(1, FILAS_POR_BLOQUE * paso_origen // paso_destino)
+    for j0 in range(0, n, paso):
+        j1 = min(n, j0 + paso)
+        i0, i1 = j0 * paso_destino // paso_origen, min(len(valores), -(-j1 * paso_destino // paso_origen))
+        bloque = np.asarray(valores[i0:i1], dtype=np.float64)
+        validos = ~np.isnan(bloque)
+        bordes_origen = np.arange(i0, i1 + 1, dtype=np.float64) * paso_origen
+        bordes = np.arange(j0, j1 + 1, dtype=np.float64) * paso_destino
+        # Integrales acumuladas en los bordes de entrada, interpoladas en los de salida
+        acumulado = np.concatenate(([0.0], np.cumsum(np.where(validos, bloque, 0) * peso)))
+        con_datos = np.concatenate(([0.0], np.cumsum(validos, dtype=np.float64)))
+        integral = np.diff(np.interp(bordes, bordes_origen, acumulado))
+        cubierto = np.diff(np.interp(bordes, bordes_origen, con_datos))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            salida[j0:j1] = np.where(cubierto > 0, integral / (cubierto * paso_origen) if agregacion == "media"
+                                     else integral, np.nan)
+    return salida
+
+def ventana(directorio, desde=None, hasta=None, columnas=None, paso=None, agregacion="media"):
+    """Lee una ventana temporal: devuelve (tiempos, {columna: valores})
+
+    Sin remuestreo los valores son vistas del memmap (sin copia). agregacion puede ser un
+    único método o un diccionario {columna: método}. Si los pasos no son múltiplo uno del otro
+    se remuestrea de forma conservativa (solo "media" o "suma").
+    """
+    meta = leer_meta(directorio)
+    i0, i1 = indices(meta, desde, hasta)
+    paso_s = segundos(paso) if paso is not None else meta["paso_s"]
+    factor = paso_s / meta["paso_s"]
+    entero = factor.is_integer() if factor >= 1 else (1 / factor).is_integer()
+    if factor > 1:
+        i1 = i0 + (i1 - i0) * meta["paso_s"] // paso_s * paso_s // meta["paso_s"]
+    columnas = list(meta["columnas"]) if columnas is None else list(columnas)
+    resultado = {}
+    for nombre in columnas:
+        metodo = agregacion.get(nombre, "media") if isinstance(agregacion, dict) else agregacion
+        valores = columna(directorio, nombre, meta)[i0:i1]
+        resultado[nombre] = (remuestrear(valores, factor, metodo) if entero
+                             else remuestrear_conservativo(valores, meta["paso_s"], paso_s, metodo))
+    indice = tiempos(meta, i0, i1, paso_s)
+    return (indice if entero else indice[:len(next(iter(resultado.values()), indice))]), resultado
+
+def iterar_ventanas(directorio, duracion, desde=None, hasta=None, columnas=None, paso=None, agregacion="media"):
+    """Recorre el almacén en ventanas consecutivas de `duracion` (p. ej. '1D' o 365 días en s)"""
+    meta = leer_meta(directorio)
+    i0, i1 = indices(meta, desde, hasta)
+    filas = max(1, segundos(duracion) // meta["paso_s"])
+    inicio = np.datetime64(meta["inicio"], "s")
+    for j0 in range(i0, i1, filas):
+        j1 = min(i1, j0 + filas)
+        yield ventana(directorio, inicio + np.timedelta64(j0 * meta["paso_s"], "s"),
+                      inicio + np.timedelta64(j1 * meta["paso_s"], "s"), columnas, paso, agregacion)
+
+def planta_desde_almacen(directorio, desde, hasta, planta=None, columna_precios="precios",
+                         columna_generacion="generacion", paso="1h", almacen_precios=None):
+    """Configura el escenario de la planta con una ventana del almacén remuestreada al paso indicado
+
+    Con almacen_precios los precios se leen de otro almacén, que puede tener otra resolución
+    (p. ej. precios horarios y generación cada 5 minutos para un despacho cuartohorario).
+    """
+    from modelos import definir_planta
+    from configuracion import variante
+    _, datos = ventana(directorio, desde, hasta, [columna_generacion], paso=paso, agregacion="media")
+    _, datos_precios = ventana(almacen_precios or directorio, desde, hasta, [columna_precios], paso=paso,
+                               agregacion="media")
+    precios, generacion = datos_precios[columna_precios], datos[columna_generacion]
+    if len(precios) != len(generacion):
+        raise ValueError(f"Los almacenes cubren ventanas distintas ({len(precios)} pasos de precio, "
+                         f"{len(generacion)} de generación)")
+    if np.isnan(precios).any() or np.isnan(generacion).any():
+        raise ValueError("La ventana contiene pasos sin datos de precio o generación")
+    return variante(definir_planta(planta), {"escenario.precios": precios, "escenario.generacion": generacion,
+                                             "escenario.paso_h": segundos(paso) / 3600})
@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from configuracion import huella, variante
+from modelos import (calcular_cortocircuito, calcular_lca, calcular_matriz_sensibilidad, calcular_monte_carlo,
+                     calcular_transformador_detallado, definir_planta, simular_arbitraje)
+
+# Servicio local de consultas "qué pasa si" sobre HTTP/JSON (solo biblioteca estándar: asyncio).
+# El proceso vive entre consultas y mantiene calientes, con expulsión LRU:
+#  - las configuraciones ya compiladas (cambios JSON → Planta validada),
+#  - las ventanas leídas de almacenes de series temporales,
+#  - los resultados recientes, con clave en los grupos de configuración que usa cada modelo
+#    (cambiar el CAPEX no invalida el cortocircuito).
+# Los modelos pesados se ejecutan en un pool de procesos para que el bucle de eventos siga
+# atendiendo; consultas idénticas simultáneas comparten un único cálculo.
+#
+#   POST /arbitraje      {"planta": {"economia.capex": 2.4e6}, "almacen": {"directorio": ..., "desde": ..., "hasta": ..., "paso": "15min"}}
+#   POST /montecarlo     {"planta": {...}, "n_sim": 100000}
+#   POST /sensibilidad | /cortocircuito | /transformador | /lca
+#   GET  /salud | /estadisticas
+
+PUERTO = 8765
+TAMANO_CACHE_CONFIGURACIONES = 256
+TAMANO_CACHE_SERIES = 16
+TAMANO_CACHE_RESULTADOS = 1024
+MAX_CUERPO = 8 << 20   # bytes
+
+class CacheLRU:
+    """Diccionario acotado con expulsión del elemento usado hace más tiempo"""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.datos = OrderedDict()
+        self.aciertos = self.fallos = 0
+
+    def obtener(self, clave):
+        """Devuelve (True, valor) y lo marca como reciente, o (False, None)"""
+        if clave in self.datos:
+            self.datos.move_to_end(clave)
+            self.aciertos += 1
+            return True, self.datos[clave]
+        self.fallos += 1
+        return False, None
+
+    def guardar(self, clave, valor):
+        """Inserta el valor y expulsa los más antiguos si se supera la capacidad"""
+        self.datos[clave] = valor
+        self.datos.move_to_end(clave)
+        while len(self.datos) > self.capacidad:
+            self.datos.popitem(last=False)
+
+    def estadisticas(self):
+        """Tamaño, aciertos y fallos"""
+        return {"elementos": len(self.datos), "capacidad": self.capacidad, "aciertos": self.aciertos,
+                "fallos": self.fallos}
+
+# --- Modelos expuestos (funciones de módulo para poder enviarse al pool de procesos) ---
+
+def _arbitraje(planta, parametros):
+    """Despacho del BESS y KPIs económicos"""
+    operaciones, kpis = simular_arbitraje(planta, registrar=bool(parametros.get("operaciones")))
+    return {**kpis, "operaciones": operaciones} if parametros.get("operaciones") else kpis
+
+def _montecarlo(planta, parametros):
+    """Monte Carlo del VAN; con "muestras": true devuelve también los valores simulados"""
+    van, kpis = calcular_monte_carlo(int(parametros.get("n_sim", 10000)), planta)
+    return {**kpis, "muestras": van.tolist()} if parametros.get("muestras") else kpis
+
+def _sensibilidad(planta, parametros):
+    """Matriz de VAN frente a precio de la energía y CAPEX"""
+    precios, capex, van = calcular_matriz_sensibilidad(planta)
+    return {"precios_energia": precios.tolist(), "capex_bess": capex.tolist(), "van_meur": van.tolist()}
+
+def _cortocircuito(planta, parametros):
+    """Corrientes de cortocircuito"""
+    return calcular_cortocircuito(planta)
+
+def _transformador(planta, parametros):
+    """Cálculos del transformador"""
+    return calcular_transformador_detallado(planta)
+
+def _lca(planta, parametros):
+    """Análisis de ciclo de vida"""
+    return calcular_lca(planta)
+
+# ruta → (función, grupos de configuración de los que depende, se ejecuta en el pool)
+MODELOS = {
+    "/arbitraje": (_arbitraje, ["red", "bess", "economia", "escenario"], True),
+    "/montecarlo": (_montecarlo, ["red", "bess", "economia", "escenario"], True),
+    "/sensibilidad": (_sensibilidad, ["bess", "economia"], False),
+    "/cortocircuito": (_cortocircuito, ["red", "transformador", "bess"], False),
+    "/transformador": (_transformador, ["transformador", "bess"], False),
+    "/lca": (_lca, ["potencia_pv", "bess", "economia"], False)
+}
+
+def _a_json(objeto):
+    """Convierte tipos de NumPy a tipos nativos para serializar en JSON"""
+    if hasattr(objeto, "tolist"):
+        return objeto.tolist()
+    return str(objeto)
+
+def _sin_nan(valor):
+    """Sustituye los NaN por None (null en JSON) en diccionarios y listas anidados"""
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, dict):
+        return {k: _sin_nan(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_sin_nan(v) for v in valor]
+    return valor
+
+def _canonico(valor):
+    """Texto JSON estable de un valor de la petición (clave de caché)"""
+    return json.dumps(valor, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _precalentar():
+    """Tarea vacía: fuerza el arranque del trabajador con los modelos ya importados"""
+    return os.getpid()
+
+class Servicio:
+    """Estado del servicio: planta base, cachés, pool de procesos y cálculos en curso"""
+
+    def __init__(self, planta=None, procesos=None):
+        self.base = definir_planta(planta)
+        self.procesos = procesos or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos)
+        self.configuraciones = CacheLRU(TAMANO_CACHE_CONFIGURACIONES)
+        self.series = CacheLRU(TAMANO_CACHE_SERIES)
+        self.resultados = CacheLRU(TAMANO_CACHE_RESULTADOS)
+        self.en_curso = {}
+        self.peticiones = 0
+        self.inicio = time.time()
+        self._huellas_grupo = {}
+
+    async def precalentar(self):
+        """Arranca todos los trabajadores antes de la primera consulta"""
+        bucle = asyncio.get_running_loop()
+        await asyncio.gather(*(bucle.run_in_executor(self.pool, _precalentar) for _ in range(self.procesos)))
+
+    def cerrar(self):
+        """Detiene el pool de procesos"""
+        self.pool.shutdown(cancel_futures=True)
+
+    def _serie(self, almacen):
+        """Ventana del almacén al paso pedido, horario por defecto (caché por ventana y fecha de escritura)
+
+        Junto a los precios y la generación guarda los Escenario ya construidos con ellos, de modo
+        que las consultas sobre la misma ventana comparten objeto y su huella se calcula una vez.
+        """
+        from series_temporales import META, segundos, ventana
+        directorio, paso = almacen["directorio"], almacen.get("paso", "1h")
+        clave = (directorio, almacen.get("desde"), almacen.get("hasta"), paso,
+                 os.path.getmtime(os.path.join(directorio, META)))
+        encontrado, valor = self.series.obtener(clave)
+        if not encontrado:
+            _, datos = ventana(directorio, almacen.get("desde"), almacen.get("hasta"), ["precios", "generacion"],
+                               paso=paso, agregacion="media")
+            if np.isnan(datos["precios"]).any() or np.isnan(datos["generacion"]).any():
+                raise ValueError("La ventana contiene pasos sin datos de precio o generación")
+            valor = {"precios": tuple(datos["precios"].tolist()), "generacion": tuple(datos["generacion"].tolist()),
+                     "paso_h": segundos(paso) / 3600, "escenarios": {}}
+            self.series.guardar(clave, valor)
+        return _canonico(clave), valor
+
+    def planta(self, cambios, almacen=None):
+        """Planta compilada para los cambios de la petición y, si se indica, una ventana del almacén"""
+        clave_serie, serie = self._serie(almacen) if almacen else (None, None)
+        clave = (_canonico(cambios or {}), clave_serie)
+        encontrado, planta = self.configuraciones.obtener(clave)
+        if not encontrado:
+            planta = variante(self.base, cambios or {})
+            if serie:
+                umbrales = (planta.escenario.umbral_carga, planta.escenario.umbral_descarga)
+                if umbrales not in serie["escenarios"]:
+                    serie["escenarios"][umbrales] = variante(planta, {"escenario.precios": serie["precios"],
+                                                                      "escenario.generacion": serie["generacion"],
+                                                                      "escenario.paso_h": serie["paso_h"]}).escenario
+                planta = variante(planta, {"escenario": serie["escenarios"][umbrales]})
+            self.configuraciones.guardar(clave, planta)
+        return planta, clave_serie
+
+    def _huella_grupo(self, objeto):
+        """Huella de un grupo de configuración, memorizada por objeto (los grupos son inmutables)"""
+        entrada = self._huellas_grupo.get(id(objeto))
+        if entrada is None or entrada[0] is not objeto:
+            entrada = (objeto, huella(objeto))
+            if len(self._huellas_grupo) > 4 * TAMANO_CACHE_CONFIGURACIONES:
+                self._huellas_grupo.clear()
+            self._huellas_grupo[id(objeto)] = entrada
+        return entrada[1]
+
+    async def consultar(self, ruta, peticion):
+        """Resuelve una consulta de modelo: caché de resultados, cálculo compartido o pool"""
+        funcion, grupos, pesado = MODELOS[ruta]
+        parametros = {k: v for k, v in peticion.items() if k not in ("planta", "almacen")}
+        planta, clave_serie = self.planta(peticion.get("planta"), peticion.get("almacen"))
+        dependencias = [self._huella_grupo(getattr(planta, g)) for g in grupos]
+        clave = (ruta, tuple(dependencias), _canonico(parametros))
+        encontrado, resultado = self.resultados.obtener(clave)
+        if encontrado:
+            return resultado, True
+        if clave not in self.en_curso:
+            if pesado:
+                calculo = asyncio.get_running_loop().run_in_executor(self.pool, funcion, planta, parametros)
+            else:
+                calculo = asyncio.get_running_loop().create_future()
+                try:
+                    calculo.set_result(funcion(planta, parametros))
+                except Exception as e:
+                    calculo.set_exception(e)
+            self.en_curso[clave] = asyncio.ensure_future(calculo)
+        try:
+            resultado = await asyncio.shield(self.en_curso[clave])
+        finally:
+            self.en_curso.pop(clave, None)
+        resultado = _sin_nan(json.loads(json.dumps(resultado, default=_a_json)))
+        self.resultados.guardar(clave, resultado)
+        return resultado, False
+
+    def estadisticas(self):
+        """Estado de las cachés y del servicio"""
+        return {
+            "peticiones": self.peticiones,
+            "activo_s": round(time.time() - self.inicio, 1),
+            "procesos": self.procesos,
+            "en_curso": len(self.en_curso),
+            "configuraciones": self.configuraciones.estadisticas(),
+            "series": self.series.estadisticas(),
+            "resultados": self.resultados.estadisticas()
+        }
+
+    async def atender(self, metodo, ruta, cuerpo):
+        """Devuelve (estado HTTP, objeto JSON) para una petición"""
+        self.peticiones += 1
+        if ruta == "/salud":
+            return HTTPStatus.OK, {"estado": "ok"}
+        if ruta == "/estadisticas":
+            return HTTPStatus.OK, self.estadisticas()
+        if ruta not in MODELOS:
+            return HTTPStatus.NOT_FOUND, {"error": f"Ruta desconocida: {ruta}", "rutas": sorted(MODELOS)}
+        if metodo not in ("POST", "GET"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Método no admitido: {metodo}"}
+        try:
+            peticion = json.loads(cuerpo) if cuerpo else {}
+            if not isinstance(peticion, dict):
+                raise ValueError("El cuerpo debe ser un objeto JSON")
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"JSON no válido: {e}"}
+        inicio = time.perf_counter()
+        try:
+            resultado, en_cache = await self.consultar(ruta, peticion)
+        except (ValueError, TypeError, KeyError, OSError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        return HTTPStatus.OK, {"resultado": resultado, "cache": en_cache,
+                               "tiempo_ms": round((time.perf_counter() - inicio) * 1000, 2)}
+
+    async def conexion(self, lector, escritor):
+        """Atiende una conexión HTTP/1.1 con keep-alive"""
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, objetivo, version = linea.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(escritor, HTTPStatus.BAD_REQUEST, {"error": "Petición mal formada"}, False)
+                    break
+                cabeceras = {}
+                while (linea := await lector.readline()) not in (b"\r\n", b"\n", b""):
+                    nombre, _, valor = linea.decode("latin-1").partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                longitud = int(cabeceras.get("content-length", 0) or 0)
+                if longitud > MAX_CUERPO:
+                    await self._responder(escritor, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                          {"error": "Cuerpo demasiado grande"}, False)
+                    break
+                cuerpo = await lector.readexactly(longitud) if longitud else b""
+                mantener = (cabeceras.get("connection", "").lower() != "close" and version == "HTTP/1.1")
+                estado, respuesta = await self.atender(metodo, objetivo.split("?")[0], cuerpo)
+                await self._responder(escritor, estado, respuesta, mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _responder(escritor, estado, objeto, mantener):
+        """Escribe una respuesta JSON"""
+        cuerpo = json.dumps(objeto, ensure_ascii=False, default=_a_json).encode("utf-8")
+        cabecera = (f"HTTP/1.1 {estado.value} {estado.phrase}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(cuerpo)}\r\n"
+                    f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n")
+        escritor.write(cabecera.encode("latin-1") + cuerpo)
+        await escritor.drain()
+
+async def servir(host="127.0.0.1", puerto=PUERTO, planta=None, procesos=None):
+    """Arranca el servicio y atiende hasta que se interrumpe"""
+    servicio = Servicio(planta, procesos)
+    await servicio.precalentar()
+    servidor = await asyncio.start_server(servicio.conexion, host, puerto)
+    print(f"Servicio de consultas en http://{host}:{puerto} ({servicio.procesos} procesos)")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servicio.cerrar()
+
+# --- EJECUCIÓN PRINCIPAL ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local HTTP/JSON de consultas sobre los modelos PV + BESS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--planta", help="Configuración base (YAML o JSON) sobre la que se aplican los cambios")
+    parser.add_argument("--procesos", type=int, default=None, help="Trabajadores para los modelos pesados")
+    args = parser.parse_args()
+
+    from configuracion import cargar_configuracion
+    try:
+        asyncio.run(servir(args.host, args.puerto, cargar_configuracion(args.planta) if args.planta else None,
+                           args.procesos))
+    except KeyboardInterrupt:
+        pass